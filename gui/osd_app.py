@@ -13,7 +13,8 @@ from .osd_state import OsdState, Events
 from osd.config import Config
 from osd.render import get_renderer
 from osd.run_ffmpeg import run_ffmpeg_stdin
-from osd.utils.find_slot import find_slots
+from osd.utils.pipe_writer import PipeWriter
+from osd.utils.timeline import build_timeline
 
 
 def logger(process, page):
@@ -146,17 +147,7 @@ class OsdApp(ft.UserControl):
         renderer = cls(font=self.osd_state.font, cfg=self.osd_state.cfg, osd_type=self.osd_state.osd_type, frames=self.osd_state.frames, srt_frames=self.osd_state.srt_frames, reset_cache=True)
 
         render_time_start = time.time()
-        frames_idx_render = []
-        if self.osd_state.srt_frames:
-            srt_idxs = [srt.idx for srt in self.osd_state.srt_frames]
-
-            for idx, frame in enumerate(self.osd_state.frames[:-1]):
-                start_frame = frame.idx
-                next_frame = frame.next_idx
-                slot_frames = find_slots(srt_idxs, start_frame, next_frame)
-                frames_idx_render.append((idx, slot_frames,))
-        else:
-            frames_idx_render = [(idx, None,) for idx, _ in enumerate(self.osd_state.frames[:-1])]
+        timeline = build_timeline(self.osd_state.frames, self.osd_state.srt_frames or [])
 
         try:
             process = run_ffmpeg_stdin(self.osd_state.cfg, self.osd_state.video_path, self.osd_state.out_path)
@@ -171,16 +162,22 @@ class OsdApp(ft.UserControl):
         th.start()
         time.sleep(0)
 
-        for img in renderer.render_single_frame_in_memory(frames_idx_render):
+        writer = PipeWriter(process.stdin)
+        for img in renderer.render_for_pipe(timeline):
             time.sleep(0)
             try:
-                process.stdin.write(img)
+                writer.write(img)
             except BrokenPipeError:
                 # process was terminated
                 break
             except OSError:
                 break
 
+        try:
+            writer.close()
+        except OSError:
+            pass
+
         # Close the pipe to signal the end of input
         process.stdin.close()
 
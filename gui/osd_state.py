@@ -6,13 +6,11 @@ from configparser import ConfigParser
 import flet as ft
 
 from osd.config import Config
-from osd.const import OSD_TYPE_DJI, DEFAULT_SECTION, CONFIG_FILE_NAME
-from osd.frame import Frame, SrtFrame
+from osd.const import DEFAULT_SECTION, CONFIG_FILE_NAME
+from osd.frame import FrameStore, SrtStore
 from osd.font import Font
-from osd.dji import read_dji_osd_frames
-from osd.ws import read_ws_osd_frames
 from osd.utils.video_props import VideoProperties, get_video_properties
-from osd.utils.osd_props import detect_system, decode_fw_str, decode_system_str
+from osd.utils.osd_props import OsdFile, open_osd, detect_system, decode_fw_str, decode_system_str
 from osd.utils.srt import read_srt_frames
 
 from .utils import cut_path
@@ -24,14 +22,15 @@ class OsdState:
     cfg: Config = None
     error_handler = ft.AlertDialog = None
     osd_type: int = None
-    frames: list[Frame] = None
-    srt_frames: list[SrtFrame] = None
+    frames: FrameStore = None
+    srt_frames: SrtStore = None
     fw_name: str = None
     video_props: VideoProperties = None
     font: Font = None
     osd_name: str = None
     _video_path: pathlib.Path = None
     _osd_path: pathlib.Path = None
+    _osd_file: OsdFile = None
     _srt_path: pathlib.Path = None
     _out_path: pathlib.Path = None
 
@@ -42,8 +41,8 @@ class OsdState:
 
     def reset(self):
         self.osd_type: int = None
-        self.frames: list[Frame] = None
-        self.srt_frames: list[SrtFrame] = None
+        self.frames: FrameStore = None
+        self.srt_frames: SrtStore = None
         self.fw_name: str = None
         self.video_props: VideoProperties = None
         self.font: Font = None
@@ -102,7 +101,10 @@ class OsdState:
         if not self._osd_path.exists():
             self.page.pubsub.send_all_on_topic('osd loaded', 'OSD not loaded')
         else:
-            self.detect_system()
+            if not self.detect_system():
+                self.page.pubsub.send_all_on_topic('osd loaded', 'OSD not loaded')
+                return
+
             self.read_osd_frames()
             self._load_font()
             self.page.pubsub.send_all_on_topic('osd loaded', f'System: {self.osd_name}, fw: {self.fw_name}, loaded {len(self.frames)} osd frames')
@@ -117,10 +119,21 @@ class OsdState:
     def update_out_info(self):
         self.update_ready()
 
-    def detect_system(self):
-        self.osd_type, firmware = detect_system(self._osd_path, self.cfg.page)
+    def detect_system(self) -> bool:
+        # file stays open until frames are read
+        self._osd_file = open_osd(self._osd_path)
+        self.osd_type, firmware = detect_system(self._osd_file, self.send_error)
+        if self.osd_type is None:
+            self._osd_file.close()
+            self._osd_file = None
+            return False
+
         self.fw_name = decode_fw_str(firmware)
         self.osd_name = decode_system_str(self.osd_type)
+        return True
+
+    def send_error(self, msg: str) -> None:
+        self.page.pubsub.send_all_on_topic('error', msg)
 
     def update_ready(self):
         self.is_render_ready = self.frames and self.font and self.video_props
@@ -129,11 +142,10 @@ class OsdState:
         self.srt_frames = read_srt_frames(self._srt_path, False, self.video_props.fps)        
 
     def read_osd_frames(self):
-        if self.osd_type == OSD_TYPE_DJI:
-            self.frames = read_dji_osd_frames(self._osd_path, False, self.cfg)
+        with self._osd_file:
+            self.frames = self._osd_file.read_frames(False, self.cfg)
             # TODO: check for errors
-        else:
-            self.frames = read_ws_osd_frames(self._osd_path, False, self.cfg)
+        self._osd_file = None
 
     def render_time(self, tm: int) -> None:
         self.cfg.last_render_time = (self.video_props.frame_count, int(tm))
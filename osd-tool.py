@@ -1,3 +1,4 @@
+import multiprocessing
 import pathlib
 from configparser import ConfigParser
 
@@ -34,4 +35,6 @@ def main(page: ft.Page):
 
 
 if __name__ == "__main__":
+    # render workers in frozen (packaged) application
+    multiprocessing.freeze_support()
     ft.app(target=main)
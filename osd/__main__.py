@@ -1,35 +1,37 @@
 from __future__ import annotations
 
-from cProfile import Profile
-from pstats import SortKey, Stats
-
 import pathlib
 import sys
 import time
 from configparser import ConfigParser
+from typing import Iterable, Iterator
 
-from .utils.osd_props import detect_system, decode_fw_str
-from .render import get_renderer
+from .utils.osd_props import open_osd, detect_system, decode_fw_str
+from .render import BaseRenderer, get_renderer
 from .run_ffmpeg import run_ffmpeg_stdin
-from .frame import Frame, SrtFrame
+from .frame import Frame, FrameStore, SrtFrame, SrtStore
 from .font import Font
-from .const import CONFIG_FILE_NAME, OSD_TYPE_DJI
+from .const import CONFIG_FILE_NAME
 from .config import Config
-from .utils.find_slot import find_slots
+from .utils.pipe_writer import PipeWriter
+from .utils.timeline import NO_SRT, Timeline, build_timeline, iter_segments
+from .utils.peak_rss import peak_rss
 from .utils.video_props import get_video_properties
 from .utils.srt import read_srt_frames
 from .cmd_line import build_cmd_line_parser
-from .dji import read_dji_osd_frames
-from .ws import read_ws_osd_frames
 
 
-def render_test_frame(frames: list[Frame], srt_frames: list[SrtFrame], font: Font, cfg: Config, osd_type: int, video_path: pathlib.Path) -> None:
-    test_frame = osd_frame_idx(frames, args.testframe)
-    srt_idxs = [srt.idx for srt in srt_frames]
-    srt_slot = find_slots(srt_idxs, args.testframe, args.testframe+1)
+def render_test_frame(frames: FrameStore, srt_frames: SrtStore | list[SrtFrame], font: Font, cfg: Config, osd_type: int, video_path: pathlib.Path) -> None:
+    test_frame = osd_frame_idx(frames, cfg.testframe)
     srt_idx = None
-    if srt_slot:
-        srt_idx = srt_slot[0]
+    # same srt frame as in video, last one stays on screen after srt data ends
+    timeline = build_timeline(frames, srt_frames).shown_srt()
+    segment = timeline.find(cfg.testframe)
+    if segment is not None:
+        test_frame = int(timeline.osd_row[segment])
+        srt_row = int(timeline.srt_row[segment])
+        if srt_row != NO_SRT:
+            srt_idx = srt_row
     test_path = str(video_path.with_name('test_image.png'))
     print(f"test frame created: {test_path}")
     cls = get_renderer(osd_type)
@@ -42,7 +44,7 @@ def render_test_frame(frames: list[Frame], srt_frames: list[SrtFrame], font: Fon
     return
 
 
-def render_frames(frames: list[Frame], srt_frames: list[SrtFrame], font: Font, cfg: Config, osd_type: int, video_path: pathlib.Path, out_path: pathlib.Path, console: bool = False) -> None:
+def render_frames(frames: FrameStore, srt_frames: SrtStore | list[SrtFrame], font: Font, cfg: Config, osd_type: int, video_path: pathlib.Path, out_path: pathlib.Path, console: bool = False) -> None:
     print(f"rendering {len(frames)} frames")
 
     cls = get_renderer(osd_type)
@@ -52,24 +54,48 @@ def render_frames(frames: list[Frame], srt_frames: list[SrtFrame], font: Font, c
         if frames[i].next_idx != frames[i+1].idx:
             print(f'incorrect frame {frames[i].next_idx}')
 
-    frames_idx_render = []
-    if srt_frames:
-        srt_idxs = [srt.idx for srt in srt_frames]
+    timeline = build_timeline(frames, srt_frames)
 
-        for idx, frame in enumerate(frames[:-1]):
-            start_frame = frame.idx
-            next_frame = frame.next_idx
-            frames = find_slots(srt_idxs, start_frame, next_frame)
-            frames_idx_render.append((idx, frames,))
-    else:
-        frames_idx_render = [(idx, None,) for frame in frames[:-1]]
-        
+    if cfg.crop:
+        cfg.crop_box = renderer.content_box()
+        if cfg.verbatim:
+            x0, y0, x1, y1 = cfg.crop_box
+            area = (x1 - x0) * (y1 - y0) / (cfg.target_width * cfg.target_height)
+            print(f'Overlay cropped to {x1 - x0}x{y1 - y0} at {x0},{y0} ({area:.0%} of frame)')
+
+    pipe_frames(renderer, timeline, cfg, video_path, out_path, console)
+
+
+def render_frames_stream(frames: Iterator[Frame], srt_frames: SrtStore | list[SrtFrame], font: Font, cfg: Config, osd_type: int, video_path: pathlib.Path, out_path: pathlib.Path, console: bool = False) -> None:
+    print("rendering frames in stream mode")
+
+    cls = get_renderer(osd_type)
+    renderer = cls(font, cfg, osd_type, [], srt_frames)
+
+    pipe_frames(renderer, iter_segments(frames, srt_frames), cfg, video_path, out_path, console)
+
+    rss = peak_rss()
+    print(f'Peak memory: {rss // (1024 * 1024)} MB' if rss else 'Peak memory: unknown')
+
+
+def pipe_frames(renderer: BaseRenderer, segments: Timeline | Iterable[tuple], cfg: Config, video_path: pathlib.Path, out_path: pathlib.Path, console: bool = False) -> None:
     process = run_ffmpeg_stdin(cfg, video_path, out_path, console)
-    total_time = 0
-    for img in renderer.render_single_frame_in_memory(frames_idx_render):
-        ts = time.time_ns()
-        process.stdin.write(img)
-        total_time += (time.time_ns() - ts)
+    writer = PipeWriter(process.stdin)
+    render_start = time.time_ns()
+    try:
+        for img in renderer.render_for_pipe(segments):
+            writer.write(img)
+    finally:
+        writer.close()
+
+    if cfg.verbatim:
+        render_sec = (time.time_ns() - render_start) / 1e9
+        print(f'Sent {writer.frames} frames to ffmpeg, {writer.frames / render_sec:.1f} fps ({cfg.compositor} compositor)')
+        print(f'Pipe: {writer}')
+
+    # with jobs every process has own cache
+    if renderer.frame_cache and cfg.jobs == 1:
+        print(f'Frame cache: {renderer.frame_cache}')
 
     # Close the pipe to signal the end of input
     process.stdin.close()
@@ -78,10 +104,13 @@ def render_frames(frames: list[Frame], srt_frames: list[SrtFrame], font: Font, c
     process.wait()
 
 
-def osd_frame_idx(frames: list[Frame], frame_no: int) -> int | None:
+def osd_frame_idx(frames: list[Frame] | FrameStore, frame_no: int) -> int | None:
     """
     Finds frame in list of osd frames that is inside range
     """
+    if isinstance(frames, FrameStore):
+        return frames.find(frame_no)
+
     left, right = 0, len(frames) - 1
 
     while left <= right:
@@ -127,16 +156,18 @@ def main(args: Config):
     if args.verbatim:
         print(f'Source video: {video_props.width}x{video_props.height} {video_props.fps}fps')
 
-    osd_type, firmware = detect_system(osd_path)
+    osd_file = open_osd(osd_path)
+    osd_type, firmware = detect_system(osd_file)
 
     srt_frames = []
     if srt_exists:
         srt_frames = read_srt_frames(srt_path, args.verbatim, video_props.fps)
 
-    if osd_type == OSD_TYPE_DJI:
-        frames = read_dji_osd_frames(osd_path, args.verbatim, args)
+    if args.stream and not args.testrun:
+        frames = osd_file.iter_frames(args.verbatim, args)
     else:
-        frames = read_ws_osd_frames(osd_path, args.verbatim, args)
+        with osd_file:
+            frames = osd_file.read_frames(args.verbatim, args)
 
     print(f"loading fonts from: {args.font}")
     system_name = decode_fw_str(firmware)
@@ -150,7 +181,11 @@ def main(args: Config):
         return
 
     render_time_start = time.time()
-    render_frames(frames, srt_frames, font, args, osd_type, video_path, out_path, True)
+    if args.stream:
+        with osd_file:
+            render_frames_stream(frames, srt_frames, font, args, osd_type, video_path, out_path, True)
+    else:
+        render_frames(frames, srt_frames, font, args, osd_type, video_path, out_path, True)
     render_time = time.time() - render_time_start
 
     if args.verbatim:
@@ -169,6 +204,8 @@ if __name__ == "__main__":
 
     args.calculate()
     main(args)
+    # from cProfile import Profile
+    # from pstats import SortKey, Stats
     # with Profile() as profile:
     #     main(args)
     #     (
@@ -58,4 +58,53 @@ def build_cmd_line_parser() -> argparse.ArgumentParser:
         "--overlay", type=str, default=None, help='Overlay image, parameters are comma separated x,y,img like 10,100,resources\inav_icon_128.png'
     )
 
+    parser.add_argument(
+        "--pipe_format", type=str, default=None, choices=['png', 'rgba', 'pal8'], help="format of overlay frames sent to ffmpeg, png is compressed, rgba and pal8 are raw frames (faster, more pipe traffic), pal8 is lossy: colors are quantized to 256 per frame, default png"
+    )
+
+    parser.add_argument(
+        "--vfr", action="store_true", default=None, help="Send every overlay only once with its timestamp instead of repeating it for every video frame"
+    )
+
+    parser.add_argument(
+        "--compositor", type=str, default=None, choices=['pil', 'numpy'], help="how osd glyphs are drawn, pil pastes every changed tile, numpy copies all changed tiles at once, default pil"
+    )
+
+    parser.add_argument(
+        "--prescale", type=str, default=None, choices=['off', 'bilinear', 'nearest'], help="scale font once to output resolution instead of resizing every frame, nearest is used only for integer scale, default off"
+    )
+
+    parser.add_argument(
+        "--frame_cache", type=int, default=None, help="size in MB of cache for repeated encoded frames (e.g. 256, used by each job), default 0 (disabled)"
+    )
+
+    parser.add_argument(
+        "--jobs", type=int, default=None, help="number of processes rendering frames, frames are split to shards rendered in parallel, default 1"
+    )
+
+    parser.add_argument(
+        "--encode_threads", type=int, default=None, help="number of threads encoding frames while next frames are drawn, 1 encodes in render thread, default 0 (cpus usable by process, up to 4, no threads on single cpu)"
+    )
+
+    parser.add_argument(
+        "--no_osd_cache", action="store_true", default=None, help="Always parse osd file, parsed frames are not read from or written to cache "
+        "(osd-dump-tools/osd in user cache folder, e.g. ~/.cache, least recently used files are removed above 1 GB)"
+    )
+
+    parser.add_argument(
+        "--stream", action="store_true", default=None, help="Read, render and send frames one by one, memory usage does not depend on osd file length"
+    )
+
+    parser.add_argument(
+        "--refresh_codecs", action="store_true", default=None, help="Probe ffmpeg codecs again instead of using cached results"
+    )
+
+    parser.add_argument(
+        "--calibrate_codecs", action="store_true", default=None, help="Use fastest codec/preset with quality close to the best one, measured once per resolution"
+    )
+
+    parser.add_argument(
+        "--crop", action="store_true", default=None, help="Send to ffmpeg only part of overlay where osd, srt or overlay image is shown during flight, not used in stream mode"
+    )
+
     return parser
@@ -0,0 +1,152 @@
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+from .font import SMALL_STRING_CACHE_SIZE, Font
+
+# arrays of pasted images kept by compositor, least recently pasted are dropped, it holds
+# all strings kept by font (strings dropped by font are pushed out later) and few mask strips and overlay
+IMAGE_ARRAY_CACHE_SIZE = SMALL_STRING_CACHE_SIZE + 64
+
+
+class NumpyCompositor:
+    """
+    Keeps OSD canvas as numpy array and font as (glyphs, tile_height, tile_width, 4) atlas,
+    changed cells of frame are copied from atlas with single fancy-indexing operation
+    (one per cell size when cells of prescaled font differ in size)
+    """
+    __slots__ = (
+        'tile_width', 'tile_height', 'rows', 'cols', 'glyph_count',
+        'atlas', 'canvas', 'tiles', 'last_codes', 'image_arrays',
+        'col_x', 'row_y', 'cell_atlases',
+    )
+
+    def __init__(
+        self, font: Font, cols: int, rows: int, size: tuple[int, int] | None = None,
+        cell_fonts: dict[tuple[int, int], Font] | None = None,
+    ):
+        self.tile_width = font.tile_width
+        self.tile_height = font.tile_height
+        self.rows = rows
+        self.cols = cols
+
+        self.atlas = self._atlas(font)
+        self.glyph_count = self.atlas.shape[0] - 1
+
+        grid_height = rows * self.tile_height
+        grid_width = cols * self.tile_width
+        width, height = size or (grid_width, grid_height)
+        self.canvas = np.zeros((height, width, 4), dtype=np.uint8)
+        self.last_codes = np.zeros((rows, cols), dtype=np.uint16)
+        self.image_arrays: OrderedDict[int, tuple[Image.Image, np.ndarray]] = OrderedDict()
+
+        self.tiles = None
+        self.cell_atlases = None
+        if cell_fonts is None or len(cell_fonts) == 1:
+            # (row, y in tile, col, x in tile, rgba) view of canvas
+            self.tiles = self.canvas[:grid_height, :grid_width].reshape(rows, self.tile_height, cols, self.tile_width, 4)
+        else:
+            # font prescaled to output size, cells span canvas and differ in size by one pixel,
+            # cells of same size are drawn from atlas of font scaled to that size
+            self.col_x = np.arange(cols + 1) * width // cols
+            self.row_y = np.arange(rows + 1) * height // rows
+            self.cell_atlases = {cell_size: self._atlas(cell_font) for cell_size, cell_font in cell_fonts.items()}
+
+    @staticmethod
+    def _atlas(font: Font) -> np.ndarray:
+        atlas = np.asarray(font.img, dtype=np.uint8)
+        glyph_count = atlas.shape[0] // font.tile_height
+        atlas = atlas[: glyph_count * font.tile_height].reshape(glyph_count, font.tile_height, font.tile_width, 4)
+        # codes outside of font are rendered as empty tile, same as cropping outside of font image
+        empty = np.zeros((1, font.tile_height, font.tile_width, 4), dtype=np.uint8)
+
+        return np.concatenate((atlas, empty))
+
+    def _clip_codes(self, codes: np.ndarray) -> np.ndarray:
+        codes = codes[: self.rows, : self.cols]
+        return np.where(codes < self.glyph_count, codes, self.glyph_count)
+
+    def compose(self, codes: np.ndarray) -> None:
+        """
+        Draws whole canvas from glyph codes
+        """
+        codes = self._clip_codes(codes)
+        if self.tiles is None:
+            self._draw_cells(codes, *np.indices(codes.shape).reshape(2, -1))
+        else:
+            self.tiles[:] = self.atlas[codes].transpose(0, 2, 1, 3, 4)
+        self.last_codes = codes
+
+    def draw(self, codes: np.ndarray, cells: np.ndarray | None = None) -> None:
+        """
+        Draws only cells that differ from previously drawn codes, or given (rows, cols) mask of cells
+        """
+        codes = self._clip_codes(codes)
+        if cells is None:
+            cells = codes != self.last_codes
+        rows, cols = np.nonzero(cells[: self.rows, : self.cols])
+        if rows.size:
+            if self.tiles is None:
+                self._draw_cells(codes, rows, cols)
+            else:
+                self.tiles[rows, :, cols] = self.atlas[codes[rows, cols]]
+        self.last_codes = codes
+
+    def _draw_cells(self, codes: np.ndarray, rows: np.ndarray, cols: np.ndarray) -> None:
+        widths = self.col_x[cols + 1] - self.col_x[cols]
+        heights = self.row_y[rows + 1] - self.row_y[rows]
+        for (width, height), atlas in self.cell_atlases.items():
+            same = (widths == width) & (heights == height)
+            if not same.any():
+                continue
+
+            r, c = rows[same], cols[same]
+            ys = self.row_y[r][:, np.newaxis, np.newaxis] + np.arange(height)[:, np.newaxis]
+            xs = self.col_x[c][:, np.newaxis, np.newaxis] + np.arange(width)
+            self.canvas[ys, xs] = atlas[codes[r, c]]
+
+    def clear(self, box: tuple[int, int, int, int] | None = None) -> None:
+        """
+        Makes (x0, y0, x1, y1) area of canvas (whole canvas when None) transparent
+        """
+        if box is None:
+            self.canvas[:] = 0
+        else:
+            x0, y0, x1, y1 = box
+            self.canvas[y0:y1, x0:x1] = 0
+
+    def _image_array(self, img: Image.Image) -> np.ndarray:
+        # same images are pasted repeatedly (strings, mask strips, overlay), cached entry keeps reference so id stays valid
+        cached = self.image_arrays.get(id(img))
+        if cached:
+            self.image_arrays.move_to_end(id(img))
+            return cached[1]
+
+        arr = np.asarray(img if img.mode == "RGBA" else img.convert("RGBA"), dtype=np.uint8)
+        self.image_arrays[id(img)] = (img, arr)
+        if len(self.image_arrays) > IMAGE_ARRAY_CACHE_SIZE:
+            self.image_arrays.popitem(last=False)
+
+        return arr
+
+    def paste(self, img: Image.Image, xy: tuple[int, int]) -> None:
+        """
+        Same as Image.paste without mask, pixels are replaced and clipped to canvas
+        """
+        arr = self._image_array(img)
+        x, y = xy
+        height, width = self.canvas.shape[:2]
+
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + arr.shape[1], width), min(y + arr.shape[0], height)
+        if x0 >= x1 or y0 >= y1:
+            return
+
+        self.canvas[y0:y1, x0:x1] = arr[y0 - y : y1 - y, x0 - x : x1 - x]
+
+    def image(self, copy: bool = False) -> Image.Image:
+        """
+        Returns canvas as image, without copy image shares memory with canvas
+        """
+        return Image.fromarray(self.canvas.copy() if copy else self.canvas)
@@ -5,8 +5,11 @@ import pathlib
 import sys
 from configparser import ConfigParser
 from PIL import Image, UnidentifiedImageError
-import flet as ft
-from .const import DEFAULT_SECTION, FW_ARDU, HD_TILE_WIDTH
+from .const import (
+    DEFAULT_SECTION, FW_ARDU, HD_TILE_WIDTH,
+    PIPE_FORMAT_PAL8, PIPE_FORMAT_PNG, PIPE_FORMAT_RGBA, PIPE_FORMATS,
+    COMPOSITOR_PIL, COMPOSITORS, PRESCALE_OFF, PRESCALES,
+)
 from .dji_file_header import DJIFileHeader
 from .ws_file_header import WSFileHeader
 
@@ -19,13 +22,16 @@ class Config:
         ('overlay', str), ('out_resolution', str), 
         ('srt', str), ('srt_start', str), ('srt_font_scale', float), 
         ('last_render_time', tuple[int, int]),
-        ('use_h265', bool), ('hide_stats', bool)
+        ('use_h265', bool), ('hide_stats', bool), ('pipe_format', str),
+        ('vfr', bool), ('compositor', str), ('prescale', str), ('frame_cache', int),
+        ('jobs', int), ('encode_threads', int), ('no_osd_cache', bool),
+        ('stream', bool), ('refresh_codecs', bool), ('calibrate_codecs', bool),
+        ('crop', bool),
     )
 
     def __init__(self, cfg: ConfigParser):
         super().__init__()
 
-        self.page: ft.Page = None
         self.font : str = ''
         self.bitrate: int = 25
         self.max_alt: int = 0
@@ -47,12 +53,26 @@ class Config:
         self.last_render_time: tuple[int, int] = None
         self.use_h265 = False
         self.hide_stats = True
+        self.pipe_format: str = PIPE_FORMAT_PNG
+        self.vfr: bool = False
+        self.compositor: str = COMPOSITOR_PIL
+        self.prescale: str = PRESCALE_OFF
+        self.frame_cache: int = 0
+        self.jobs: int = 1
+        self.encode_threads: int = 0
+        self.no_osd_cache: bool = False
+        self.stream: bool = False
+        self.refresh_codecs: bool = False
+        self.calibrate_codecs: bool = False
+        self.crop: bool = False
 
         self.hd: bool = True
         self.display_width: int = -1
         self.display_height: int = -1
         self.overlay_location = None
         self.overlay_img = None
+        # (x0, y0, x1, y1) part of target frame sent to ffmpeg, None when whole frame is sent
+        self.crop_box: tuple[int, int, int, int] | None = None
         self.srt_data = []
         self.srt_font_scale: float = 0.7
         self.srt_start_location = (1, -1,)
@@ -110,6 +130,56 @@ class Config:
         else:
             self.target_width = (self.target_height * 16) // 9
 
+    def _check_pipe_format(self):
+        self.pipe_format = self.pipe_format.lower()
+        if self.pipe_format not in PIPE_FORMATS:
+            print(f'Parameter pipe_format is incorrect: "{self.pipe_format}"')
+            sys.exit(2)
+
+        if self.vfr and self.pipe_format == PIPE_FORMAT_PAL8:
+            print('pal8 pipe format cannot be used with vfr, rgba will be used')
+            self.pipe_format = PIPE_FORMAT_RGBA
+
+    def _check_compositor(self):
+        self.compositor = self.compositor.lower()
+        if self.compositor not in COMPOSITORS:
+            print(f'Parameter compositor is incorrect: "{self.compositor}"')
+            sys.exit(2)
+
+    def _check_prescale(self):
+        self.prescale = self.prescale.lower()
+        if self.prescale not in PRESCALES:
+            print(f'Parameter prescale is incorrect: "{self.prescale}"')
+            sys.exit(2)
+
+    def _check_jobs(self):
+        if self.jobs < 1:
+            print(f'Parameter jobs is incorrect: "{self.jobs}"')
+            sys.exit(2)
+
+        if self.stream and self.jobs > 1:
+            print('jobs cannot be used in stream mode, frames will be rendered in single process')
+            self.jobs = 1
+
+        if self.encode_threads < 0:
+            print(f'Parameter encode_threads is incorrect: "{self.encode_threads}"')
+            sys.exit(2)
+
+    def _check_crop(self):
+        if self.stream and self.crop:
+            print('crop cannot be used in stream mode, whole overlay will be sent')
+            self.crop = False
+
+    def pipe_size(self) -> tuple[int, int]:
+        """
+        Size of overlay frames sent to ffmpeg
+        """
+        if self.crop_box:
+            x0, y0, x1, y1 = self.crop_box
+            return x1 - x0, y1 - y0
+
+        return self.target_width, self.target_height
+
     def _update_srt(self):
         if self.srt:
             items = self.srt.split(':')
@@ -177,6 +247,11 @@ class Config:
         Calculate config parameters based on other values
         """
         self._calculate_video_resolution()
+        self._check_pipe_format()
+        self._check_compositor()
+        self._check_prescale()
+        self._check_jobs()
+        self._check_crop()
         self._update_srt()
         self._update_overlay()
         self.update_srt_start()
@@ -19,6 +19,23 @@ FRAME_SIZE = MAX_DISPLAY_X * MAX_DISPLAY_Y
 
 CONFIG_FILE_NAME = 'osd-dump-tools.ini'
 
+# overlay frames are numbered in 60 fps units
+OVERLAY_FPS = 60
+
+PIPE_FORMAT_PNG = 'png'
+PIPE_FORMAT_RGBA = 'rgba'
+PIPE_FORMAT_PAL8 = 'pal8'
+PIPE_FORMATS = (PIPE_FORMAT_PNG, PIPE_FORMAT_RGBA, PIPE_FORMAT_PAL8,)
+
+COMPOSITOR_PIL = 'pil'
+COMPOSITOR_NUMPY = 'numpy'
+COMPOSITORS = (COMPOSITOR_PIL, COMPOSITOR_NUMPY,)
+
+PRESCALE_OFF = 'off'
+PRESCALE_BILINEAR = 'bilinear'
+PRESCALE_NEAREST = 'nearest'
+PRESCALES = (PRESCALE_OFF, PRESCALE_BILINEAR, PRESCALE_NEAREST,)
+
 # TODO: replace with enum
 OSD_TYPE_DJI = 1
 OSD_TYPE_WS = 2
@@ -1,10 +1,18 @@
+import mmap
+import os
 import struct
 import pathlib
 from array import array
+from itertools import chain, islice
+from typing import Iterator
+
+import numpy as np
 
 from .config import Config
 from .dji_file_header import DJIFileHeader
-from .frame import Frame
+from .frame import Frame, FrameStore
+from .utils.mapped_pages import RELEASE_CHUNK, release_pages
+from .utils.osd_cache import load_cached_frames, save_cached_frames
 
 MIN_START_FRAME_NO: int = 20
 MAX_FRAME_SIZE: int = 2048
@@ -22,86 +30,180 @@ frame_header_struct_dji = struct.Struct("<II")
 # I unsigned int
 
 
-def _get_min_frame_idx(frames: list[Frame]) -> int:
+def _get_min_frame_idx(frame_idxs: list[int]) -> int:
     # frames idxes are in increasing order for most of time :)
 
-    for i in range(len(frames)):
-        n1 = frames[i].idx
-        n2 = frames[i+1].idx
+    for i in range(len(frame_idxs)):
+        n1 = frame_idxs[i]
+        n2 = frame_idxs[i+1]
         if n1 < n2:
             return n1
 
     raise ValueError("Frames are in wrong order")
 
 
-def read_dji_osd_header(osd_path: pathlib.Path) -> DJIFileHeader:
-    with open(osd_path, "rb") as dump_f:
-        file_header_data = dump_f.read(file_header_struct_dji.size)
-        file_header = file_header_struct_dji.unpack(file_header_data)
-        
-    return DJIFileHeader(file_header)
+def _iter_dji_index(buf: mmap.mmap, pos: int, verbatim: bool) -> Iterator[tuple[int, int, int]]:
+    """
+    Returns (frame idx, data offset, frame size) for every frame without duplicates
+    """
+    buf_size = len(buf)
+    last_idx = None
+
+    while pos < buf_size:
+        if pos + frame_header_struct_dji.size > buf_size:
+            print(f'Corrupted data, not all frames read. Last frame read: {last_idx}')
+            break
 
+        frame_idx, frame_size = frame_header_struct_dji.unpack_from(buf, pos)
+        pos += frame_header_struct_dji.size
 
-def read_dji_osd_frames(osd_path: pathlib.Path, verbatim: bool, cfg: Config) -> list[Frame]:
-    frames: list[Frame] = []
+        if frame_size > MAX_FRAME_SIZE:
+            print(f'Corrupted data, not all frames read. Frame size: {frame_size}. Last frame read: {last_idx}')
+            break
 
-    with open(osd_path, "rb") as dump_f:
-        file_header_data = dump_f.read(file_header_struct_dji.size)
-        file_header = file_header_struct_dji.unpack(file_header_data)
-        dji_file_header = DJIFileHeader(file_header)
+        data_size = frame_size * 2
+        if pos + data_size > buf_size:
+            print(f'Corrupted data, not all frames read. Frame size: {frame_size}. Last frame read: {last_idx}')
+            break
 
-        cfg.update_from_dji(dji_file_header)
+        if last_idx == frame_idx:
+            if verbatim:
+                print(f'Duplicate frame: {frame_idx}')
+        else:
+            last_idx = frame_idx
+            yield frame_idx, pos, frame_size
 
-        if verbatim:
-            print(f"file header:    {dji_file_header.file_header}")
-            print(f"file version:   {dji_file_header.file_version}")
-            print(f"char width:     {dji_file_header.char_width}")
-            print(f"char height:    {dji_file_header.char_height}")
-            print(f"font widtht:    {dji_file_header.font_width}")
-            print(f"font height:    {dji_file_header.font_height}")
-            print(f"x offset:       {dji_file_header.x_offset}")
-            print(f"y offset:       {dji_file_header.y_offset}")
-            print(f"font variant:   {dji_file_header.font_variant}")
+        pos += data_size
 
-        while True:
-            frame_header = dump_f.read(frame_header_struct_dji.size)
-            if len(frame_header) == 0:
-                break
 
-            frame_head = frame_header_struct_dji.unpack(frame_header)
-            frame_idx, frame_size = frame_head
+def _copy_cells(buf: mmap.mmap, offsets: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+    """
+    Copies frames data to (frames, max frame size) matrix
+    """
+    width = int(sizes.max())
+    record_size = frame_header_struct_dji.size + width * 2
+    distance = offsets - offsets[0]
 
-            if frame_size > MAX_FRAME_SIZE:
-                print(f'Corrupted data, not all frames read. Frame size: {frame_size}. Last frame read: {frames[-1].idx}')
-                break
+    if (sizes == width).all() and (distance % record_size == 0).all():
+        # all frames have same size, file body is viewed as matrix with frame headers skipped by stride
+        records = int(distance[-1] // record_size) + 1
+        body = np.frombuffer(buf, dtype='<u2', count=(records * record_size - frame_header_struct_dji.size) // 2, offset=int(offsets[0]))
+        matrix = np.lib.stride_tricks.as_strided(body, shape=(records, width), strides=(record_size, 2))
 
-            frame_data_struct = struct.Struct(f"<{frame_size}H")
-            frame_data = dump_f.read(frame_data_struct.size)
-            if len(frame_data) != frame_data_struct.size:
-                print(f'Corrupted data, not all frames read. Frame size: {frame_size}. Last frame read: {frames[-1].idx}')
-                break
+        return matrix[distance // record_size]
 
-            frame_data = array('H', frame_data)
-            if len(frames) > 0 and frames[-1].idx == frame_idx:
-                if verbatim:
-                    print(f'Duplicate frame: {frame_idx}')
-                continue
+    cells = np.zeros((len(offsets), width), dtype=np.uint16)
+    for row, (offset, frame_size) in enumerate(zip(offsets.tolist(), sizes.tolist())):
+        cells[row, :frame_size] = np.frombuffer(buf, dtype='<u2', count=frame_size, offset=offset)
 
-            if len(frames) > 0:
-                frames[-1].next_idx = frame_idx
+    return cells
 
-            frames.append(Frame(frame_idx, 0, frame_size, frame_data))
 
+def _start_frame(index: list[tuple[int, int, int]]) -> int:
     # remove initial random frames
-    start_frame = _get_min_frame_idx(frames)
+    start_frame = _get_min_frame_idx([frame_idx for frame_idx, _, _ in index])
 
     if start_frame > MIN_START_FRAME_NO:
         print(f'Wrong idx of initial frame {start_frame}, abort')
         raise ValueError(f'Wrong idx of initial frame {start_frame}, abort')
 
-    frames = frames[start_frame:]
-    zero_frame = []
+    return start_frame
+
+
+def _read_dji_frames(buf: mmap.mmap, verbatim: bool) -> FrameStore:
+    index = list(_iter_dji_index(buf, file_header_struct_dji.size, verbatim))
+    start_frame = _start_frame(index)
+
+    index = index[start_frame:]
+    # empty frame displayed before first frame
+    first = 1 if start_frame > 0 else 0
+    count = len(index) + first
+
+    idx = np.zeros(count, dtype=np.int64)
+    sizes = np.zeros(count, dtype=np.int64)
+    offsets = np.zeros(count, dtype=np.int64)
+    idx[first:], offsets[first:], sizes[first:] = np.array(index, dtype=np.int64).reshape(-1, 3).T
+
+    cells = _copy_cells(buf, offsets[first:], sizes[first:])
+    if first:
+        cells = np.concatenate((np.zeros((1, cells.shape[1]), dtype=np.uint16), cells))
+
+    next_idx = np.zeros(count, dtype=np.int64)
+    next_idx[:-1] = idx[1:]
+
+    return FrameStore(idx, next_idx, sizes, cells)
+
+
+def _apply_header(dji_file_header: DJIFileHeader, verbatim: bool, cfg: Config) -> None:
+    cfg.update_from_dji(dji_file_header)
+
+    if verbatim:
+        print(f"file header:    {dji_file_header.file_header}")
+        print(f"file version:   {dji_file_header.file_version}")
+        print(f"char width:     {dji_file_header.char_width}")
+        print(f"char height:    {dji_file_header.char_height}")
+        print(f"font widtht:    {dji_file_header.font_width}")
+        print(f"font height:    {dji_file_header.font_height}")
+        print(f"x offset:       {dji_file_header.x_offset}")
+        print(f"y offset:       {dji_file_header.y_offset}")
+        print(f"font variant:   {dji_file_header.font_variant}")
+
+
+def read_dji_osd_frames(
+    osd_path: pathlib.Path, buf: mmap.mmap, dji_file_header: DJIFileHeader, verbatim: bool, cfg: Config, stat: os.stat_result | None = None
+) -> FrameStore:
+    """
+    Memory mapped file (see open_osd) is indexed in single pass, then data of frames are copied to frame store,
+    parsed frames are cached (cfg.no_osd_cache disables it)
+    """
+    _apply_header(dji_file_header, verbatim, cfg)
+
+    if not cfg.no_osd_cache:
+        frames = load_cached_frames(osd_path, stat)
+        if frames is not None:
+            if verbatim:
+                print('OSD frames loaded from cache')
+            return frames
+
+    frames = _read_dji_frames(buf, verbatim)
+
+    if not cfg.no_osd_cache:
+        save_cached_frames(osd_path, frames, stat)
+
+    return frames
+
+
+def iter_dji_osd_frames(buf: mmap.mmap, dji_file_header: DJIFileHeader, verbatim: bool, cfg: Config) -> Iterator[Frame]:
+    """
+    Returns frames one by one as they are read from memory mapped file (see open_osd),
+    frame is returned when next one is read (next_idx is known), read part of file is released from memory
+    """
+    # config is updated before first frame is requested
+    _apply_header(dji_file_header, verbatim, cfg)
+
+    return _iter_dji_frames(buf, verbatim)
+
+
+def _iter_dji_frames(buf: mmap.mmap, verbatim: bool) -> Iterator[Frame]:
+    index = _iter_dji_index(buf, file_header_struct_dji.size, verbatim)
+    # initial random frames are checked only on beginning of file
+    head = list(islice(index, MIN_START_FRAME_NO + 2))
+    start_frame = _start_frame(head)
+
+    prev = None
     if start_frame > 0:
-        zero_frame = [Frame(0, frames[0].idx, 0, None)]
+        prev = Frame(0, 0, 0, None)
+
+    released = 0
+    for frame_idx, offset, frame_size in chain(head[start_frame:], index):
+        frame = Frame(frame_idx, 0, frame_size, array('H', buf[offset:offset + frame_size * 2]))
+        if prev is not None:
+            prev.next_idx = frame_idx
+            yield prev
+
+        prev = frame
+        if offset - released > RELEASE_CHUNK:
+            released = release_pages(buf, released, offset)
 
-    return zero_frame + frames
+    if prev is not None:
+        yield prev
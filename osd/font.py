@@ -1,11 +1,17 @@
+from collections import OrderedDict
+
+import numpy as np
 from PIL import Image
 
 from .const import HD_TILE_WIDTH, SD_TILE_WIDTH, HD_TILE_HEIGHT, SD_TILE_HEIGHT, TILES_PER_PAGE
 
+# rendered small font strings kept, srt values change about once a second
+SMALL_STRING_CACHE_SIZE = 256
+
 
 class Font:
-    __slots__ = 'tile_width', 'tile_height', 'small_font_scale', 'small_font_cache', 'img'
-    
+    __slots__ = 'tile_width', 'tile_height', 'small_font_scale', 'small_font_cache', 'small_string_cache', 'img', 'scaled_cache'
+
     def __init__(self, basename: str, is_hd: bool, small_font_scale: int):
         self.tile_width = SD_TILE_WIDTH
         self.tile_height = SD_TILE_HEIGHT
@@ -16,6 +22,8 @@ class Font:
 
         self.small_font_scale = small_font_scale
         self.small_font_cache = {}
+        self.small_string_cache = OrderedDict()
+        self.scaled_cache = {}
 
         self.img = self._load_pair(basename)
 
@@ -53,6 +61,17 @@ class Font:
             )
         )
 
+    def visible_glyphs(self) -> np.ndarray:
+        """
+        Returns True for every glyph code (0 - 0xFFFF) that has any visible pixel, codes outside of font are empty
+        """
+        alpha = np.asarray(self.img)[..., 3]
+        tiles_count = self.img.height // self.tile_height
+        visible = np.zeros(0x10000, dtype=bool)
+        visible[:tiles_count] = alpha[:tiles_count * self.tile_height].reshape(tiles_count, -1).any(axis=1)
+
+        return visible
+
     def get_small_font(self, key: int) -> Image.Image:
         if key in self.small_font_cache:
             return self.small_font_cache[key]
@@ -64,3 +83,58 @@ class Font:
         self.small_font_cache[key] = small_tile
 
         return small_tile
+
+    def get_small_string(self, txt: str) -> Image.Image:
+        """
+        Returns txt rendered in small font as one image, same as pasting small glyphs side by side
+        """
+        img = self.small_string_cache.get(txt)
+        if img is not None:
+            self.small_string_cache.move_to_end(txt)
+            return img
+
+        tiles = [self.get_small_font(ord(c)) for c in txt]
+        tile_width = int(self.tile_width * self.small_font_scale)
+        img = Image.new("RGBA", (tile_width * len(txt), tiles[0].height if tiles else 0))
+        for n, tile in enumerate(tiles):
+            img.paste(tile, (n * tile_width, 0))
+
+        self.small_string_cache[txt] = img
+        if len(self.small_string_cache) > SMALL_STRING_CACHE_SIZE:
+            self.small_string_cache.popitem(last=False)
+
+        return img
+
+    def scaled(self, tile_width: int, tile_height: int, nearest: bool = False) -> 'Font':
+        """
+        Returns font with every tile resized to tile_width x tile_height,
+        nearest neighbour is used only when both sizes are integer multiples of current tile
+        """
+        nearest = nearest and self.is_integer_scale(tile_width, tile_height)
+        key = (tile_width, tile_height, nearest)
+        if key in self.scaled_cache:
+            return self.scaled_cache[key]
+
+        resample = Image.Resampling.NEAREST if nearest else Image.Resampling.BILINEAR
+        tiles_count = self.img.height // self.tile_height
+
+        img = Image.new("RGBA", (tile_width, tile_height * tiles_count))
+        for n in range(tiles_count):
+            # tiles are resized one by one so neighbour glyphs don't bleed into each other
+            img.paste(self[n].resize((tile_width, tile_height), resample), (0, n * tile_height))
+
+        font = Font.__new__(Font)
+        font.tile_width = tile_width
+        font.tile_height = tile_height
+        font.small_font_scale = self.small_font_scale
+        font.small_font_cache = {}
+        font.small_string_cache = OrderedDict()
+        font.scaled_cache = {}
+        font.img = img
+
+        self.scaled_cache[key] = font
+
+        return font
+
+    def is_integer_scale(self, tile_width: int, tile_height: int) -> bool:
+        return tile_width % self.tile_width == 0 and tile_height % self.tile_height == 0
@@ -1,5 +1,10 @@
-from dataclasses import dataclass
+from __future__ import annotations
+
+from dataclasses import dataclass, fields
 from array import array
+from typing import Iterator
+
+import numpy as np
 
 
 @dataclass(slots=True)
@@ -7,7 +12,64 @@ class Frame:
     idx: int
     next_idx: int
     size: int
-    data: array
+    data: array | memoryview
+
+
+class FrameStore:
+    """
+    Columnar storage of osd frames, glyph codes of all frames are in one (frames, cells) uint16 matrix,
+    items are returned as Frame with data being view of matrix row
+    """
+    __slots__ = 'idx', 'next_idx', 'sizes', 'cells'
+
+    def __init__(self, idx: np.ndarray, next_idx: np.ndarray, sizes: np.ndarray, cells: np.ndarray):
+        self.idx = idx
+        self.next_idx = next_idx
+        self.sizes = sizes
+        self.cells = cells
+
+    @classmethod
+    def from_frames(cls, frames: list[Frame]) -> FrameStore:
+        width = max((len(frame.data) for frame in frames if frame.data is not None), default=0)
+        cells = np.zeros((len(frames), width), dtype=np.uint16)
+        for row, frame in zip(cells, frames):
+            if frame.data is not None:
+                row[:len(frame.data)] = frame.data
+
+        return cls(
+            np.array([frame.idx for frame in frames], dtype=np.int64),
+            np.array([frame.next_idx for frame in frames], dtype=np.int64),
+            np.array([frame.size for frame in frames], dtype=np.int64),
+            cells,
+        )
+
+    def __len__(self) -> int:
+        return len(self.idx)
+
+    def __getitem__(self, key: int | slice) -> Frame | FrameStore:
+        if isinstance(key, slice):
+            return FrameStore(self.idx[key], self.next_idx[key], self.sizes[key], self.cells[key])
+
+        size = int(self.sizes[key])
+        # empty frame (i.e. before first frame in file) has no data
+        data = memoryview(self.cells[key]) if size else None
+
+        return Frame(int(self.idx[key]), int(self.next_idx[key]), size, data)
+
+    def __iter__(self) -> Iterator[Frame]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def find(self, frame_no: int) -> int | None:
+        """
+        Returns position of frame displayed in video frame frame_no
+        """
+        pos = int(np.searchsorted(self.idx, frame_no, side='right')) - 1
+        if pos >= 0 and self.idx[pos] <= frame_no < self.next_idx[pos]:
+            return pos
+
+        return None
+
 
 @dataclass(slots=True)
 class SrtFrame:
@@ -26,3 +88,43 @@ class SrtFrame:
     uavbatcells: int = 0
     glsbatcells: int = 0
     rcsignal: int = 0
+
+
+# SrtFrame fields parsed from subtitle text
+SRT_FIELDS = tuple(field.name for field in fields(SrtFrame) if field.name not in ('start_time', 'idx'))
+
+
+class SrtStore:
+    """
+    Columnar storage of srt frames, every SrtFrame field is numpy column (value and flag if it was integer),
+    items are returned as SrtFrame
+    """
+    __slots__ = 'start_time', 'idx', 'values', 'ints'
+
+    def __init__(self, start_time: np.ndarray, idx: np.ndarray, values: dict[str, np.ndarray], ints: dict[str, np.ndarray]):
+        self.start_time = start_time
+        self.idx = idx
+        self.values = values
+        self.ints = ints
+
+    def __len__(self) -> int:
+        return len(self.idx)
+
+    def __getitem__(self, key: int | slice) -> SrtFrame | SrtStore:
+        if isinstance(key, slice):
+            return SrtStore(
+                self.start_time[key], self.idx[key],
+                {name: column[key] for name, column in self.values.items()},
+                {name: column[key] for name, column in self.ints.items()},
+            )
+
+        items = {
+            name: int(self.values[name][key]) if self.ints[name][key] else float(self.values[name][key])
+            for name in SRT_FIELDS
+        }
+
+        return SrtFrame(int(self.start_time[key]), int(self.idx[key]), **items)
+
+    def __iter__(self) -> Iterator[SrtFrame]:
+        for i in range(len(self)):
+            yield self[i]
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+
+import numpy as np
+
+from .config import Config
+from .const import PIPE_FORMAT_PNG
+from .font import Font
+from .frame import Frame, FrameStore, SrtFrame, SrtStore
+from .utils.privacy_mask import MaskTable
+from .utils.timeline import Timeline
+
+# max number of timeline segments in one shard sent to worker
+SHARD_SIZE = 256
+# max size of encoded frames of one shard, whole shard is returned from worker at once
+SHARD_BYTES = 32 * 1024 * 1024
+
+_worker_renderer = None
+
+
+def _init_worker(
+    font: Font, cfg: Config, osd_type: int, frames: list[Frame] | FrameStore, srt_frames: SrtStore | list[SrtFrame],
+    shown_rows: np.ndarray, masks: MaskTable | None, dynamic_cells: tuple[np.ndarray, np.ndarray],
+) -> None:
+    # imported here to avoid circular import, render imports this module lazily
+    from .render import get_renderer
+
+    global _worker_renderer
+
+    # one renderer (and prescaled font) per worker, screen of segment doesn't depend on previously drawn segments
+    _worker_renderer = get_renderer(osd_type)(font, cfg, osd_type, frames, srt_frames)
+    # frame states are resolved once for whole flight in main process
+    _worker_renderer.shown_rows = shown_rows
+    _worker_renderer.masks = masks
+    _worker_renderer.dynamic_cells = dynamic_cells
+
+
+def _render_shard(shard: Timeline) -> list[tuple[int, int, bytes]]:
+    # shards come in any order, first segment is drawn whole (and without srt of other shard)
+    _worker_renderer.screen = None
+    return list(_worker_renderer._render_ranges(shard))
+
+
+def shard_size(cfg: Config) -> int:
+    """
+    Segments in one shard, encoded frames of shard (raw rgba size for png) fit in SHARD_BYTES
+    """
+    width, height = cfg.pipe_size()
+    frame_bytes = width * height * 4
+    return max(1, min(SHARD_SIZE, SHARD_BYTES // max(frame_bytes, 1)))
+
+
+def pending_shards(cfg: Config, jobs: int) -> int:
+    """
+    Shards rendered or waiting for writing at once, raw frames are big, so fewer of them wait
+    """
+    return jobs * 2 if cfg.pipe_format == PIPE_FORMAT_PNG else jobs + 1
+
+
+def shards(timeline: Timeline, size: int = SHARD_SIZE) -> Iterator[Timeline]:
+    """
+    Splits timeline to parts rendered by workers, srt frame shown in every segment is resolved first
+    """
+    timeline = timeline.shown_srt()
+    for start in range(0, len(timeline), size):
+        yield timeline[start:start + size]
+
+
+def render_ranges_parallel(renderer, timeline: Timeline, jobs: int) -> Iterator[tuple[int, int, bytes]]:
+    """
+    Renders shards in worker processes, results are returned in order
+    """
+    renderer.precompute()
+    params = (
+        renderer.source_font, renderer.cfg, renderer.osd_type, renderer.frames, renderer.srt_frames,
+        renderer.shown_rows, renderer.masks, renderer.dynamic_cells,
+    )
+
+    executor = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=params)
+    try:
+        # futures are consumed in submit order, so queue works as reorder buffer,
+        # number of pending shards is limited to keep memory usage low
+        pending = deque()
+        max_pending = pending_shards(renderer.cfg, jobs)
+        for shard in shards(timeline, shard_size(renderer.cfg)):
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+
+            pending.append(executor.submit(_render_shard, shard))
+
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        # render can be stopped before all shards are consumed (e.g. ffmpeg error)
+        executor.shutdown(cancel_futures=True)
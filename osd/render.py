@@ -1,5 +1,13 @@
+import os
+import sys
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
+from hashlib import blake2b
 from io import BytesIO
+from typing import Iterable, Iterator
+
+import numpy as np
 from PIL import Image
 
 from .const import (
@@ -8,18 +16,52 @@ from .const import (
     HD_TILE_HEIGHT,
     SD_TILE_HEIGHT,
     OSD_TYPE_DJI,
+    OVERLAY_FPS,
+    PIPE_FORMAT_PAL8,
+    PIPE_FORMAT_RGBA,
+    COMPOSITOR_NUMPY,
+    PRESCALE_OFF,
+    PRESCALE_NEAREST,
     ArduParams,
     InavParams,
 )
 from .font import Font
-from .frame import Frame, SrtFrame
+from .compositor import NumpyCompositor
+from .frame import Frame, FrameStore, SrtFrame, SrtStore
 from .config import Config
+from .utils.mkv import MkvWriter
+from .utils.frame_cache import FrameCache
+from .utils.privacy_mask import (
+    NO_MASKS,
+    NO_POSITION,
+    NO_ROW,
+    FrameMasks,
+    MaskTable,
+    find_masks,
+    find_stats_screens,
+    resolve_masks,
+    shown_rows,
+)
+from .utils.static_cells import dynamic_cells, update_cell_range
+from .utils.timeline import NO_SRT, Timeline
 
 INTERNAL_W_H_DJI = (60, 22)
 INTERNAL_W_H_WS = (53, 20)
 
 NO_OSD_DATA = "NO OSD DATA"
 
+PAL8_COLORS = 256
+
+# srt line is cleared with this many spaces before text is drawn
+SRT_CLEAR_CHARS = 22
+
+# encode threads used when not set in config
+AUTO_ENCODE_THREADS = 4
+# encoded frames waiting for writing per encode thread
+ENCODE_QUEUE_PER_THREAD = 4
+# frames searched for items to hide (and stats screens) at once
+MASK_CHUNK_FRAMES = 4096
+
 
 @dataclass(slots=True)
 class HiddenItemsCache:
@@ -28,22 +70,56 @@ class HiddenItemsCache:
     alt: tuple[int, int] | None = None
     dist: tuple[int, int] | None = None
 
+    def resolve(self, found: FrameMasks) -> FrameMasks:
+        """
+        Remembers positions of items found on frame, returns masks drawn on it (same as resolve_masks)
+        """
+        self.gps_lat = found.gps_lat or self.gps_lat
+        self.gps_lon = found.gps_lon or self.gps_lon
+        self.dist = found.dist or self.dist
+        self.alt = found.alt or self.alt
+
+        alt = self.alt if found.hide_alt else None
+        # if any of items is on frame, cached positions are used to be sure that all are hidden
+        if found.gps_lat or found.gps_lon or found.dist:
+            return FrameMasks(self.gps_lat, self.gps_lon, self.dist, alt, found.hide_alt)
+
+        return FrameMasks(None, None, None, alt, found.hide_alt)
+
 
 class BaseRenderer:
     __slots__ = (
         "font",
+        "source_font",
         "cfg",
         "osd_type",
         "frames",
         "srt_frames",
         "tile_width",
         "tile_height",
-        "masking_tile",
+        "masking_code",
+        "mask_strips",
+        "cell_fonts",
+        "grid_size",
         "exclusions",
         "display_width",
         "display_height",
         "final_img_size",
         "no_data",
+        "compositor",
+        "overlay_img",
+        "overlay_location",
+        "frame_cache",
+        "srt_state",
+        "mask_state",
+        "screen",
+        "last_codes",
+        "covered",
+        "pastes",
+        "masks",
+        "shown_rows",
+        "dynamic_cells",
+        "visible_cells",
     )
 
     def __init__(
@@ -51,14 +127,16 @@ class BaseRenderer:
         font: Font,
         cfg: Config,
         osd_type: int,
-        frames: list[Frame],
-        srt_frames: list[SrtFrame],
+        frames: list[Frame] | FrameStore,
+        srt_frames: SrtStore | list[SrtFrame],
         reset_cache: bool = False,
     ) -> None:
         if reset_cache:
             self._items_cache = HiddenItemsCache()
 
         self.font = font
+        # font as loaded, before prescaling, used by render workers
+        self.source_font = font
         self.cfg = cfg
         self.osd_type = osd_type
         self.frames = frames
@@ -72,12 +150,6 @@ class BaseRenderer:
             self.tile_width = SD_TILE_WIDTH
             self.tile_height = SD_TILE_HEIGHT
 
-        masking_font_no = ord(" ")
-        if self.cfg.testrun:
-            masking_font_no = ord("X")
-
-        self.masking_tile = self.font[masking_font_no]
-
         self.exclusions = InavParams
         if self.cfg.ardu:
             self.exclusions = (
@@ -89,75 +161,367 @@ class BaseRenderer:
 
         self.final_img_size = (self.cfg.target_width, self.cfg.target_height)
 
-        self.base_img = Image.new(
-            "RGBA",
-            (
-                self.display_width * self.tile_width,
-                self.display_height * self.tile_height,
-            ),
+        self.overlay_img = self.cfg.overlay_img
+        self.overlay_location = self.cfg.overlay_location
+
+        # pixels spanned by display cells, cell (x, y) starts at (cell_x(x), cell_y(y))
+        self.grid_size = (
+            self.display_width * self.tile_width,
+            self.display_height * self.tile_height,
+        )
+        # font for every (width, height) of cells, cells differ in size only when font is prescaled
+        self.cell_fonts = {(self.tile_width, self.tile_height): self.font}
+        if self.cfg.prescale != PRESCALE_OFF:
+            self._prescale()
+
+        self.masking_code = ord(" ")
+        if self.cfg.testrun:
+            self.masking_code = ord("X")
+
+        self.mask_strips: dict[tuple, Image.Image] = {}
+
+        self.base_img = Image.new("RGBA", self.grid_size)
+
+        self.compositor = None
+        if self.cfg.compositor == COMPOSITOR_NUMPY:
+            self.compositor = NumpyCompositor(
+                self.font, self.display_width, self.display_height, self.grid_size, self.cell_fonts
+            )
+
+        # glyph codes on canvas, None when no osd frame is drawn
+        self.last_codes: np.ndarray | None = None
+        # areas pasted over osd glyphs (x0, y0, x1, y1), restored before next screen is drawn
+        self.covered: list[tuple[int, int, int, int]] = []
+        # images pasted when screen is drawn
+        # images pasted to every covered area, kept until next screen to find unchanged areas
+        self.pastes: list[list[tuple[Image.Image, tuple[int, int]]]] = []
+
+        # what is on canvas besides osd glyphs, part of frame cache key
+        self.srt_state: tuple | None = None
+        self.mask_state: FrameMasks = NO_MASKS
+        # (osd row or frame in stream mode, masks, srt row) drawn by last segment
+        self.screen: tuple | None = None
+
+        # osd row shown for every row of frame store (stats screen leaves previous one) and masks drawn
+        # on it, resolved for whole flight when first needed
+        self.shown_rows: np.ndarray | None = None
+        self.masks: MaskTable | None = None
+        # (ys, xs) of cells that change during flight, None when frames are not known up front
+        self.dynamic_cells: tuple[np.ndarray, np.ndarray] | None = None
+        # cells showing visible glyph on any frame
+        self.visible_cells: np.ndarray | None = None
+
+        self.frame_cache = None
+        if self.cfg.frame_cache > 0:
+            self.frame_cache = FrameCache(self.cfg.frame_cache * 1024 * 1024)
+
+    def _prescale(self) -> None:
+        """
+        Font (and overlay) are scaled once to output resolution, so frames are composed
+        directly in final size and don't need resizing. Cells span whole output like in resized
+        frame, when output size is not multiple of display size cells differ in size by one pixel
+        """
+        scale_x = self.final_img_size[0] / self.grid_size[0]
+        scale_y = self.final_img_size[1] / self.grid_size[1]
+        self.grid_size = self.final_img_size
+
+        nearest = self.cfg.prescale == PRESCALE_NEAREST
+        widths = set(np.diff(self.cell_x(np.arange(self.display_width + 1))).tolist())
+        heights = set(np.diff(self.cell_y(np.arange(self.display_height + 1))).tolist())
+        cell_sizes = [(width, height) for width in sorted(widths) for height in sorted(heights)]
+
+        if nearest and not all(self.font.is_integer_scale(*size) for size in cell_sizes) and self.cfg.verbatim:
+            sizes = ", ".join(f"{width}x{height}" for width, height in cell_sizes)
+            print(f'Tile {sizes} is not integer multiple of font tile, bilinear scaling used')
+
+        self.cell_fonts = {size: self.font.scaled(*size, nearest) for size in cell_sizes}
+        # smallest cells, used for srt text
+        self.tile_width, self.tile_height = cell_sizes[0]
+        self.font = self.cell_fonts[cell_sizes[0]]
+
+        if self.overlay_img:
+            overlay_size = (
+                max(1, round(self.overlay_img.width * scale_x)),
+                max(1, round(self.overlay_img.height * scale_y)),
+            )
+            self.overlay_img = self.overlay_img.resize(overlay_size, Image.Resampling.BILINEAR)
+            self.overlay_location = (
+                round(self.overlay_location[0] * scale_x),
+                round(self.overlay_location[1] * scale_y),
+            )
+
+    def final_image(self) -> Image.Image:
+        """
+        Returns osd image in output resolution
+        """
+        return self.to_final_size(self.canvas_image())
+
+    def to_final_size(self, img: Image.Image) -> Image.Image:
+        """
+        Resizes canvas to output size, only crop box of it is returned when overlay is cropped
+        """
+        if img.size != self.final_img_size:
+            img = img.resize(self.final_img_size, Image.Resampling.BILINEAR)
+
+        if self.cfg.crop_box:
+            img = img.crop(self.cfg.crop_box)
+
+        return img
+
+    def content_box(self) -> tuple[int, int, int, int]:
+        """
+        Returns part of output frame (x0, y0, x1, y1) where anything is drawn during flight: visible glyphs,
+        masks, srt text and overlay image, coordinates are even so chroma of cropped overlay is not shifted
+        """
+        self.precompute()
+        boxes = []
+
+        ys, xs = np.nonzero(self.visible_cells)
+        if len(ys):
+            boxes.append((int(xs.min()), int(ys.min()), int(xs.max()) + 1, int(ys.max()) + 1))
+
+        if self.masks is not None:
+            positions = self.masks.positions
+            lengths = (self.exclusions.GPS_LEN, self.exclusions.GPS_LEN, self.exclusions.HOME_LEN)
+            for item, length in enumerate(lengths):
+                xs, ys = positions[positions[:, item, 0] != NO_POSITION, item].T
+                if len(xs):
+                    boxes.append((int(xs.min()), int(ys.min()), int(xs.max()) + length + 1, int(ys.max()) + 1))
+
+            xs, ys = positions[positions[:, 3, 0] != NO_POSITION, 3].T
+            if len(xs):
+                boxes.append((int(xs.min()) - self.exclusions.ALT_LEN, int(ys.min()), int(xs.max()) + 1, int(ys.max()) + 1))
+
+        # boxes above are in cells, text and overlay in pixels
+        boxes = [(self.cell_x(x0), self.cell_y(y0), self.cell_x(x1), self.cell_y(y1)) for x0, y0, x1, y1 in boxes]
+
+        width, height = self.canvas_size()
+        text_step = int(self.tile_width * self.cfg.srt_font_scale)
+        text_height = self.font.get_small_font(ord(" ")).height
+        frames = self.frames if isinstance(self.frames, FrameStore) else FrameStore.from_frames(self.frames)
+        if (frames.sizes == 0).any():
+            boxes.append((0, 0, len(NO_OSD_DATA) * text_step, text_height))
+
+        if len(self.srt_frames) and self.cfg.srt_data:
+            x, y = self.cfg.srt_start_location
+            if y < 0:
+                y += self.display_height
+            # longest srt line, line is cleared before it is drawn
+            chars = max(sum(len(txt) + 1 for txt in self.srt_texts(srt_frame)) - 1 for srt_frame in self.srt_frames)
+            chars = max(chars, SRT_CLEAR_CHARS)
+            boxes.append((x * text_step, self.cell_y(y), (x + chars) * text_step, self.cell_y(y) + text_height))
+
+        if self.overlay_img:
+            x, y = self.overlay_location
+            boxes.append((x, y, x + self.overlay_img.width, y + self.overlay_img.height))
+
+        if not boxes:
+            return 0, 0, 2, 2
+
+        x0, y0 = min(box[0] for box in boxes), min(box[1] for box in boxes)
+        x1, y1 = max(box[2] for box in boxes), max(box[3] for box in boxes)
+
+        final_width, final_height = self.final_img_size
+        if (width, height) != self.final_img_size:
+            # bilinear resize spreads pixels to neighbours, margin is bigger than filter support
+            mx, my = -(-width // final_width) + 1, -(-height // final_height) + 1
+            x0, x1 = (x0 - mx) * final_width // width, -(-(x1 + mx) * final_width // width)
+            y0, y1 = (y0 - my) * final_height // height, -(-(y1 + my) * final_height // height)
+
+        x0, y0 = max(x0, 0) & ~1, max(y0, 0) & ~1
+        x1, y1 = min(x1 + (x1 & 1), final_width), min(y1 + (y1 & 1), final_height)
+        if x0 >= x1 or y0 >= y1:
+            return 0, 0, 2, 2
+
+        return x0, y0, x1, y1
+
+    def paste(self, img: Image.Image, xy: tuple[int, int]) -> None:
+        """
+        Pastes image over osd glyphs when screen is drawn, area is restored from glyphs before next screen
+        """
+        self._cover(xy[0], xy[1], xy[0] + img.width, xy[1] + img.height)
+        self.pastes[-1].append((img, xy))
+
+    def _paste(self, img: Image.Image, xy: tuple[int, int]) -> None:
+        if self.compositor:
+            self.compositor.paste(img, xy)
+        else:
+            self.base_img.paste(img, xy)
+
+    def _cover(self, x0: int, y0: int, x1: int, y1: int) -> None:
+        # neighbour tiles of string or mask are joined to one area, every pixel of it is pasted
+        if self.covered:
+            px0, py0, px1, py1 = self.covered[-1]
+            if (py0, py1) == (y0, y1) and x0 <= px1 and px0 <= x1:
+                self.covered[-1] = (min(x0, px0), y0, max(x1, px1), y1)
+                return
+
+        self.covered.append((x0, y0, x1, y1))
+        self.pastes.append([])
+
+    def _clear(self, box: tuple[int, int, int, int] | None = None) -> None:
+        if self.compositor:
+            self.compositor.clear(box)
+        else:
+            self.base_img.paste((0, 0, 0, 0), box or (0, 0) + self.base_img.size)
+
+    def _restore_covered(self, previous: list[tuple[int, int, int, int]]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Clears areas covered by previous screen that are not pasted again, returns (internal_height, internal_width)
+        masks of cells to redraw and of cells inside areas pasted on this screen, that are not drawn
+        """
+        shape = (self.internal_height, self.internal_width)
+        redraw = np.zeros(shape, dtype=bool)
+        inside = np.zeros(shape, dtype=bool)
+        for box in self.covered:
+            inside[self._cells_inside(box)] = True
+
+        pasted = set(self.covered)
+        width, height = self.canvas_size()
+        for box in previous:
+            if box in pasted:
+                # all pixels of same area are replaced again
+                continue
+
+            x0, y0, x1, y1 = box
+            x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1, width), min(y1, height)
+            if x0 >= x1 or y0 >= y1:
+                continue
+
+            self._clear((x0, y0, x1, y1))
+            redraw[self._cells_touched((x0, y0, x1, y1))] = True
+
+        return redraw, inside
+
+    def _paste_covered(self, previous: dict, changed: np.ndarray | None) -> None:
+        """
+        Pastes images of covered areas, area pasted with same images on previous screen is kept
+        when no pixel of it was changed and it doesn't overlap other areas
+        """
+        for i, (box, pastes) in enumerate(zip(self.covered, self.pastes)):
+            if changed is not None and self._same_pastes(previous.get(box), pastes) and not self._touches(box, changed):
+                if not any(j != i and self._overlap(box, other) for j, other in enumerate(self.covered)):
+                    continue
+
+            for img, xy in pastes:
+                self._paste(img, xy)
+
+    @staticmethod
+    def _same_pastes(previous: list | None, pastes: list) -> bool:
+        # images are compared by identity, previous ones are still referenced so ids are not reused
+        return previous is not None and len(previous) == len(pastes) and all(
+            img is prev_img and xy == prev_xy for (img, xy), (prev_img, prev_xy) in zip(pastes, previous)
+        )
+
+    def _touches(self, box: tuple[int, int, int, int], cells: np.ndarray) -> bool:
+        return bool(cells[self._cells_touched(box)].any())
+
+    def cell_x(self, col):
+        """
+        Returns x of first pixel of cell column (works for numpy arrays of columns too)
+        """
+        return col * self.grid_size[0] // self.display_width
+
+    def cell_y(self, row):
+        return row * self.grid_size[1] // self.display_height
+
+    def _cells_inside(self, box: tuple[int, int, int, int]) -> tuple[slice, slice]:
+        """
+        Returns (rows, cols) of cells whose all pixels are inside of (x0, y0, x1, y1) box
+        """
+        x0, y0, x1, y1 = box
+        (width, height), cols, rows = self.grid_size, self.display_width, self.display_height
+        return (
+            slice(max(-(-y0 * rows // height), 0), max(((y1 + 1) * rows - 1) // height, 0)),
+            slice(max(-(-x0 * cols // width), 0), max(((x1 + 1) * cols - 1) // width, 0)),
+        )
+
+    def _cells_touched(self, box: tuple[int, int, int, int]) -> tuple[slice, slice]:
+        """
+        Returns (rows, cols) of cells with any pixel inside of (x0, y0, x1, y1) box
+        """
+        x0, y0, x1, y1 = box
+        (width, height), cols, rows = self.grid_size, self.display_width, self.display_height
+        return (
+            slice(max(((y0 + 1) * rows - 1) // height, 0), max((y1 * rows - 1) // height + 1, 0)),
+            slice(max(((x0 + 1) * cols - 1) // width, 0), max((x1 * cols - 1) // width + 1, 0)),
         )
 
-        self.last_frame = Frame(
-            0, 0, 0, [0] * (self.internal_height * self.internal_width)
+    @staticmethod
+    def _overlap(a: tuple[int, int, int, int], b: tuple[int, int, int, int]) -> bool:
+        return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+    def canvas_size(self) -> tuple[int, int]:
+        if self.compositor:
+            height, width = self.compositor.canvas.shape[:2]
+            return width, height
+
+        return self.base_img.size
+
+    def canvas_image(self) -> Image.Image:
+        """
+        Returns current osd image, it changes when next frame is drawn
+        """
+        if self.compositor:
+            return self.compositor.image()
+
+        return self.base_img
+
+    def snapshot(self) -> Image.Image:
+        """
+        Returns copy of current osd image that is not changed by drawing
+        """
+        if self.compositor:
+            return self.compositor.image(copy=True)
+
+        return self.base_img.copy()
+
+    def _mask_strip(self, x: int, y: int, length: int) -> Image.Image:
+        """
+        Masking tile repeated over length cells from (x, y), pasted at once instead of tile by tile
+        """
+        widths = tuple(self.cell_x(col + 1) - self.cell_x(col) for col in range(x, x + length))
+        height = self.cell_y(y + 1) - self.cell_y(y)
+        strip = self.mask_strips.get((widths, height))
+        if strip is None:
+            strip = Image.new("RGBA", (sum(widths), height))
+            offset = 0
+            for width in widths:
+                strip.paste(self.cell_fonts[(width, height)][self.masking_code], (offset, 0))
+                offset += width
+            self.mask_strips[(widths, height)] = strip
+
+        return strip
+
+    def hide_items(self, masks: FrameMasks) -> None:
+        items = (
+            (masks.gps_lat, self.exclusions.GPS_LEN),
+            (masks.gps_lon, self.exclusions.GPS_LEN),
+            (masks.dist, self.exclusions.HOME_LEN),
         )
+        for position, length in items:
+            if position:
+                x, y = position
+                self.paste(self._mask_strip(x, y, length + 1), (self.cell_x(x), self.cell_y(y),),)
 
-    def hide_items(self) -> None:
-        if self._items_cache.gps_lat:
-            for i in range(self.exclusions.GPS_LEN + 1):
-                x = (self._items_cache.gps_lat[0] + i) * self.tile_width
-                y = self._items_cache.gps_lat[1] * self.tile_height
-                self.base_img.paste(
-                    self.masking_tile,
-                    (
-                        x,
-                        y,
-                    ),
-                )
-
-        if self._items_cache.gps_lon:
-            for i in range(self.exclusions.GPS_LEN + 1):
-                x = (self._items_cache.gps_lon[0] + i) * self.tile_width
-                y = self._items_cache.gps_lon[1] * self.tile_height
-                self.base_img.paste(
-                    self.masking_tile,
-                    (
-                        x,
-                        y,
-                    ),
-                )
-
-        if self._items_cache.dist:
-            for i in range(self.exclusions.HOME_LEN + 1):
-                x = (self._items_cache.dist[0] + i) * self.tile_width
-                y = self._items_cache.dist[1] * self.tile_height
-                self.base_img.paste(
-                    self.masking_tile,
-                    (
-                        x,
-                        y,
-                    ),
-                )
-
-    def hide_alt(self, frame: Frame) -> None:
-        if self._items_cache.alt:
-            #self.char_writer(frame, self._items_cache.alt[0], self._items_cache.alt[1], ord('X'))
-            for i in range(self.exclusions.ALT_LEN + 1):
-                x = (self._items_cache.alt[0] - i) * self.tile_width
-                y = self._items_cache.alt[1] * self.tile_height
-                self.base_img.paste(self.masking_tile, (x, y,),)
+    def hide_alt(self, masks: FrameMasks) -> None:
+        if masks.alt:
+            x = masks.alt[0] - self.exclusions.ALT_LEN
+            y = masks.alt[1]
+            self.paste(self._mask_strip(x, y, self.exclusions.ALT_LEN + 1), (self.cell_x(x), self.cell_y(y),),)
 
     def draw_str(self, x: int, y: int, txt: str) -> None:
+        if not txt:
+            return
+
         tile_step = int(self.tile_width * self.cfg.srt_font_scale)
-        for n, c in enumerate(txt):
-            tile = self.font.get_small_font(ord(c))
-            x_pos = x + n
-            self.base_img.paste(
-                tile,
-                (
-                    x_pos * tile_step,
-                    y * self.tile_height,
-                ),
-            )
+        self.paste(
+            self.font.get_small_string(txt),
+            (
+                x * tile_step,
+                self.cell_y(y),
+            ),
+        )
 
     @staticmethod
     def fmt_float(txt: str) -> str:
@@ -178,8 +542,20 @@ class BaseRenderer:
         if y < 0:  # location from screen bottom
             y += self.display_height
 
-        self.draw_str(x, y, " " * 22)
+        self.draw_str(x, y, " " * SRT_CLEAR_CHARS)
 
+        srt_state = self.srt_texts(srt_frame)
+        for txt in srt_state:
+            self.draw_str(x, y, txt)
+            x += len(txt) + 1
+
+        self.srt_state = srt_state
+
+    def srt_texts(self, srt_frame: SrtFrame) -> tuple[str, ...]:
+        """
+        Returns formatted srt items of frame, they are drawn separated by one space
+        """
+        texts = []
         for srt_item in self.cfg.srt_data:
             fmt_str = f"{srt_item.upper()}:{{}}"
             if srt_item in self.cfg.srt_fmt:
@@ -188,180 +564,361 @@ class BaseRenderer:
             txt = fmt_str.format(data)
             if not self.cfg.ardu and "." in txt:
                 txt = self.fmt_float(txt)
-
-            self.draw_str(x, y, txt)
-            x += len(txt) + 1
-
-    def char_reader(frame: Frame, x: int, y: int) -> str:
-        pass
-
-    def char_writer(self, frame, x, y, c: int) -> None:
-        pass
-
-    def get_float_from_osd(self, frame: Frame, x: int, y: int, mult) -> int:
-        ch = self.char_reader(frame, x, y)
-        buf = []
-        while ch != 0x20 and ch != 0x00 and x >= 0:
-
-            if 0xA1 <= ch <= 0xAA:
-                ch -= 0xA1 - 0x30
-                buf.append('.')
-            if 0xB1 <= ch <= 0xBA:
-                ch -= 0xB1 - 0x30
-            buf.append(chr(ch))
-            x -= 1
-            ch = self.char_reader(frame, x, y)
-
-        buf.reverse()
-        result = float("".join(buf)) * mult
-
-        return result
-
-    def get_str_from_osd(self, frame: Frame, x: int, y: int, length: int) -> str:
-        buf = []
-        for col in range(x, x + length):
-            ch = self.char_reader(frame, col, y)
-            buf.append(chr(ch))
-
-        return "".join(buf)
-
-    def draw_frame(self, frame: Frame, test_render: bool = False) -> None:
-        if frame.size == 0:  # empty frame
+            texts.append(txt)
+
+        return tuple(texts)
+
+    def draw_screen(self, frame: Frame | None, masks: FrameMasks, srt_row: int) -> None:
+        """
+        Draws osd frame (None when no frame is shown yet) with masks, overlay and srt frame, result
+        depends only on arguments: areas covered by previous screen are restored from glyphs first
+        """
+        no_data = frame is not None and frame.size == 0
+        codes = self.frame_grid(frame) if frame is not None and not no_data else None
+
+        # areas pasted over glyphs are known before glyphs are drawn, glyphs under them are skipped
+        previous, self.covered = self.covered, []
+        previous_pastes, self.pastes = self.pastes, []
+        if no_data:
             self.draw_str(0, 0, NO_OSD_DATA)
-            self.no_data = True
-            return self.base_img
-
-        c1 = self.char_reader(frame, 15, 1)
-        c2 = self.char_reader(frame, 15, 2)
-        if not test_render and self.cfg.hide_stats and chr(c1) == "S" or chr(c2) == "S":
-            y = 1 if chr(c1) == "S" else 2
-            stats = self.get_str_from_osd(frame, 15, y, 5)
-            if stats == "STATS":
-                return
-
-        gps_lat: tuple[int, int] | None = None
-        gps_lon: tuple[int, int] | None = None
-        hide_alt = False
-        dist: tuple[int, int] | None = None
-
-        # hide no osd data, only first time
-        if self.no_data:
-            self.draw_str(0, 0, " " * len(NO_OSD_DATA))
-            self.no_data = False
-
-        for y in range(self.internal_height):
-            for x in range(self.internal_width):
-                char = self.char_reader(frame, x, y)
-
-                if self.cfg.hide_gps and char == self.exclusions.LAT_CHAR_CODE:
-                    gps_lat = (x, y)
-                    self._items_cache.gps_lat = (x, y)
-
-                if self.cfg.hide_gps and char == self.exclusions.LON_CHAR_CODE:
-                    gps_lon = (x, y)
-                    self._items_cache.gps_lon = (x, y)
-
-                if self.cfg.hide_alt and char in (self.exclusions.ALT_CHAR_CODE, self.exclusions.ALT_CHAR_CODE2):
-                    mult: int = 1000 if char == self.exclusions.ALT_CHAR_CODE2 else 1
-                    flight_alt = self.get_float_from_osd(frame, x - 1, y, mult)
-                    hide_alt = flight_alt > self.cfg.max_alt
-                    self._items_cache.alt = (x, y)
-
-                if self.cfg.hide_dist and char == self.exclusions.HOME_CHAR_CODE:
-                    dist = (x, y)
-                    self._items_cache.dist = (x, y)
-
-                if char != self.char_reader(self.last_frame, x, y):
-                    tile = self.font[char]
-                    self.base_img.paste(tile, (x * self.tile_width, y * self.tile_height,))
 
         # hide gps/alt data
-        # if any of items was present on frame we will use cache to be sure that all are deleted
-        if gps_lat or gps_lon or dist:
-            self.hide_items()
-
-        if hide_alt:
-            self.hide_alt(frame)
-
-        self.last_frame = frame
-
-    def render_single_frame_in_memory(self, frames_idx_render) -> Image.Image:
-        for idx in frames_idx_render:
-            yield from self._render_single_frame_in_memory(idx)
-
-    def _render_single_frame_in_memory(self, idx: tuple) -> Image.Image:
-        frame_ranges, srt = idx
-        osd_frame = self.frames[frame_ranges]
-        frame_file_id = osd_frame.idx
-        self.draw_frame(frame=osd_frame)
-
-        if self.cfg.overlay_img:
-            self.base_img.paste(self.cfg.overlay_img, self.cfg.overlay_location)
-
-        if not srt or len(srt) == 0:
-            frame_ranges = [
-                (
-                    frame_file_id,
-                    osd_frame.next_idx,
-                    None,
-                )
-            ]
-        elif len(srt) == 1:
-            frame_ranges = [
-                (
-                    frame_file_id,
-                    osd_frame.next_idx,
-                    self.srt_frames[srt[0]],
-                )
-            ]
+        self.hide_items(masks)
+        self.hide_alt(masks)
+
+        if self.overlay_img:
+            self.paste(self.overlay_img, self.overlay_location)
+
+        self.srt_state = None
+        if srt_row != NO_SRT:
+            self.draw_srt(self.srt_frames[srt_row])
+
+        redraw, inside = self._restore_covered(previous)
+        # cells whose pixels are changed before areas are pasted, None when whole canvas is
+        changed = redraw
+        if codes is None:
+            if self.last_codes is not None:
+                self._clear()
+                changed = None
+        elif self.last_codes is None:
+            # canvas is empty
+            self._draw_glyphs(codes, None)
+            changed = None
         else:
-            srt_data = None
-            if srt[0]:
-                srt_data = self.srt_frames[srt[0]]
-
-            frame_ranges = [
-                (
-                    frame_file_id,
-                    self.srt_frames[srt[1]].idx,
-                    srt_data,
-                )
-            ]
-            for i in range(1, len(srt) - 1):
-                n1 = srt[i]
-                n2 = srt[i + 1]
-                frame_ranges.append(
-                    (
-                        self.srt_frames[n1].idx,
-                        self.srt_frames[n2].idx,
-                        self.srt_frames[n1],
-                    )
-                )
-            frame_ranges.append(
-                (
-                    self.srt_frames[srt[-1]].idx,
-                    osd_frame.next_idx,
-                    self.srt_frames[srt[-1]],
-                )
-            )
-
-        for fr in frame_ranges:
-            if fr[2]:
-                self.draw_srt(fr[2])
+            drawn = (self._changed_cells(codes) | redraw) & ~inside
+            self._draw_glyphs(codes, drawn)
+            changed = drawn | redraw
+        self.last_codes = codes
+
+        self._paste_covered(dict(zip(previous, previous_pastes)), changed)
+
+        self.mask_state = masks
+        self.no_data = no_data
+
+    def _changed_cells(self, codes: np.ndarray) -> np.ndarray:
+        """
+        Returns (internal_height, internal_width) mask of cells that differ from glyphs on canvas,
+        only dynamic cells are compared when they are known
+        """
+        if self.dynamic_cells is None:
+            return codes != self.last_codes
+
+        ys, xs = self.dynamic_cells
+        changed = np.zeros(codes.shape, dtype=bool)
+        changed[ys, xs] = codes[ys, xs] != self.last_codes[ys, xs]
+
+        return changed
+
+    def _draw_glyphs(self, codes: np.ndarray, cells: np.ndarray | None) -> None:
+        """
+        Draws glyphs of cells (all when None)
+        """
+        if self.compositor:
+            if cells is None:
+                self.compositor.compose(codes)
+            else:
+                self.compositor.draw(codes, cells)
+            return
+
+        ys, xs = np.nonzero(cells) if cells is not None else np.indices(codes.shape).reshape(2, -1)
+        if len(self.cell_fonts) == 1:
+            for y, x in zip(ys.tolist(), xs.tolist()):
+                tile = self.font[int(codes[y, x])]
+                self.base_img.paste(tile, (x * self.tile_width, y * self.tile_height,))
+            return
+
+        x0s, x1s = self.cell_x(xs).tolist(), self.cell_x(xs + 1).tolist()
+        y0s, y1s = self.cell_y(ys).tolist(), self.cell_y(ys + 1).tolist()
+        for y, x, x0, x1, y0, y1 in zip(ys.tolist(), xs.tolist(), x0s, x1s, y0s, y1s):
+            tile = self.cell_fonts[(x1 - x0, y1 - y0)][int(codes[y, x])]
+            self.base_img.paste(tile, (x0, y0,))
+
+    def render_for_pipe(self, segments: Timeline | Iterable[tuple]) -> Iterator[bytes]:
+        """
+        Returns data to be written to ffmpeg stdin, constant or variable frame rate (cfg.vfr)
+        """
+        if self.cfg.vfr:
+            return self.render_vfr_in_memory(segments)
+
+        return self.render_single_frame_in_memory(segments)
+
+    def _hides_items(self) -> bool:
+        return self.cfg.hide_gps or self.cfg.hide_alt or self.cfg.hide_dist
+
+    def find_frame_masks(self, grid: np.ndarray) -> FrameMasks:
+        """
+        Finds items to hide on single frame, used when frame is not in frame store
+        """
+        if not self._hides_items():
+            return NO_MASKS
+
+        return find_masks(grid[np.newaxis], self.exclusions, self.cfg)[0]
+
+    def precompute(self) -> None:
+        """
+        Resolves osd frame shown and masks drawn for every row of frame store, so any segment
+        can be drawn without drawing segments before it
+        """
+        if self.shown_rows is not None:
+            return
+
+        frames = self.frames if isinstance(self.frames, FrameStore) else FrameStore.from_frames(self.frames)
+        stats, found = [], []
+        cell_range = None
+        visible = self.font.visible_glyphs()
+        self.visible_cells = np.zeros((self.internal_height, self.internal_width), dtype=bool)
+        for start in range(0, len(frames), MASK_CHUNK_FRAMES):
+            grids = self.frame_grid(frames.cells[start:start + MASK_CHUNK_FRAMES])
+            stats.append(find_stats_screens(grids, self.cfg.hide_stats))
+            if self._hides_items():
+                found.append(find_masks(grids, self.exclusions, self.cfg))
+
+            shown = ~stats[-1] & (frames.sizes[start:start + MASK_CHUNK_FRAMES] > 0)
+            cell_range = update_cell_range(cell_range, grids[shown])
+            self.visible_cells |= visible[grids[shown]].any(axis=0)
+
+        skipped = np.concatenate(stats) if stats else np.zeros(0, dtype=bool)
+        self.shown_rows = shown_rows(skipped)
+        if self._hides_items():
+            self.masks = resolve_masks(MaskTable.concat(found), skipped)
+
+        # glyphs of static cells are drawn with first frame and stay on canvas
+        self.dynamic_cells = dynamic_cells(cell_range)
+        if self.cfg.verbatim:
+            total = self.internal_height * self.internal_width
+            static = total - len(self.dynamic_cells[0])
+            print(f"Static osd cells: {static} of {total} ({static / total:.1%}), dynamic: {total - static}")
+
+    def _resolve_row(self, row: int) -> tuple[int | None, FrameMasks]:
+        self.precompute()
+        shown = int(self.shown_rows[row])
+        if shown == NO_ROW:
+            return None, NO_MASKS
+
+        return shown, self.masks[shown] if self.masks is not None else NO_MASKS
+
+    def _resolve_frame(self, frame: Frame) -> tuple[Frame | None, FrameMasks]:
+        """
+        Same as _resolve_row for frames read one by one (stream mode), state is kept in renderer
+        """
+        if frame.size:
+            grid = self.frame_grid(frame)
+            if find_stats_screens(grid[np.newaxis], self.cfg.hide_stats)[0]:
+                return self.screen[:2] if self.screen else (None, NO_MASKS)
+
+            return frame, self._items_cache.resolve(self.find_frame_masks(grid))
+
+        return frame, NO_MASKS
+
+    def frame_grid(self, frame: Frame | np.ndarray) -> np.ndarray:
+        """
+        Returns frame glyph codes as (internal_height, internal_width) array,
+        (frames, cells) matrix is returned as (frames, internal_height, internal_width) array
+        """
+        cells = np.asarray(frame.data if isinstance(frame, Frame) else frame, dtype=np.uint16)
+        frame_cells = self.internal_width * self.internal_height
+        if cells.shape[-1] < frame_cells:
+            padding = [(0, 0)] * (cells.ndim - 1) + [(0, frame_cells - cells.shape[-1])]
+            cells = np.pad(cells, padding)
+
+        return self._cells_to_grid(cells[..., :frame_cells])
+
+    def _cells_to_grid(self, cells: np.ndarray) -> np.ndarray:
+        pass
 
-            final_img = self.base_img.copy().resize(
-                self.final_img_size, Image.Resampling.BILINEAR
-            )
-            membuf = BytesIO()
-            final_img.save(membuf, format="png", compress_level=1)
-            # membuf.seek(0)
-            # img = membuf.read()
-            img = membuf.getvalue()
-            membuf.close()
+    def render_ranges(self, segments: Timeline | Iterable[tuple]) -> Iterator[tuple[int, int, bytes]]:
+        """
+        Returns (first video frame, next video frame, encoded image) for every timeline segment
+        """
+        if self.cfg.jobs > 1 and isinstance(segments, Timeline):
+            # imported here, parallel module imports renderers
+            from .parallel import render_ranges_parallel
+
+            return render_ranges_parallel(self, segments, self.cfg.jobs)
+
+        threads = self.encode_threads()
+        if threads > 1:
+            return self._render_ranges_threaded(segments, threads)
+
+        return self._render_ranges(segments)
+
+    def encode_threads(self) -> int:
+        """
+        Encode threads from config, auto is 1 (no threads) when process can use only one cpu
+        """
+        if self.cfg.encode_threads:
+            return self.cfg.encode_threads
+
+        return min(AUTO_ENCODE_THREADS, usable_cpus())
+
+    def _render_ranges(self, segments) -> Iterator[tuple[int, int, bytes]]:
+        for segment in segments:
+            start_idx, end_idx = self._draw_segment(segment)
+            yield start_idx, end_idx, self.encoded_frame()
+
+    def _render_ranges_threaded(self, segments, threads: int) -> Iterator[tuple[int, int, bytes]]:
+        """
+        Frames are drawn in this thread (drawing is incremental), resize and encode
+        run in thread pool, results are returned in drawing order
+        """
+        executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='encode')
+        # (start, end, cache key, encoded frame or future), it is limited to keep memory usage low
+        pending = deque()
+        # frames that are encoded now, same screen is not submitted again
+        in_progress: dict[bytes, Future] = {}
+
+        def finished(item: tuple) -> tuple[int, int, bytes]:
+            start_idx, end_idx, key, img = item
+            if isinstance(img, Future):
+                img = img.result()
+                if key is not None and in_progress.pop(key, None):
+                    self.frame_cache.put(key, img)
+
+            return start_idx, end_idx, img
+
+        try:
+            for segment in segments:
+                start_idx, end_idx = self._draw_segment(segment)
+                key = None
+                img = None
+                if self.frame_cache is not None:
+                    key = self._frame_key()
+                    img = self.frame_cache.get(key) or in_progress.get(key)
+
+                if img is None:
+                    img = executor.submit(self._encode_snapshot, self.snapshot())
+                    if key is not None:
+                        in_progress[key] = img
+
+                pending.append((start_idx, end_idx, key, img))
+                if len(pending) > threads * ENCODE_QUEUE_PER_THREAD:
+                    yield finished(pending.popleft())
+
+            while pending:
+                yield finished(pending.popleft())
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def _encode_snapshot(self, img: Image.Image) -> bytes:
+        return self.encode_image(self.to_final_size(img))
+
+    def render_single_frame_in_memory(self, segments: Timeline | Iterable[tuple]) -> Iterator[bytes]:
+        return cfr_stream(self.render_ranges(segments))
+
+    def render_vfr_in_memory(self, segments: Timeline | Iterable[tuple]) -> Iterator[bytes]:
+        return vfr_stream(self.cfg, self.render_ranges(segments))
+
+    def _draw_segment(self, segment: tuple) -> tuple[int, int]:
+        """
+        Draws timeline segment (start, end, osd frame row or frame, srt row), screen is drawn
+        only when it changes, canvas is ready for returned range until next segment is drawn
+        """
+        start_idx, end_idx, osd, srt_row = segment
+        # srt frame stays on screen after srt data ends
+        if srt_row == NO_SRT and self.screen is not None:
+            srt_row = self.screen[2]
+
+        # in stream mode frames are passed directly instead of row
+        if isinstance(osd, Frame):
+            osd, masks = self._resolve_frame(osd)
+        else:
+            osd, masks = self._resolve_row(osd)
+
+        last = self.screen
+        same_osd = last is not None and (osd is last[0] or isinstance(osd, int) and osd == last[0])
+        if not same_osd or masks != last[1] or srt_row != last[2]:
+            self.screen = (osd, masks, srt_row)
+            self.draw_screen(self.frames[osd] if isinstance(osd, int) else osd, masks, srt_row)
+
+        return start_idx, end_idx
+
+    def _frame_key(self) -> bytes:
+        """
+        Hash of everything that was drawn on canvas: osd glyphs, srt text and masks
+        """
+        key = blake2b(digest_size=16)
+        if self.last_codes is not None:
+            # static cells are same on every frame
+            codes = self.last_codes if self.dynamic_cells is None else self.last_codes[self.dynamic_cells]
+            key.update(b"osd")
+            key.update(codes.tobytes())
+        key.update(repr((self.srt_state, self.mask_state, self.no_data)).encode())
+
+        return key.digest()
+
+    def encoded_frame(self) -> bytes:
+        """
+        Returns current canvas encoded for pipe, repeated screens are taken from cache
+        """
+        if self.frame_cache is None:
+            return self.encode_image(self.final_image())
+
+        key = self._frame_key()
+        img = self.frame_cache.get(key)
+        if img is None:
+            img = self.encode_image(self.final_image())
+            self.frame_cache.put(key, img)
+
+        return img
+
+    def encode_image(self, img: Image.Image) -> bytes:
+        """
+        Converts frame to bytes in format expected by ffmpeg on stdin (cfg.pipe_format)
+        """
+        if self.cfg.pipe_format == PIPE_FORMAT_RGBA:
+            return img.tobytes()
+
+        if self.cfg.pipe_format == PIPE_FORMAT_PAL8:
+            return self._encode_pal8(img)
+
+        membuf = BytesIO()
+        img.save(membuf, format="png", compress_level=1)
+        data = membuf.getvalue()
+        membuf.close()
+
+        return data
 
-            yield img
+    @staticmethod
+    def _encode_pal8(img: Image.Image) -> bytes:
+        # rawvideo pal8 frame is one byte per pixel followed by 256 palette entries,
+        # each entry is native endian uint32 ARGB
+        pal_img = img.quantize(PAL8_COLORS, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+        rgba = bytes(pal_img.getpalette("RGBA") or [])
+        rgba = rgba.ljust(PAL8_COLORS * 4, b"\0")[: PAL8_COLORS * 4]
+
+        palette = bytearray(len(rgba))
+        if sys.byteorder == "little":
+            palette[0::4] = rgba[2::4]
+            palette[1::4] = rgba[1::4]
+            palette[2::4] = rgba[0::4]
+            palette[3::4] = rgba[3::4]
+        else:
+            palette[0::4] = rgba[3::4]
+            palette[1::4] = rgba[0::4]
+            palette[2::4] = rgba[1::4]
+            palette[3::4] = rgba[2::4]
 
-            for _ in range(fr[0] + 1, fr[1]):
-                yield img
+        return pal_img.tobytes() + palette
 
     def render_test_frame(
         self, frame_idx: int, srt_frame_idx: int | None
@@ -369,16 +926,13 @@ class BaseRenderer:
         # srt_frame: SrtFrame, idx: list[tuple]
         if frame_idx > len(self.frames):
             frame_idx = int(len(self.frames) / 2)
-        frame = self.frames[frame_idx]
-        self.draw_frame(frame=frame, test_render=True)
-        if self.cfg.overlay_img:
-            self.base_img.paste(self.cfg.overlay_img, self.cfg.overlay_location)
+        # stats screen is drawn in test frame
+        self.precompute()
+        masks = self.masks[frame_idx] if self.masks is not None else NO_MASKS
+        srt_row = srt_frame_idx if srt_frame_idx is not None and self.srt_frames else NO_SRT
+        self.draw_screen(self.frames[frame_idx], masks, srt_row)
 
-        if srt_frame_idx and self.srt_frames:
-            srt_frame = self.srt_frames[srt_frame_idx]
-            self.draw_srt(srt_frame)
-
-        osd_img = self.base_img.resize(self.final_img_size, Image.Resampling.LANCZOS)
+        osd_img = self.canvas_image().resize(self.final_img_size, Image.Resampling.LANCZOS)
 
         return osd_img
 
@@ -389,18 +943,16 @@ class DjiRenderer(BaseRenderer):
         font: Font,
         cfg: Config,
         osd_type: int,
-        frames: list[Frame],
-        srt_frames: list[SrtFrame],
+        frames: list[Frame] | FrameStore,
+        srt_frames: SrtStore | list[SrtFrame],
         reset_cache: bool = False,
     ) -> None:
         self.internal_width, self.internal_height = INTERNAL_W_H_DJI
         super().__init__(font, cfg, osd_type, frames, srt_frames, reset_cache)
 
-    def char_reader(self, frame: Frame, x: int, y: int) -> str:
-        return frame.data[y + x * self.internal_height]
-
-    def char_writer(self, frame: Frame, x, y, c: int) -> None:
-        frame.data[y + x * self.internal_height] = c
+    def _cells_to_grid(self, cells: np.ndarray) -> np.ndarray:
+        # dji frames are stored column by column
+        return cells.reshape(*cells.shape[:-1], self.internal_width, self.internal_height).swapaxes(-1, -2)
 
 
 class WsRenderer(BaseRenderer):
@@ -409,18 +961,52 @@ class WsRenderer(BaseRenderer):
         font: Font,
         cfg: Config,
         osd_type: int,
-        frames: list[Frame],
-        srt_frames: list[SrtFrame],
+        frames: list[Frame] | FrameStore,
+        srt_frames: SrtStore | list[SrtFrame],
         reset_cache: bool = False,
     ) -> None:
         self.internal_width, self.internal_height = INTERNAL_W_H_WS
         super().__init__(font, cfg, osd_type, frames, srt_frames, reset_cache)
 
-    def char_reader(self, frame: Frame, x: int, y: int) -> str:
-        return frame.data[x + y * self.internal_width]
+    def _cells_to_grid(self, cells: np.ndarray) -> np.ndarray:
+        return cells.reshape(*cells.shape[:-1], self.internal_height, self.internal_width)
+
+
+def usable_cpus() -> int:
+    """
+    Cpus this process may run on, affinity (e.g. limits of container) is not included in cpu_count
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0)) or 1
+
+    return os.cpu_count() or 1
+
+
+def cfr_stream(ranges: Iterator[tuple[int, int, bytes]]) -> Iterator[bytes]:
+    """
+    Constant frame rate, image is repeated for every video frame in range
+    """
+    for start_idx, end_idx, img in ranges:
+        yield img
+
+        for _ in range(start_idx + 1, end_idx):
+            yield img
+
 
-    def char_writer(self, frame, x, y, c: int) -> None:
-        frame.data[x + y * self.internal_width] = c
+def vfr_stream(cfg: Config, ranges: Iterator[tuple[int, int, bytes]]) -> Iterator[bytes]:
+    """
+    Every overlay is sent only once in matroska container with its presentation time,
+    ffmpeg keeps displaying it until next one arrives
+    """
+    mkv = MkvWriter(*cfg.pipe_size(), cfg.pipe_format)
+    yield mkv.header()
+
+    last_ts = -1
+    for start_idx, _, img in ranges:
+        # timestamp must not be after real frame time and must be increasing
+        ts = max(start_idx * 1000 // OVERLAY_FPS, last_ts + 1)
+        last_ts = ts
+        yield mkv.frame(ts, img)
 
 
 def get_renderer(osd_type: int):
@@ -2,15 +2,43 @@ import pathlib
 import sys
 from subprocess import Popen, PIPE
 
-import ffmpeg
-
 from .config import Config
-from .utils.codecs import find_codec
+from .const import OVERLAY_FPS, PIPE_FORMAT_PNG
+from .utils.codecs import calibrate_codecs, find_codec
+
+
+def _overlay_input(cfg: Config):
+    import ffmpeg
+
+    if cfg.vfr:
+        # timestamps are inside stream
+        return ffmpeg.input('pipe:', format='matroska', thread_queue_size=65536)
+
+    if cfg.pipe_format == PIPE_FORMAT_PNG:
+        return ffmpeg.input('pipe:', framerate=OVERLAY_FPS, thread_queue_size=65536, vcodec="png")  # format="image2pipe",
+
+    # raw frames have no header, size and pixel format must be given explicitly
+    return ffmpeg.input(
+        'pipe:',
+        format='rawvideo',
+        pix_fmt=cfg.pipe_format,
+        s='{}x{}'.format(*cfg.pipe_size()),
+        framerate=OVERLAY_FPS,
+        thread_queue_size=65536,
+    )
 
 
 def run_ffmpeg_stdin(cfg: Config, video_path: pathlib.Path, out_path: pathlib.Path, console: bool = False) -> Popen[bytes]:
+    # imported on first use, it is not needed for test frame
+    import ffmpeg
+
+    preset = None
     try:
-        codec = find_codec(cfg.use_h265)
+        codec = find_codec(cfg.use_h265, cfg.refresh_codecs)
+        if codec and cfg.calibrate_codecs:
+            best = calibrate_codecs(cfg.use_h265, cfg.target_width, cfg.target_height, cfg.refresh_codecs, cfg.verbatim)
+            if best:
+                codec, preset = best.codec, best.preset
     except OSError:
         print("ffmpeg not found")
         sys.exit(4)
@@ -20,9 +48,9 @@ def run_ffmpeg_stdin(cfg: Config, video_path: pathlib.Path, out_path: pathlib.Pa
         sys.exit(2)
 
     if cfg.verbatim:
-        print(f'Found a working codec: {codec}')
+        print(f'Found a working codec: {codec}' + (f' (preset {preset})' if preset else ''))
 
-    frame_overlay = ffmpeg.input('pipe:', framerate=60, thread_queue_size=65536, vcodec="png")  # format="image2pipe", 
+    frame_overlay = _overlay_input(cfg)
     video = ffmpeg.input(str(video_path), thread_queue_size=4096, hwaccel="auto")
 
     out_size = {"w": cfg.target_width, "h": cfg.target_height}
@@ -32,6 +60,8 @@ def run_ffmpeg_stdin(cfg: Config, video_path: pathlib.Path, out_path: pathlib.Pa
         'c:v': codec,
         'acodec': 'copy',
     }
+    if preset:
+        output_params['preset'] = preset
 
     # from https://ffmpeg.org/faq.html#Which-are-good-parameters-for-encoding-high-quality-MPEG_002d4_003f
     hq_output = {
@@ -47,9 +77,12 @@ def run_ffmpeg_stdin(cfg: Config, video_path: pathlib.Path, out_path: pathlib.Pa
     if cfg.hq:
         output_params.update(hq_output)
 
+    # cropped overlay is placed at its position in target frame
+    x, y = cfg.crop_box[:2] if cfg.crop_box else (0, 0)
+
     cmd = video.filter("scale", **out_size, force_original_aspect_ratio=1) \
         .filter("pad", **out_size, x=-1, y=-1, color="black") \
-        .overlay(frame_overlay, x=0, y=0) \
+        .overlay(frame_overlay, x=x, y=y) \
         .output(str(out_path), **output_params) \
         .global_args('-loglevel', 'info' if cfg.ffmpeg_verbatim else 'error') \
         .global_args('-stats') \
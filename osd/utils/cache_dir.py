@@ -0,0 +1,22 @@
+import os
+import pathlib
+import sys
+
+APP_NAME = 'osd-dump-tools'
+
+
+def cache_dir(name: str) -> pathlib.Path:
+    """
+    Returns (and creates) folder for cached data in user cache location
+    """
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or pathlib.Path.home() / 'AppData' / 'Local'
+    elif sys.platform == 'darwin':
+        base = pathlib.Path.home() / 'Library' / 'Caches'
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or pathlib.Path.home() / '.cache'
+
+    path = pathlib.Path(base) / APP_NAME / name
+    path.mkdir(parents=True, exist_ok=True)
+
+    return path
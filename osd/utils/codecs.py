@@ -1,58 +1,280 @@
-from threading import Thread
+from threading import Lock, Thread
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import re
+import tempfile
 import time
+import shutil
 import subprocess
 import platform
 from collections import namedtuple
 from typing import List
 
+from .cache_dir import cache_dir
+
 CodecDef = namedtuple("CodecDev", "codec os")
+CalibrationResult = namedtuple("CalibrationResult", "codec preset fps psnr")
+
+CODECS_H265 = [
+    CodecDef("h265_videotoolbox", ("darwin")),
+    CodecDef("hevc_nvenc", ("windows", "linux")),
+    CodecDef("hevc_amf", ("windows")),
+    CodecDef("hevc_qsv", ("windows", "linux")),
+    CodecDef("hevc_mf", ("windows")),
+    CodecDef("libx265", ("darwin", "windows", "linux")),
+]
+
+CODECS_H264 = [
+    CodecDef("h264_videotoolbox", ("darwin")),
+    CodecDef("h264_nvenc", ("windows", "linux")),
+    CodecDef("h264_amf", ("windows")),
+    CodecDef("h264_vaapi", ("linux")),
+    CodecDef("h264_qsv", ("windows", "linux")),
+    CodecDef("h264_mf", ("windows")),
+    CodecDef("h264_v4l2m2m", ("linux")),
+    CodecDef("libx264", ("darwin", "windows", "linux")),
+]
+
+# presets tried in calibration, None is codec default
+CODEC_PRESETS = {
+    "libx264": (None, "veryfast", "ultrafast"),
+    "libx265": (None, "veryfast", "ultrafast"),
+}
+
+# length of synthetic clip encoded in calibration
+CALIBRATION_FRAMES = 240
+# short clip encoded first, its time (process start, hardware init) is subtracted from time of the long one
+CALIBRATION_WARMUP_FRAMES = 30
+# clip is encoded at low fixed bitrate (bits per pixel of 60 fps clip), so quality of encoders differs
+CALIBRATION_BITS_PER_PIXEL = 0.02
+# codecs with quality of calibration clip lower than quality of best codec by more than this (PSNR in dB) are not used
+CALIBRATION_PSNR_MARGIN = 1.0
+
+PSNR_AVERAGE = re.compile(r"PSNR .*average:(\S+)")
+
+# change when probe command changes
+CODEC_CACHE_VERSION = 1
+
+# probe results of current ffmpeg, shared by cli and gui in one process
+_probes: dict[str, bool] | None = None
+_probes_lock = Lock()
+
+
+def _ffmpeg_path() -> str:
+    path = shutil.which("ffmpeg")
+    if path is None:
+        raise FileNotFoundError("ffmpeg not found")
+
+    return path
+
+
+def _cache_key(ffmpeg_path: str) -> str:
+    """
+    Probe results are valid for same ffmpeg binary on same platform
+    """
+    mtime = os.stat(ffmpeg_path).st_mtime_ns
+    return f"{CODEC_CACHE_VERSION}|{ffmpeg_path}|{mtime}|{platform.platform()}"
+
 
+def _cache_path():
+    return cache_dir("codecs") / "codecs.json"
 
-def _find_codec(codecs: List[CodecDef], os: str) -> bool:
+
+def _load_cache() -> dict:
+    try:
+        with open(_cache_path()) as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache: dict) -> None:
+    # errors are ignored, cache is only optimization
+    tmp_path = None
+    try:
+        path = _cache_path()
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(cache, f, indent=1)
+        os.replace(tmp_path, path)
+    except OSError:
+        if tmp_path:
+            tmp_path.unlink(missing_ok=True)
+
+
+def _probe_codec(ffmpeg_path: str, codec: str) -> bool:
     # code borrowed from ws-osd
     #
-    cmd_line = "ffmpeg -y -hwaccel auto -f lavfi -i nullsrc -c:v {0} -frames:v 1 -f null -"
-    for codec in (codec.codec for codec in codecs if os in codec.os):
-        cmd = (cmd_line.format(codec)).split(" ")
-        ret = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    cmd_line = "-y -hwaccel auto -f lavfi -i nullsrc -c:v {0} -frames:v 1 -f null -"
+    cmd = [ffmpeg_path] + (cmd_line.format(codec)).split(" ")
+    ret = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    return ret.returncode == 0
+
+
+def probe_codecs(refresh: bool = False) -> dict[str, bool]:
+    """
+    Returns {codec: works} for all codecs available on this platform, all codecs are probed
+    concurrently and results are cached on disk until ffmpeg binary or platform changes
+    """
+    global _probes
+
+    with _probes_lock:
+        if _probes is not None and not refresh:
+            return _probes
+
+        ffmpeg_path = _ffmpeg_path()
+        key = _cache_key(ffmpeg_path)
+        cache = _load_cache()
+
+        entry = cache.get(key)
+        if entry is None or refresh:
+            os_name = platform.system().lower()
+            codecs = [codec.codec for codec in CODECS_H265 + CODECS_H264 if os_name in codec.os]
+            with ThreadPoolExecutor(max_workers=len(codecs)) as executor:
+                works = executor.map(lambda codec: _probe_codec(ffmpeg_path, codec), codecs)
+                entry = {"probes": dict(zip(codecs, works))}
+
+            # entries of other ffmpeg binaries are kept
+            cache[key] = entry
+            _save_cache(cache)
+
+        _probes = entry["probes"]
+        return _probes
 
-        if ret.returncode == 0:
-            return codec
+
+def _clip_source(width: int, height: int, frames: int) -> list[str]:
+    return ["-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate=60", "-frames:v", str(frames)]
+
+
+def _clip_bitrate(width: int, height: int) -> int:
+    """
+    Calibration bitrate in kbit/s
+    """
+    return max(1, int(width * height * 60 * CALIBRATION_BITS_PER_PIXEL / 1000))
+
+
+def _encode_clip(ffmpeg_path: str, codec: str, preset: str | None, width: int, height: int, frames: int, out_path: str) -> float | None:
+    """
+    Encodes calibration clip, returns time in seconds
+    """
+    bitrate = _clip_bitrate(width, height)
+    cmd = [ffmpeg_path, "-y", "-hwaccel", "auto"] + _clip_source(width, height, frames) + ["-c:v", codec, "-b:v", f"{bitrate}k"]
+    if preset:
+        cmd += ["-preset", preset]
+    cmd += ["-f", "matroska", out_path]
+
+    start = time.perf_counter()
+    ret = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if ret.returncode != 0:
+        return None
+
+    return time.perf_counter() - start
+
+
+def _clip_psnr(ffmpeg_path: str, width: int, height: int, out_path: str) -> float | None:
+    """
+    Compares encoded clip with source, returns average PSNR
+    """
+    cmd = [ffmpeg_path, "-i", out_path] + _clip_source(width, height, CALIBRATION_FRAMES) + ["-lavfi", "psnr", "-f", "null", "-"]
+    ret = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    match = PSNR_AVERAGE.search(ret.stderr)
+    if ret.returncode != 0 or match is None:
+        return None
+
+    return float(match.group(1))
+
+
+def _clip_fps(warmup_time: float, clip_time: float) -> float:
+    """
+    Encoding speed without startup time of encoder, whole clip is used when timing is too noisy
+    """
+    if clip_time > warmup_time:
+        return (CALIBRATION_FRAMES - CALIBRATION_WARMUP_FRAMES) / (clip_time - warmup_time)
+
+    return CALIBRATION_FRAMES / clip_time
+
+
+def _calibrate(ffmpeg_path: str, codecs: list[str], width: int, height: int) -> list[CalibrationResult]:
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        out_path = os.path.join(folder, "calibration.mkv")
+        # encoders are run one by one, so they don't compete for cpu/gpu
+        for codec in codecs:
+            for preset in CODEC_PRESETS.get(codec, (None,)):
+                warmup_time = _encode_clip(ffmpeg_path, codec, preset, width, height, CALIBRATION_WARMUP_FRAMES, out_path)
+                clip_time = _encode_clip(ffmpeg_path, codec, preset, width, height, CALIBRATION_FRAMES, out_path) if warmup_time else None
+                psnr = _clip_psnr(ffmpeg_path, width, height, out_path) if clip_time else None
+                if clip_time and psnr is not None:
+                    results.append(CalibrationResult(codec, preset, _clip_fps(warmup_time, clip_time), psnr))
+
+    return results
+
+
+def calibrate_codecs(use_h265: bool, width: int, height: int, refresh: bool = False, verbatim: bool = False) -> CalibrationResult | None:
+    """
+    Encodes synthetic clip in target resolution with every working codec (and presets of software codecs),
+    returns fastest one with quality within CALIBRATION_PSNR_MARGIN of the best one, results are stored with codec probes
+    """
+    probes = probe_codecs(refresh)
+    family = [CODECS_H265, CODECS_H264] if use_h265 else [CODECS_H264]
+
+    with _probes_lock:
+        ffmpeg_path = _ffmpeg_path()
+        key = _cache_key(ffmpeg_path)
+        cache = _load_cache()
+        entry = cache.setdefault(key, {"probes": probes})
+        calibration = entry.setdefault("calibration", {})
+        name = f"{'h265' if use_h265 else 'h264'}|{width}x{height}"
+
+        if name not in calibration or refresh:
+            results = []
+            for codecs in family:
+                results = _calibrate(ffmpeg_path, [codec.codec for codec in codecs if probes.get(codec.codec)], width, height)
+                # h264 is tried only when no h265 codec works
+                if results:
+                    break
+
+            calibration[name] = [list(result) for result in results]
+            _save_cache(cache)
+
+        results = [CalibrationResult(*result) for result in calibration[name]]
+
+    floor = max((result.psnr for result in results), default=0.0) - CALIBRATION_PSNR_MARGIN
+    usable = [result for result in results if result.psnr >= floor]
+    best = max(usable, key=lambda result: result.fps, default=None)
+
+    if verbatim:
+        print(f"Codec calibration {name}:")
+        for result in results:
+            mark = "*" if result == best else " "
+            print(f" {mark} {result.codec:18} {result.preset or 'default':10} {result.fps:7.1f} fps {result.psnr:6.2f} dB")
+
+    return best
+
+
+def _find_codec(codecs: List[CodecDef], probes: dict[str, bool]) -> str | None:
+    for codec in codecs:
+        if probes.get(codec.codec):
+            return codec.codec
 
     return None
 
 
-def find_codec(use_h265: bool) -> str | None:
-    codecs_h265 = [
-        CodecDef("h265_videotoolbox", ("darwin")),
-        CodecDef("hevc_nvenc", ("windows", "linux")),
-        CodecDef("hevc_amf", ("windows")),
-        CodecDef("hevc_qsv", ("windows", "linux")),
-        CodecDef("hevc_mf", ("windows")),
-        CodecDef("libx265", ("darwin", "windows", "linux")),
-    ]
-
-    codecs_h264 = [
-        CodecDef("h264_videotoolbox", ("darwin")),
-        CodecDef("h264_nvenc", ("windows", "linux")),
-        CodecDef("h264_amf", ("windows")),
-        CodecDef("h264_vaapi", ("linux")),
-        CodecDef("h264_qsv", ("windows", "linux")),
-        CodecDef("h264_mf", ("windows")),
-        CodecDef("h264_v4l2m2m", ("linux")),
-        CodecDef("libx264", ("darwin", "windows", "linux")),
-    ]
-
-    os = platform.system().lower()
+def find_codec(use_h265: bool, refresh: bool = False) -> str | None:
+    """
+    First working codec in order of preference, hardware codecs first
+    """
+    probes = probe_codecs(refresh)
 
     if use_h265:
-        codec = _find_codec(codecs_h265, os)
+        codec = _find_codec(CODECS_H265, probes)
         if codec:
             return codec
-    
-    return _find_codec(codecs_h264, os)
 
-    return None
+    return _find_codec(CODECS_H264, probes)
 
 
 def _find_codec_bkgnd(callback: callable, use_h265: bool):
@@ -0,0 +1,46 @@
+from collections import OrderedDict
+
+
+class FrameCache:
+    """
+    LRU cache of encoded frames limited by total size of stored data
+    """
+    __slots__ = 'max_bytes', 'size', 'items', 'hits', 'misses', 'evictions'
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.items: OrderedDict[bytes, bytes] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: bytes) -> bytes | None:
+        data = self.items.get(key)
+        if data is None:
+            self.misses += 1
+            return None
+
+        self.items.move_to_end(key)
+        self.hits += 1
+
+        return data
+
+    def put(self, key: bytes, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+
+        old = self.items.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+
+        self.items[key] = data
+        self.size += len(data)
+
+        while self.size > self.max_bytes:
+            _, evicted = self.items.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def __str__(self) -> str:
+        return f'{self.hits} hits, {self.misses} misses, {self.evictions} evictions, {len(self.items)} frames ({self.size // 1024} kB) cached'
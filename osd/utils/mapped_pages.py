@@ -0,0 +1,18 @@
+import mmap
+
+# mapped file is released from memory in chunks of this size
+RELEASE_CHUNK = 16 * 1024 * 1024
+
+
+def release_pages(buf: mmap.mmap, start: int, end: int) -> int:
+    """
+    Drops already read pages of memory mapped file from process memory (only where madvise is supported),
+    returns position up to which pages were released
+    """
+    end -= end % mmap.PAGESIZE
+    if end <= start or not hasattr(mmap, 'MADV_DONTNEED'):
+        return start
+
+    buf.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+    return end
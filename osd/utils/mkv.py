@@ -0,0 +1,145 @@
+"""
+Minimal streaming matroska muxer, just enough to send variable frame rate
+overlay to ffmpeg stdin: one video track, every frame in its own cluster.
+"""
+import struct
+
+EBML_ID = 0x1A45DFA3
+EBML_VERSION_ID = 0x4286
+EBML_READ_VERSION_ID = 0x42F7
+EBML_MAX_ID_LENGTH_ID = 0x42F2
+EBML_MAX_SIZE_LENGTH_ID = 0x42F3
+DOC_TYPE_ID = 0x4282
+DOC_TYPE_VERSION_ID = 0x4287
+DOC_TYPE_READ_VERSION_ID = 0x4285
+
+SEGMENT_ID = 0x18538067
+INFO_ID = 0x1549A966
+TIMESTAMP_SCALE_ID = 0x2AD7B1
+MUXING_APP_ID = 0x4D80
+WRITING_APP_ID = 0x5741
+
+TRACKS_ID = 0x1654AE6B
+TRACK_ENTRY_ID = 0xAE
+TRACK_NUMBER_ID = 0xD7
+TRACK_UID_ID = 0x73C5
+TRACK_TYPE_ID = 0x83
+CODEC_ID_ID = 0x86
+CODEC_PRIVATE_ID = 0x63A2
+VIDEO_ID = 0xE0
+PIXEL_WIDTH_ID = 0xB0
+PIXEL_HEIGHT_ID = 0xBA
+COLOUR_SPACE_ID = 0x2EB524
+
+CLUSTER_ID = 0x1F43B675
+CLUSTER_TIMESTAMP_ID = 0xE7
+SIMPLE_BLOCK_ID = 0xA3
+
+UNKNOWN_SIZE = b"\x01\xff\xff\xff\xff\xff\xff\xff"
+
+TRACK_TYPE_VIDEO = 1
+KEYFRAME_FLAG = 0x80
+
+# timestamps are in milliseconds
+TIMESTAMP_SCALE_NS = 1_000_000
+
+APP_NAME = b"osd-dump-tools"
+
+bitmap_info_header_struct = struct.Struct("<IiiHH4sIiiII")
+# < little-endian
+# I header size
+# 2i width, height
+# 2H planes, bit count
+# 4s compression fourcc
+# I image size
+# 2i pixels per meter
+# 2I colors used, important colors
+
+
+def _id(element_id: int) -> bytes:
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, "big")
+
+
+def _size(size: int) -> bytes:
+    length = 1
+    while size >= (1 << (7 * length)) - 1:
+        length += 1
+
+    return (size | (1 << (7 * length))).to_bytes(length, "big")
+
+
+def _element(element_id: int, data: bytes) -> bytes:
+    return _id(element_id) + _size(len(data)) + data
+
+
+def _uint(element_id: int, value: int) -> bytes:
+    return _element(element_id, value.to_bytes(max(1, (value.bit_length() + 7) // 8), "big"))
+
+
+class MkvWriter:
+    """
+    Builds matroska byte stream for single video track.
+    Supported codecs: png (as VfW MPNG) and rgba (as uncompressed video).
+    """
+    __slots__ = 'width', 'height', 'codec'
+
+    def __init__(self, width: int, height: int, codec: str):
+        if codec not in ('png', 'rgba'):
+            raise ValueError(f'Unsupported codec for matroska stream: {codec}')
+
+        self.width = width
+        self.height = height
+        self.codec = codec
+
+    def _track_codec(self) -> bytes:
+        if self.codec == 'rgba':
+            return _element(CODEC_ID_ID, b"V_UNCOMPRESSED")
+
+        bitmap_info = bitmap_info_header_struct.pack(
+            bitmap_info_header_struct.size, self.width, self.height, 1, 32, b"MPNG", 0, 0, 0, 0, 0
+        )
+
+        return _element(CODEC_ID_ID, b"V_MS/VFW/FOURCC") + _element(CODEC_PRIVATE_ID, bitmap_info)
+
+    def header(self) -> bytes:
+        ebml = _element(
+            EBML_ID,
+            _uint(EBML_VERSION_ID, 1)
+            + _uint(EBML_READ_VERSION_ID, 1)
+            + _uint(EBML_MAX_ID_LENGTH_ID, 4)
+            + _uint(EBML_MAX_SIZE_LENGTH_ID, 8)
+            + _element(DOC_TYPE_ID, b"matroska")
+            + _uint(DOC_TYPE_VERSION_ID, 4)
+            + _uint(DOC_TYPE_READ_VERSION_ID, 2),
+        )
+
+        info = _element(
+            INFO_ID,
+            _uint(TIMESTAMP_SCALE_ID, TIMESTAMP_SCALE_NS)
+            + _element(MUXING_APP_ID, APP_NAME)
+            + _element(WRITING_APP_ID, APP_NAME),
+        )
+
+        video = _uint(PIXEL_WIDTH_ID, self.width) + _uint(PIXEL_HEIGHT_ID, self.height)
+        if self.codec == 'rgba':
+            video += _element(COLOUR_SPACE_ID, b"RGBA")
+
+        track = _element(
+            TRACK_ENTRY_ID,
+            _uint(TRACK_NUMBER_ID, 1)
+            + _uint(TRACK_UID_ID, 1)
+            + _uint(TRACK_TYPE_ID, TRACK_TYPE_VIDEO)
+            + self._track_codec()
+            + _element(VIDEO_ID, video),
+        )
+
+        return ebml + _id(SEGMENT_ID) + UNKNOWN_SIZE + info + _element(TRACKS_ID, track)
+
+    def frame(self, timestamp_ms: int, data: bytes) -> bytes:
+        # track 1, relative timestamp 0, keyframe
+        block_header = b"\x81\x00\x00" + bytes((KEYFRAME_FLAG,))
+        block = _id(SIMPLE_BLOCK_ID) + _size(len(block_header) + len(data)) + block_header
+        cluster_head = _uint(CLUSTER_TIMESTAMP_ID, timestamp_ms) + block
+        cluster_size = len(cluster_head) + len(data)
+
+        return b"".join((_id(CLUSTER_ID), _size(cluster_size), cluster_head, data))
@@ -0,0 +1,175 @@
+"""
+Minimal ISO-BMFF (mp4/mov) reader, only boxes needed for video properties are parsed:
+moov/trak/tkhd (size, rotation), mdia/mdhd (timescale), hdlr (track type),
+minf/stbl/stts (frame durations), stsz (frame count), stsd (coded size).
+"""
+from __future__ import annotations
+
+import pathlib
+import struct
+from typing import BinaryIO, Iterator
+
+box_header_struct = struct.Struct(">I4s")
+# > big-endian
+# I box size
+# 4s box type
+box_large_size_struct = struct.Struct(">Q")
+
+# boxes with child boxes on path to sample tables
+CONTAINER_BOXES = (b'moov', b'trak', b'mdia', b'minf', b'stbl')
+
+# moov bigger than this is not read to memory, ffprobe is used instead
+MAX_MOOV_SIZE = 256 * 1024 * 1024
+
+
+class Mp4Track:
+    __slots__ = 'handler', 'width', 'height', 'rotated', 'timescale', 'sample_count', 'duration', 'coded_width', 'coded_height'
+
+    def __init__(self):
+        self.handler: bytes | None = None
+        self.width = 0
+        self.height = 0
+        # 90 or 270 degrees display rotation
+        self.rotated = False
+        self.timescale = 0
+        self.sample_count = 0
+        # sum of sample durations in timescale units
+        self.duration = 0
+        self.coded_width = 0
+        self.coded_height = 0
+
+
+def _boxes(buf: bytes, start: int, end: int) -> Iterator[tuple[bytes, int, int]]:
+    """
+    Returns (box type, payload start, box end) for boxes in buf[start:end]
+    """
+    pos = start
+    while pos + box_header_struct.size <= end:
+        size, box_type = box_header_struct.unpack_from(buf, pos)
+        header = box_header_struct.size
+        if size == 1:
+            size, = box_large_size_struct.unpack_from(buf, pos + header)
+            header += box_large_size_struct.size
+        elif size == 0:
+            size = end - pos
+
+        if size < header or pos + size > end:
+            return
+
+        yield box_type, pos + header, pos + size
+        pos += size
+
+
+def _read_moov(f: BinaryIO) -> bytes | None:
+    """
+    Finds moov box in top level boxes (media data is skipped) and returns it with header
+    """
+    f.seek(0, 2)
+    file_size = f.tell()
+    pos = 0
+
+    while pos + box_header_struct.size <= file_size:
+        f.seek(pos)
+        header = f.read(box_header_struct.size + box_large_size_struct.size)
+        if len(header) < box_header_struct.size + box_large_size_struct.size:
+            return None
+
+        size, box_type = box_header_struct.unpack_from(header, 0)
+        if size == 1:
+            size, = box_large_size_struct.unpack_from(header, box_header_struct.size)
+        elif size == 0:
+            size = file_size - pos
+
+        if size < box_header_struct.size:
+            return None
+
+        if box_type == b'moov':
+            if size > MAX_MOOV_SIZE:
+                return None
+            f.seek(pos)
+            return f.read(size)
+
+        pos += size
+
+    return None
+
+
+def _parse_tkhd(buf: bytes, pos: int, track: Mp4Track) -> None:
+    version = buf[pos]
+    # version, flags, times, track id, reserved and duration
+    pos += 4 + (32 if version == 1 else 20)
+    # reserved, layer, alternate group, volume, reserved
+    pos += 16
+    a, b, _, c, d = struct.unpack_from('>5i', buf, pos)
+    track.rotated = a == 0 and d == 0 and b != 0 and c != 0
+    width, height = struct.unpack_from('>II', buf, pos + 36)
+    track.width, track.height = width >> 16, height >> 16
+
+
+def _parse_mdhd(buf: bytes, pos: int, track: Mp4Track) -> None:
+    version = buf[pos]
+    offset = 4 + (16 if version == 1 else 8)
+    track.timescale, = struct.unpack_from('>I', buf, pos + offset)
+
+
+def _parse_stts(buf: bytes, pos: int, track: Mp4Track) -> None:
+    count, = struct.unpack_from('>I', buf, pos + 4)
+    entries = struct.unpack_from(f'>{count * 2}I', buf, pos + 8)
+    track.duration = sum(n * delta for n, delta in zip(entries[0::2], entries[1::2]))
+    if not track.sample_count:
+        track.sample_count = sum(entries[0::2])
+
+
+def _parse_stsd(buf: bytes, pos: int, end: int, track: Mp4Track) -> None:
+    for _, entry, _ in _boxes(buf, pos + 8, end):
+        # reserved, data reference index, pre defined and reserved
+        track.coded_width, track.coded_height = struct.unpack_from('>HH', buf, entry + 24)
+        return
+
+
+def _parse_track(buf: bytes, start: int, end: int, track: Mp4Track) -> None:
+    for box_type, pos, box_end in _boxes(buf, start, end):
+        if box_type in CONTAINER_BOXES:
+            _parse_track(buf, pos, box_end, track)
+        elif box_type == b'tkhd':
+            _parse_tkhd(buf, pos, track)
+        elif box_type == b'mdhd':
+            _parse_mdhd(buf, pos, track)
+        elif box_type == b'hdlr' and track.handler is None:
+            # media handler in mdia, mov has also data handler in minf
+            track.handler = buf[pos + 8:pos + 12]
+        elif box_type == b'stts':
+            _parse_stts(buf, pos, track)
+        elif box_type == b'stsz':
+            track.sample_count = struct.unpack_from('>I', buf, pos + 8)[0] or track.sample_count
+        elif box_type == b'stsd':
+            _parse_stsd(buf, pos, box_end, track)
+
+
+def read_video_track(path: pathlib.Path) -> Mp4Track | None:
+    """
+    Returns first video track of mp4/mov file, None when file is not ISO-BMFF
+    or it has no usable sample tables (i.e. fragmented mp4)
+    """
+    with open(path, 'rb') as f:
+        moov = _read_moov(f)
+
+    if moov is None:
+        return None
+
+    try:
+        _, moov_start, moov_end = next(_boxes(moov, 0, len(moov)))
+        for box_type, pos, end in _boxes(moov, moov_start, moov_end):
+            if box_type != b'trak':
+                continue
+
+            track = Mp4Track()
+            _parse_track(moov, pos, end, track)
+            if track.handler == b'vide':
+                if track.timescale and track.duration and track.sample_count:
+                    return track
+                return None
+    except (struct.error, IndexError, StopIteration):
+        return None
+
+    return None
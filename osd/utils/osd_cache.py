@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import pathlib
+import struct
+
+import numpy as np
+
+from ..frame import FrameStore
+from .cache_dir import cache_dir
+
+# change when readers return different frames for same file
+OSD_CACHE_VERSION = 1
+
+cache_header_struct = struct.Struct("<4sIQqQQ")
+# < little-endian
+# 4s magic
+# I cache version
+# Q osd file size
+# q osd file mtime in ns
+# Q frames count
+# Q cells per frame
+CACHE_MAGIC = b'OSDC'
+# arrays start after header aligned to 8 bytes
+DATA_OFFSET = 64
+# oldest cache files are removed when all of them take more (one hour flight takes about 100 MB)
+OSD_CACHE_MAX_SIZE = 1024 * 1024 * 1024
+
+
+def cache_path(osd_path: pathlib.Path) -> pathlib.Path:
+    name = hashlib.sha1(str(osd_path.resolve()).encode('utf-8')).hexdigest()
+
+    return cache_dir('osd') / f'{name}.bin'
+
+
+def _is_valid(buf: mmap.mmap, stat: os.stat_result) -> bool:
+    if len(buf) < DATA_OFFSET:
+        return False
+
+    magic, version, size, mtime, count, width = cache_header_struct.unpack_from(buf, 0)
+    if (magic, version, size, mtime) != (CACHE_MAGIC, OSD_CACHE_VERSION, stat.st_size, stat.st_mtime_ns):
+        return False
+
+    return len(buf) == DATA_OFFSET + count * 3 * 8 + count * width * 2
+
+
+def load_cached_frames(osd_path: pathlib.Path, stat: os.stat_result | None = None) -> FrameStore | None:
+    """
+    Returns frames parsed previously from same file (size and modification time are checked),
+    cells are memory mapped from cache file
+    """
+    try:
+        path = cache_path(osd_path)
+        stat = stat or osd_path.stat()
+        with open(path, 'rb') as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    if not _is_valid(buf, stat):
+        buf.close()
+        return None
+
+    # modification time orders files for pruning, used file is kept longer
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+    count, width = cache_header_struct.unpack_from(buf, 0)[4:]
+
+    # arrays are views of mapped file, it is closed when store is released
+    offset = DATA_OFFSET
+    columns = []
+    for _ in range(3):
+        columns.append(np.frombuffer(buf, dtype='<i8', count=count, offset=offset))
+        offset += count * 8
+
+    cells = np.frombuffer(buf, dtype='<u2', count=count * width, offset=offset).reshape(count, width)
+
+    return FrameStore(*columns, cells)
+
+
+def save_cached_frames(osd_path: pathlib.Path, frames: FrameStore, stat: os.stat_result | None = None) -> None:
+    """
+    Stores parsed frames in cache, errors are ignored (cache is only optimization)
+    """
+    tmp_path = None
+    try:
+        stat = stat or osd_path.stat()
+        path = cache_path(osd_path)
+        count, width = frames.cells.shape
+
+        tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_path, 'wb') as f:
+            header = cache_header_struct.pack(CACHE_MAGIC, OSD_CACHE_VERSION, stat.st_size, stat.st_mtime_ns, count, width)
+            f.write(header.ljust(DATA_OFFSET, b'\0'))
+            for column in (frames.idx, frames.next_idx, frames.sizes):
+                f.write(np.ascontiguousarray(column, dtype='<i8').tobytes())
+            f.write(np.ascontiguousarray(frames.cells, dtype='<u2').tobytes())
+
+        os.replace(tmp_path, path)
+        prune_cache(path.parent, OSD_CACHE_MAX_SIZE)
+    except OSError:
+        if tmp_path:
+            tmp_path.unlink(missing_ok=True)
+
+
+def prune_cache(folder: pathlib.Path, max_size: int) -> None:
+    """
+    Removes least recently used cache files until the rest fits to max_size
+    """
+    files = []
+    for path in folder.glob('*.bin'):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        files.append((stat.st_mtime_ns, stat.st_size, path))
+
+    total = 0
+    for _, size, path in sorted(files, reverse=True):
+        total += size
+        if total > max_size:
+            try:
+                path.unlink(missing_ok=True)
+            except OSError:
+                # e.g. file mapped by other process on windows
+                pass
@@ -1,43 +1,122 @@
+from __future__ import annotations
+
+import mmap
+import os
 import struct
 import pathlib
 import sys
-import flet as ft
+from typing import Callable, Iterator
 
+from ..config import Config
 from ..const import OSD_TYPE_DJI, OSD_TYPE_WS, FW_ARDU, FW_INAV, FW_BETAFL
-from ..dji import read_dji_osd_header
+from ..dji import read_dji_osd_frames, iter_dji_osd_frames, file_header_struct_dji
+from ..dji_file_header import DJIFileHeader
+from ..frame import Frame, FrameStore
+from ..ws import read_ws_osd_frames, iter_ws_osd_frames, file_header_struct_ws
+from ..ws_file_header import WSFileHeader
 
 
 file_header_struct_detect = struct.Struct("<4s")
 # < little-endian
 # 4s string
 
+# font variant in DJI header
+DJI_FONT_VARIANTS = {
+    1: FW_BETAFL,
+    2: FW_INAV,
+    3: FW_ARDU,
+}
+
+
+class OsdFile:
+    """
+    Osd file opened and memory mapped once, system and firmware are detected from header
+    and frames are read from the same mapping
+    """
+    __slots__ = 'path', 'buf', 'stat', 'osd_type', 'firmware', 'header'
+
+    def __init__(self, path: pathlib.Path, buf: mmap.mmap, stat: os.stat_result):
+        self.path = path
+        self.buf = buf
+        self.stat = stat
+        self.osd_type: int | None = None
+        self.firmware: int | None = None
+        self.header: DJIFileHeader | WSFileHeader | None = None
+
+        self._detect()
+
+    def _detect(self) -> None:
+        file_header = file_header_struct_detect.unpack_from(self.buf, 0)
+
+        if file_header[0] == b'MSPO':
+            dji_file_header = DJIFileHeader(file_header_struct_dji.unpack_from(self.buf, 0))
+            firmware = DJI_FONT_VARIANTS.get(dji_file_header.font_variant)
+            if firmware is not None:
+                self.osd_type, self.firmware, self.header = OSD_TYPE_DJI, firmware, dji_file_header
+                return
+
+        firmware = None
+        if file_header[0] == b'INAV' or file_header[0][:3] == b'IN_':
+            firmware = FW_INAV
+        elif file_header[0] == b'BTFL':
+            firmware = FW_BETAFL
+        elif file_header[0] == b'ARDU' or file_header[0] == b'APC_':
+            firmware = FW_ARDU
+
+        if firmware is not None:
+            self.osd_type, self.firmware = OSD_TYPE_WS, firmware
+            self.header = WSFileHeader(file_header_struct_ws.unpack_from(self.buf, 0))
+
+    def read_frames(self, verbatim: bool, cfg: Config) -> FrameStore:
+        if self.osd_type == OSD_TYPE_DJI:
+            return read_dji_osd_frames(self.path, self.buf, self.header, verbatim, cfg, self.stat)
+
+        return read_ws_osd_frames(self.path, self.buf, self.header, verbatim, cfg, self.stat)
 
-def detect_system(osd_path: pathlib.Path, page: ft.Page = None, verbatim: bool = False) -> tuple :
+    def iter_frames(self, verbatim: bool, cfg: Config) -> Iterator[Frame]:
+        """
+        Returns frames one by one without keeping them in memory
+        """
+        if self.osd_type == OSD_TYPE_DJI:
+            return iter_dji_osd_frames(self.buf, self.header, verbatim, cfg)
+
+        return iter_ws_osd_frames(self.buf, self.header, verbatim, cfg)
+
+    def close(self) -> None:
+        self.buf.close()
+
+    def __enter__(self) -> OsdFile:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def open_osd(osd_path: pathlib.Path) -> OsdFile:
+    """
+    Opens osd file, header and frames are read from single memory mapping
+    """
     with open(osd_path, "rb") as dump_f:
-        file_header_data = dump_f.read(file_header_struct_detect.size)
-        file_header = file_header_struct_detect.unpack(file_header_data)
-
-    if file_header[0] == b'MSPO':
-        dji_file_header = read_dji_osd_header(osd_path)
-        if dji_file_header.font_variant == 1:   # TODO: change to const, what about BF?
-            return OSD_TYPE_DJI, FW_BETAFL
-        if dji_file_header.font_variant == 2:   # TODO: change to const, what about BF?
-            return OSD_TYPE_DJI, FW_INAV
-        if dji_file_header.font_variant == 3:   # TODO: change to const, what about BF?
-            return OSD_TYPE_DJI, FW_ARDU
-
-    if file_header[0] == b'INAV' or file_header[0][:3] == b'IN_':
-        return OSD_TYPE_WS, FW_INAV
-    if file_header[0] == b'BTFL':
-        return OSD_TYPE_WS, FW_BETAFL
-    if file_header[0] == b'ARDU' or file_header[0] == b'APC_':
-        return OSD_TYPE_WS, FW_ARDU
-
-    if page:
-        page.pubsub.send_all_on_topic('error', f"{osd_path} has an invalid file header")
-    else:
-        print(f"{osd_path} has an invalid file header")
-        sys.exit(1)
+        buf = mmap.mmap(dump_f.fileno(), 0, access=mmap.ACCESS_READ)
+        stat = os.fstat(dump_f.fileno())
+
+    return OsdFile(pathlib.Path(osd_path), buf, stat)
+
+
+def detect_system(osd_file: OsdFile, on_error: Callable[[str], None] | None = None, verbatim: bool = False) -> tuple :
+    """
+    Without on_error (gui passes its error handler) invalid file terminates program,
+    with on_error (None, None) is returned
+    """
+    if osd_file.osd_type is not None:
+        return osd_file.osd_type, osd_file.firmware
+
+    if on_error:
+        on_error(f"{osd_file.path} has an invalid file header")
+        return None, None
+
+    print(f"{osd_file.path} has an invalid file header")
+    sys.exit(1)
 
 
 def decode_fw_str(firmware: int) -> str:
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import time
+from queue import Queue, Empty
+from threading import Thread
+from typing import BinaryIO
+
+# frames waiting for writing, when queue is full renderer waits for ffmpeg
+QUEUE_SIZE = 64
+# frames from queue are joined to one write up to this size
+BATCH_BYTES = 4 * 1024 * 1024
+
+
+class PipeWriter:
+    """
+    Writes frames to ffmpeg stdin in separate thread, so rendering and encoding by ffmpeg overlap.
+    Collects times when renderer waited for writer (ffmpeg is bottleneck)
+    and writer waited for frames (renderer is bottleneck)
+    """
+    __slots__ = (
+        'stream', 'queue', 'batch_bytes', 'thread', 'error',
+        'frames', 'writes', 'max_depth', 'depth_sum',
+        'producer_stall', 'consumer_stall', 'write_time',
+    )
+
+    def __init__(self, stream: BinaryIO, queue_size: int = QUEUE_SIZE, batch_bytes: int = BATCH_BYTES):
+        self.stream = stream
+        self.queue: Queue[bytes | None] = Queue(queue_size)
+        self.batch_bytes = batch_bytes
+        self.error: Exception | None = None
+
+        self.frames = 0
+        self.writes = 0
+        self.max_depth = 0
+        self.depth_sum = 0
+        self.producer_stall = 0.0
+        self.consumer_stall = 0.0
+        self.write_time = 0.0
+
+        self.thread = Thread(target=self._run, name='pipe writer', daemon=True)
+        self.thread.start()
+
+    def write(self, data: bytes) -> None:
+        """
+        Queues frame, raises error from writer thread (i.e. BrokenPipeError when ffmpeg terminated)
+        """
+        if self.error:
+            raise self.error
+
+        ts = time.perf_counter()
+        self.queue.put(data)
+        self.producer_stall += time.perf_counter() - ts
+
+        depth = self.queue.qsize()
+        self.max_depth = max(self.max_depth, depth)
+        self.depth_sum += depth
+        self.frames += 1
+
+    def close(self) -> None:
+        """
+        Waits until all queued frames are written, stream is not closed
+        """
+        self.queue.put(None)
+        self.thread.join()
+
+        if self.error:
+            raise self.error
+
+    def _run(self) -> None:
+        done = False
+        while not done:
+            ts = time.perf_counter()
+            data = self.queue.get()
+            self.consumer_stall += time.perf_counter() - ts
+
+            if data is None:
+                break
+
+            batch = [data]
+            size = len(data)
+            while size < self.batch_bytes:
+                try:
+                    data = self.queue.get_nowait()
+                except Empty:
+                    break
+
+                if data is None:
+                    done = True
+                    break
+
+                batch.append(data)
+                size += len(data)
+
+            ts = time.perf_counter()
+            try:
+                self.stream.write(batch[0] if len(batch) == 1 else b''.join(batch))
+                self.stream.flush()
+            except OSError as e:
+                self.error = e
+                break
+            finally:
+                self.write_time += time.perf_counter() - ts
+
+            self.writes += 1
+
+        # after error frames are dropped, so renderer is not blocked on full queue
+        while not done and self.error:
+            done = self.queue.get() is None
+
+    def __str__(self) -> str:
+        avg_depth = self.depth_sum / self.frames if self.frames else 0
+
+        return (
+            f'queue depth max {self.max_depth} avg {avg_depth:.1f}, '
+            f'renderer waited {self.producer_stall:.2f}s, writer waited {self.consumer_stall:.2f}s, '
+            f'pipe writes {self.write_time:.2f}s ({self.writes} writes)'
+        )
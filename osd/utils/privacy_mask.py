@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+from collections import namedtuple
+
+import numpy as np
+
+from ..config import Config
+
+# position of item that is not on frame
+NO_POSITION = -1
+# row shown for frames before first drawn frame
+NO_ROW = -1
+# cells left of altitude glyph decoded at once, longer (or unusual) numbers are read cell by cell
+ALT_WINDOW = 10
+
+FrameMasks = namedtuple("FrameMasks", "gps_lat gps_lon dist alt hide_alt")
+NO_MASKS = FrameMasks(None, None, None, None, False)
+
+SPACE = 0x20
+MINUS = 0x2D
+DIGIT_0 = 0x30
+# digit followed by dot
+DIGIT_DOT_0 = 0xA1
+# dot followed by digit
+DOT_DIGIT_0 = 0xB1
+STATS = [ord(c) for c in "STATS"]
+
+
+class MaskTable:
+    """
+    Items to hide found on every osd frame: (x, y) of last lat, lon, home and altitude glyph
+    in row-major order (NO_POSITION when glyph is not on frame) and altitude over limit flag
+    """
+    __slots__ = 'positions', 'hide_alt'
+
+    def __init__(self, positions: np.ndarray, hide_alt: np.ndarray):
+        # (frames, 4, 2) array, items are in order of FrameMasks
+        self.positions = positions
+        self.hide_alt = hide_alt
+
+    @classmethod
+    def concat(cls, tables: list[MaskTable]) -> MaskTable:
+        if not tables:
+            return cls(np.zeros((0, 4, 2), dtype=np.int16), np.zeros(0, dtype=bool))
+
+        return cls(
+            np.concatenate([table.positions for table in tables]),
+            np.concatenate([table.hide_alt for table in tables]),
+        )
+
+    def __len__(self) -> int:
+        return len(self.hide_alt)
+
+    def __getitem__(self, row: int) -> FrameMasks:
+        items = [tuple(pos) if pos[0] != NO_POSITION else None for pos in self.positions[row].tolist()]
+
+        return FrameMasks(*items, bool(self.hide_alt[row]))
+
+
+def _last_positions(found: np.ndarray) -> np.ndarray:
+    """
+    Returns (frames, 2) array of (x, y) of last True cell of every (frames, height, width) grid
+    """
+    n, _, width = found.shape
+    flat = found.reshape(n, -1)
+    positions = np.full((n, 2), NO_POSITION, dtype=np.int64)
+    # most frames don't have item, only frames with item are searched
+    rows = np.flatnonzero(flat.any(axis=1))
+    if rows.size:
+        last = flat.shape[1] - 1 - np.argmax(flat[rows, ::-1], axis=1)
+        positions[rows, 0] = last % width
+        positions[rows, 1] = last // width
+
+    return positions
+
+
+def read_float(grid: np.ndarray, x: int, y: int) -> float:
+    """
+    Reads number ending at (x, y) of (height, width) grid, digit-dot and dot-digit glyphs are decoded
+    """
+    buf = []
+    while x >= 0 and grid[y, x] != SPACE and grid[y, x] != 0x00:
+        ch = int(grid[y, x])
+        if DIGIT_DOT_0 <= ch <= DIGIT_DOT_0 + 9:
+            ch -= DIGIT_DOT_0 - DIGIT_0
+            buf.append('.')
+        if DOT_DIGIT_0 <= ch <= DOT_DIGIT_0 + 9:
+            ch -= DOT_DIGIT_0 - DIGIT_0
+        buf.append(chr(ch))
+        x -= 1
+
+    buf.reverse()
+
+    return float("".join(buf))
+
+
+def _read_altitudes(grids: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Decodes numbers ending at (x, y) of every grid, same as read_float
+    """
+    n = len(grids)
+    k = np.arange(ALT_WINDOW)
+    # cells right to left, outside of grid ends number as space does
+    cols = x[:, np.newaxis] - k
+    cells = grids[np.arange(n)[:, np.newaxis], y[:, np.newaxis], np.maximum(cols, 0)]
+    cells = np.where(cols >= 0, cells, SPACE)
+
+    end = (cells == SPACE) | (cells == 0x00)
+    length = np.argmax(end, axis=1)
+    inside = k < length[:, np.newaxis]
+
+    plain = (cells >= DIGIT_0) & (cells <= DIGIT_0 + 9)
+    digit_dot = (cells >= DIGIT_DOT_0) & (cells <= DIGIT_DOT_0 + 9)
+    dot_digit = (cells >= DOT_DIGIT_0) & (cells <= DOT_DIGIT_0 + 9)
+    is_digit = (plain | digit_dot | dot_digit) & inside
+    minus = (cells == MINUS) & (k == length[:, np.newaxis] - 1)
+    dots = digit_dot & inside
+
+    digits = np.select([plain, digit_dot, dot_digit], [cells - DIGIT_0, cells - DIGIT_DOT_0, cells - DOT_DIGIT_0], 0)
+    number = (np.where(is_digit, digits, 0).astype(np.int64) * 10 ** k).sum(axis=1)
+    # dot is written after digit, so digits right of it are decimals
+    decimals = np.where(dots.any(axis=1), np.argmax(dots, axis=1), 0)
+    values = number / 10.0 ** decimals
+    values = np.where(minus.any(axis=1), -values, values)
+
+    simple = (
+        end.any(axis=1)
+        & (is_digit | minus | ~inside).all(axis=1)
+        & (dots.sum(axis=1) <= 1)
+        & is_digit.any(axis=1)
+    )
+    # other glyphs or numbers longer than window are read same way as before
+    for i in np.flatnonzero(~simple):
+        values[i] = read_float(grids[i], int(x[i]), int(y[i]))
+
+    return values
+
+
+def find_masks(grids: np.ndarray, exclusions, cfg: Config) -> MaskTable:
+    """
+    Finds items to hide on (frames, height, width) glyph grids at once, result of every frame is
+    same as scanning its cells row by row
+    """
+    # dji grids are transposed views of cells
+    grids = np.ascontiguousarray(grids)
+    n = len(grids)
+    positions = np.full((n, 4, 2), NO_POSITION, dtype=np.int16)
+    hide_alt = np.zeros(n, dtype=bool)
+
+    if cfg.hide_gps:
+        positions[:, 0] = _last_positions(grids == exclusions.LAT_CHAR_CODE)
+        positions[:, 1] = _last_positions(grids == exclusions.LON_CHAR_CODE)
+
+    if cfg.hide_dist:
+        positions[:, 2] = _last_positions(grids == exclusions.HOME_CHAR_CODE)
+
+    if cfg.hide_alt:
+        alt2 = grids == exclusions.ALT_CHAR_CODE2
+        positions[:, 3] = _last_positions((grids == exclusions.ALT_CHAR_CODE) | alt2)
+
+        rows = np.flatnonzero(positions[:, 3, 0] != NO_POSITION)
+        if rows.size:
+            x = positions[rows, 3, 0].astype(np.int64)
+            y = positions[rows, 3, 1].astype(np.int64)
+            mult = np.where(alt2[rows, y, x], 1000, 1)
+            hide_alt[rows] = _read_altitudes(grids[rows], x - 1, y) * mult > cfg.max_alt
+
+    return MaskTable(positions, hide_alt)
+
+
+def resolve_masks(found: MaskTable, skipped: np.ndarray) -> MaskTable:
+    """
+    Masks drawn on every frame: when gps or home item is on frame, all of them are hidden at positions
+    remembered from previous frames, altitude is hidden when it is over limit, skipped frames are not drawn
+    """
+    n = len(found)
+    positions = found.positions.copy()
+    positions[skipped] = NO_POSITION
+
+    present = positions[:, :, 0] != NO_POSITION
+    last = np.maximum.accumulate(np.where(present, np.arange(n)[:, np.newaxis], -1), axis=0)
+    remembered = positions[np.maximum(last, 0), np.arange(4)]
+    remembered[last < 0] = NO_POSITION
+
+    hide_alt = found.hide_alt & ~skipped
+    masks = np.full_like(positions, NO_POSITION)
+    masks[:, :3] = np.where(present[:, :3].any(axis=1)[:, np.newaxis, np.newaxis], remembered[:, :3], NO_POSITION)
+    masks[:, 3] = np.where(hide_alt[:, np.newaxis], positions[:, 3], NO_POSITION)
+
+    return MaskTable(masks, hide_alt)
+
+
+def find_stats_screens(grids: np.ndarray, hide_stats: bool) -> np.ndarray:
+    """
+    Returns True for (frames, height, width) grids showing stats screen that is not drawn
+    """
+    n = len(grids)
+    s1 = grids[:, 1, 15] == STATS[0]
+    s2 = grids[:, 2, 15] == STATS[0]
+    y = np.where(s1, 1, 2)
+    text = grids[np.arange(n)[:, np.newaxis], y[:, np.newaxis], np.arange(15, 20)]
+
+    return ((hide_stats & s1) | s2) & (text == STATS).all(axis=1)
+
+
+def shown_rows(skipped: np.ndarray) -> np.ndarray:
+    """
+    Row of frame on screen for every frame, skipped frames leave previous frame on screen
+    """
+    rows = np.where(skipped, NO_ROW, np.arange(len(skipped)))
+
+    return np.maximum.accumulate(rows) if len(rows) else rows
@@ -1,39 +1,62 @@
+import codecs
 import pathlib
-from ..frame import SrtFrame
 import re
 
-import pysrt
+import numpy as np
 
-from .time_to_ms import time_to_milliseconds
+from ..frame import SRT_FIELDS, SrtStore
 
+# subtitle start time or "Name:value" item of subtitle text, whole file is scanned once
+SRT_TOKEN = re.compile(
+    r'^(\d+):(\d+):(\d+)[,.](\d+)[ \t]*-->[^\n]*$'
+    r'|([A-Za-z]+):[^\s\d+\-.]*([-+]?\d*\.\d+|\d+)',
+    re.MULTILINE,
+)
 
-def read_srt_frames(srt_path: pathlib.Path, verbatim: bool, fps: int) -> list[SrtFrame]:
+
+def _decode(data: bytes) -> str:
+    if data[:2] in (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE):
+        return data.decode('utf-16', errors='replace')
+
+    return data.decode('utf-8-sig', errors='replace')
+
+
+def read_srt_frames(srt_path: pathlib.Path, verbatim: bool, fps: int) -> SrtStore:
     frames_per_ms = (1 / fps) * 1000
 
     if verbatim:
         print(f'Loading srt data from {srt_path}')
-    subs = pysrt.open(srt_path)
-
-    result = []
-    pattern = r'[-+]?\d*\.\d+|\d+'
-
-    for sub in subs:
-        items = sub.text.split(' ')
-        d = {}
-        for item in items:
-            name, val = item.lower().split(':')
-            val = re.search(pattern, val).group()
-            try:
-                val = int(val)
-            except ValueError:
-                val = float(val)
-            d[name] = val
-
-        ms = time_to_milliseconds(sub.start.to_time())
-        frame_idx = int(ms // frames_per_ms)
-        d['start_time'] = ms
-        d['idx'] = frame_idx
-        frame = SrtFrame(**d)
-        result.append(frame)
-
-    return result
+
+    with open(srt_path, 'rb') as srt_f:
+        text = _decode(srt_f.read())
+
+    start_times = []
+    # (rows, values) of every field, columns are built when all subtitles are read
+    items = {name: ([], []) for name in SRT_FIELDS}
+    row = -1
+
+    for hours, minutes, seconds, ms, name, val in SRT_TOKEN.findall(text):
+        if hours:
+            start_times.append(((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(ms))
+            row += 1
+            continue
+
+        item = items.get(name.lower())
+        if item is not None and row >= 0:
+            item[0].append(row)
+            item[1].append(val)
+
+    count = len(start_times)
+    values = {}
+    ints = {}
+    for name, (rows, vals) in items.items():
+        values[name] = np.zeros(count, dtype=np.float64)
+        ints[name] = np.ones(count, dtype=bool)
+        if rows:
+            values[name][rows] = np.fromiter(map(float, vals), dtype=np.float64, count=len(vals))
+            ints[name][rows] = np.fromiter(('.' not in val for val in vals), dtype=bool, count=len(vals))
+
+    start_time = np.array(start_times, dtype=np.int64)
+    idx = (start_time // frames_per_ms).astype(np.int64)
+
+    return SrtStore(start_time, idx, values, ints)
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import numpy as np
+
+CellRange = tuple[np.ndarray, np.ndarray]
+
+
+def update_cell_range(cell_range: CellRange | None, grids: np.ndarray) -> CellRange | None:
+    """
+    Lowest and highest glyph code of every cell of (frames, height, width) grids, combined with
+    range of grids seen before (None when there were no grids)
+    """
+    if not len(grids):
+        return cell_range
+
+    lo, hi = grids.min(axis=0), grids.max(axis=0)
+    if cell_range is None:
+        return lo, hi
+
+    return np.minimum(cell_range[0], lo), np.maximum(cell_range[1], hi)
+
+
+def dynamic_cells(cell_range: CellRange | None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (ys, xs) of cells that change during flight, other cells show same glyph on every frame
+    """
+    if cell_range is None:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+
+    return np.nonzero(cell_range[0] != cell_range[1])
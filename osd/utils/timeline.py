@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from ..frame import Frame, FrameStore, SrtFrame, SrtStore
+
+# srt row of segment without srt data
+NO_SRT = -1
+
+
+class Timeline:
+    """
+    Table of segments of output video, segment [start, end) displays osd frame osd_row
+    with srt frame srt_row (NO_SRT when srt is not drawn)
+    """
+    __slots__ = 'start', 'end', 'osd_row', 'srt_row'
+
+    def __init__(self, start: np.ndarray, end: np.ndarray, osd_row: np.ndarray, srt_row: np.ndarray):
+        self.start = start
+        self.end = end
+        self.osd_row = osd_row
+        self.srt_row = srt_row
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    def __getitem__(self, key: slice) -> Timeline:
+        return Timeline(self.start[key], self.end[key], self.osd_row[key], self.srt_row[key])
+
+    def __iter__(self) -> Iterator[tuple[int, int, int, int]]:
+        return zip(self.start.tolist(), self.end.tolist(), self.osd_row.tolist(), self.srt_row.tolist())
+
+    def shown_srt(self) -> Timeline:
+        """
+        Same segments with srt row on screen, last srt frame stays on screen after srt data ends
+        """
+        # srt rows are increasing, so running maximum fills NO_SRT with previous row
+        srt_row = np.maximum.accumulate(self.srt_row) if len(self) else self.srt_row
+
+        return Timeline(self.start, self.end, self.osd_row, srt_row)
+
+    def find(self, frame_no: int) -> int | None:
+        """
+        Returns segment displayed in video frame frame_no
+        """
+        pos = int(np.searchsorted(self.start, frame_no, side='right')) - 1
+        if pos >= 0 and frame_no < self.end[pos]:
+            return pos
+
+        return None
+
+
+def _srt_idx(srt_frames: SrtStore | list[SrtFrame]) -> np.ndarray:
+    if isinstance(srt_frames, SrtStore):
+        return srt_frames.idx
+
+    return np.array([srt.idx for srt in srt_frames], dtype=np.int64)
+
+
+def build_timeline(frames: FrameStore | list[Frame], srt_frames: SrtStore | list[SrtFrame]) -> Timeline:
+    """
+    Merges osd frames with srt frames, every osd frame (except last one) is split on srt frames starting inside it
+    """
+    if isinstance(frames, FrameStore):
+        osd_start, osd_end = frames.idx[:-1], frames.next_idx[:-1]
+    else:
+        osd_start = np.array([frame.idx for frame in frames[:-1]], dtype=np.int64)
+        osd_end = np.array([frame.next_idx for frame in frames[:-1]], dtype=np.int64)
+
+    rows = np.arange(len(osd_start), dtype=np.int64)
+    srt_idx = _srt_idx(srt_frames)
+    if len(srt_idx) == 0:
+        return Timeline(osd_start.astype(np.int64), osd_end.astype(np.int64), rows, np.full(len(rows), NO_SRT, dtype=np.int64))
+
+    # first srt frame starting in osd frame and first one after it
+    first = np.searchsorted(srt_idx, osd_start, side='left')
+    # end before start when osd idx is not increasing
+    last = np.maximum(np.searchsorted(srt_idx, osd_end, side='left'), first)
+    # otherwise srt frame started before osd frame is displayed from its start (NO_SRT if there is none)
+    on_start = srt_idx[np.minimum(first, len(srt_idx) - 1)] == osd_start
+    first = np.where(on_start, first, first - 1)
+
+    # no srt frame before end of osd frame or all srt frames before osd frame
+    no_srt = (last == 0) | ((first + 1 >= len(srt_idx)) & ~on_start)
+    # osd frame ending before srt frame started on its start still has one segment
+    counts = np.where(no_srt, 1, np.maximum(last - first, 1))
+
+    osd_row = np.repeat(rows, counts)
+    # position of segment inside osd frame
+    pos = np.arange(len(osd_row)) - np.repeat(np.cumsum(counts) - counts, counts)
+    srt_row = np.repeat(first, counts) + pos
+
+    start = np.where(pos == 0, osd_start[osd_row], srt_idx[np.clip(srt_row, 0, len(srt_idx) - 1)])
+    end = np.where(pos == counts[osd_row] - 1, osd_end[osd_row], srt_idx[np.clip(srt_row + 1, 0, len(srt_idx) - 1)])
+    srt_row = np.where(no_srt[osd_row] | (srt_row < 0), NO_SRT, srt_row)
+
+    return Timeline(start.astype(np.int64), end.astype(np.int64), osd_row, srt_row.astype(np.int64))
+
+
+def iter_segments(frames: Iterable[Frame], srt_frames: SrtStore | list[SrtFrame]) -> Iterator[tuple[int, int, Frame, int]]:
+    """
+    Same segments as in build_timeline for frames read one by one, osd frame is returned instead of row
+    """
+    srt_idx = _srt_idx(srt_frames).tolist()
+    # first srt frame not before current osd frame, frames are in increasing order so it only moves forward
+    first = 0
+    prev = None
+
+    for frame in frames:
+        if prev is None:
+            prev = frame
+            continue
+
+        osd_frame, prev = prev, frame
+        osd_start, osd_end = osd_frame.idx, osd_frame.next_idx
+
+        if first > 0 and srt_idx[first - 1] >= osd_start:
+            first = 0
+        while first < len(srt_idx) and srt_idx[first] < osd_start:
+            first += 1
+        last = first
+        while last < len(srt_idx) and srt_idx[last] < osd_end:
+            last += 1
+
+        on_start = first < len(srt_idx) and srt_idx[first] == osd_start
+        srt_first = first if on_start else first - 1
+
+        if last == 0 or srt_first + 1 >= len(srt_idx) and not on_start:
+            yield osd_start, osd_end, osd_frame, NO_SRT
+            continue
+
+        last = max(last, srt_first + 1)
+        for srt_row in range(srt_first, last):
+            start = osd_start if srt_row == srt_first else srt_idx[srt_row]
+            end = osd_end if srt_row == last - 1 else srt_idx[srt_row + 1]
+            yield start, end, osd_frame, srt_row if srt_row >= 0 else NO_SRT
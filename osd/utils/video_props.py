@@ -1,7 +1,14 @@
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
+import hashlib
+import json
+import os
 import pathlib
 
-import cv2
+from .cache_dir import cache_dir
+from .mp4_probe import read_video_track
+
+# change when probe returns different properties for same file
+VIDEO_CACHE_VERSION = 1
 
 
 @dataclass(slots=True)
@@ -14,22 +21,93 @@ class VideoProperties:
     duration_sec: int
 
 
+def _video_properties(fps: int, width: int, height: int, frame_count: int) -> VideoProperties:
+    duration = int(frame_count/fps)
+    duration_min = int(duration / 60)
+    duration_sec = duration % 60
+    return VideoProperties(fps, width, height, frame_count, duration_min, duration_sec)
+
+
+def _probe_mp4(mp4_filename: pathlib.Path) -> VideoProperties | None:
+    track = read_video_track(mp4_filename)
+    if track is None:
+        return None
+
+    # average frame rate, same as reported by ffmpeg for mp4
+    fps = track.sample_count * track.timescale // track.duration
+    width = track.coded_width or track.width
+    height = track.coded_height or track.height
+    if track.rotated:
+        width, height = height, width
+
+    return _video_properties(fps, width, height, track.sample_count)
+
+
+def _probe_ffprobe(mp4_filename: pathlib.Path) -> VideoProperties:
+    # imported only when mp4 probe fails
+    import ffmpeg
+
+    stream = ffmpeg.probe(str(mp4_filename), select_streams='v:0')['streams'][0]
+    num, den = stream['avg_frame_rate'].split('/')
+    fps = int(int(num) / int(den))
+    frame_count = int(stream.get('nb_frames') or round(float(stream['duration']) * fps))
+
+    return _video_properties(fps, int(stream['width']), int(stream['height']), frame_count)
+
+
+def _cache_path(mp4_filename: pathlib.Path) -> pathlib.Path:
+    name = hashlib.sha1(str(mp4_filename.resolve()).encode('utf-8')).hexdigest()
+
+    return cache_dir('video') / f'{name}.json'
+
+
+def _cache_key(stat: os.stat_result) -> list:
+    return [VIDEO_CACHE_VERSION, stat.st_size, stat.st_mtime_ns]
+
+
+def load_cached_properties(mp4_filename: pathlib.Path, stat: os.stat_result) -> VideoProperties | None:
+    try:
+        with open(_cache_path(mp4_filename)) as f:
+            cached = json.load(f)
+        if cached['key'] != _cache_key(stat):
+            return None
+        return VideoProperties(**cached['props'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_cached_properties(mp4_filename: pathlib.Path, stat: os.stat_result, props: VideoProperties) -> None:
+    """
+    Stores probed properties, errors are ignored (cache is only optimization)
+    """
+    tmp_path = None
+    try:
+        path = _cache_path(mp4_filename)
+        tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'key': _cache_key(stat), 'props': asdict(props)}, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        if tmp_path:
+            tmp_path.unlink(missing_ok=True)
+
+
 def get_video_properties(mp4_filename: pathlib.Path) -> VideoProperties:
-    mp4_filename = str(mp4_filename)
+    """
+    Properties are read from mp4/mov boxes, ffprobe is used for other containers,
+    result is cached for file (size and modification time are checked)
+    """
+    mp4_filename = pathlib.Path(mp4_filename)
     try:
-        vcap = cv2.VideoCapture(mp4_filename)
-        fps = int(vcap.get(cv2.CAP_PROP_FPS))
-        width  = int(vcap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(vcap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        frame_count = int(vcap.get(cv2.CAP_PROP_FRAME_COUNT))
-        duration = int(frame_count/fps)
-        duration_min = int(duration / 60)
-        duration_sec = duration % 60
-        return VideoProperties(fps, width, height, frame_count, duration_min, duration_sec)
-    
+        stat = mp4_filename.stat()
+        props = load_cached_properties(mp4_filename, stat)
+        if props is not None:
+            return props
+
+        props = _probe_mp4(mp4_filename) or _probe_ffprobe(mp4_filename)
+        save_cached_properties(mp4_filename, stat, props)
+        return props
+
     except Exception as e:
         print(f"Cannot read fps from {mp4_filename}, {e}")
         return None
-    finally:
-        vcap.release()
-         
@@ -1,9 +1,16 @@
+import mmap
+import os
 import struct
 import pathlib
 from array import array
+from typing import Iterator
+
+import numpy as np
 
 from .config import Config
-from .frame import Frame
+from .frame import Frame, FrameStore
+from .utils.mapped_pages import RELEASE_CHUNK, release_pages
+from .utils.osd_cache import load_cached_frames, save_cached_frames
 from .ws_file_header import WSFileHeader
 
 WS_VIDEO_FPS: int = 60
@@ -20,49 +27,114 @@ frame_header_struct_ws = struct.Struct("<L1060H")
 # L unsigned long
 # 1060H unsigned short
 
+frame_time_struct_ws = struct.Struct("<L")
+
+frame_dtype_ws = np.dtype([('time', '<u4'), ('cells', '<u2', (1060,))])
+
+
+def _apply_header(ws_file_header: WSFileHeader, verbatim: bool, cfg: Config) -> None:
+    cfg.update_from_ws(ws_file_header)
 
-def read_ws_osd_header(osd_path: pathlib.Path) -> WSFileHeader:
-    with open(osd_path, "rb") as dump_f:
-        file_header_data = dump_f.read(file_header_struct_ws.size)
-        file_header = file_header_struct_ws.unpack(file_header_data)
+    if verbatim:
+        print(f"system:      {ws_file_header.system}")
+        print(f"char width:  {ws_file_header.char_width}")
+        print(f"char height: {ws_file_header.char_height}")
 
-    return WSFileHeader(file_header)
 
+def read_ws_osd_frames(
+    osd_path: pathlib.Path, buf: mmap.mmap, ws_file_header: WSFileHeader, verbatim: bool, cfg: Config, stat: os.stat_result | None = None
+) -> FrameStore:
+    """
+    Frames are read from memory mapped file (see open_osd),
+    parsed frames are cached (cfg.no_osd_cache disables it)
+    """
+    _apply_header(ws_file_header, verbatim, cfg)
 
-def read_ws_osd_frames(osd_path: pathlib.Path, verbatim: bool, cfg: Config) -> list[Frame]:
+    if not cfg.no_osd_cache:
+        frames = load_cached_frames(osd_path, stat)
+        if frames is not None:
+            if verbatim:
+                print('OSD frames loaded from cache')
+            return frames
+
+    frames = _read_ws_frames(buf, verbatim)
+
+    if not cfg.no_osd_cache:
+        save_cached_frames(osd_path, frames, stat)
+
+    return frames
+
+
+def _read_ws_frames(buf: mmap.mmap, verbatim: bool) -> FrameStore:
+    """
+    All frames have same size, body of file is mapped as array of (time, cells) records,
+    frame indexes and duplicates are calculated for all frames at once
+    """
     frames_per_ms = (1 / WS_VIDEO_FPS) * 1000
-    frames: list[Frame] = []
 
-    with open(osd_path, "rb") as dump_f:
-        file_header_data = dump_f.read(file_header_struct_ws.size)
-        file_header = file_header_struct_ws.unpack(file_header_data)
-        ws_file_header = WSFileHeader(file_header)
+    body_size = len(buf) - file_header_struct_ws.size
+    count = body_size // frame_dtype_ws.itemsize
+    if body_size % frame_dtype_ws.itemsize and verbatim:
+        print('Incomplete last frame skipped')
 
-        cfg.update_from_ws(ws_file_header)
+    if count <= 0:
+        return FrameStore.from_frames([])
 
-        if verbatim:
-            print(f"system:      {ws_file_header.system}")
-            print(f"char width:  {ws_file_header.char_width}")
-            print(f"char height: {ws_file_header.char_height}")
+    body = np.frombuffer(buf, dtype=frame_dtype_ws, count=count, offset=file_header_struct_ws.size)
 
-        while True:
-            frame_header = dump_f.read(frame_header_struct_ws.size)
-            if len(frame_header) == 0:
-                break
+    frame_idxs = (body['time'] // frames_per_ms).astype(np.int64)
 
-            frame = array('H', frame_header)
-            osd_time = frame[0] + (frame[1] << 16)
-            frame_idx = int(osd_time // frames_per_ms)
-            frame_data = frame[2:]
+    # frame with same idx as previous one is dropped
+    keep = np.ones(count, dtype=bool)
+    keep[1:] = frame_idxs[1:] != frame_idxs[:-1]
+    if verbatim:
+        for frame_idx in frame_idxs[~keep].tolist():
+            print(f'Duplicate frame: {frame_idx}')
 
-            if len(frames) > 0 and frames[-1].idx == frame_idx:
-                if verbatim:
-                    print(f'Duplicate frame: {frame_idx}')
-                continue
+    idx = frame_idxs[keep]
+    next_idx = np.zeros_like(idx)
+    next_idx[:-1] = idx[1:]
+    sizes = np.full(idx.shape, frame_header_struct_ws.size, dtype=np.int64)
 
-            if len(frames) > 0:
-                frames[-1].next_idx = frame_idx
+    # cells of kept frames are copied from mapped file to one matrix
+    return FrameStore(idx, next_idx, sizes, body['cells'][keep])
 
-            frames.append(Frame(frame_idx, 0, frame_header_struct_ws.size, frame_data))
 
-    return frames
+def iter_ws_osd_frames(buf: mmap.mmap, ws_file_header: WSFileHeader, verbatim: bool, cfg: Config) -> Iterator[Frame]:
+    """
+    Returns frames one by one as they are read from memory mapped file (see open_osd),
+    frame is returned when next one is read (next_idx is known), read part of file is released from memory
+    """
+    # config is updated before first frame is requested
+    _apply_header(ws_file_header, verbatim, cfg)
+
+    return _iter_ws_frames(buf, verbatim)
+
+
+def _iter_ws_frames(buf: mmap.mmap, verbatim: bool) -> Iterator[Frame]:
+    frames_per_ms = (1 / WS_VIDEO_FPS) * 1000
+    frame_size = frame_header_struct_ws.size
+    time_size = frame_time_struct_ws.size
+
+    prev = None
+    released = 0
+    for pos in range(file_header_struct_ws.size, len(buf) - frame_size + 1, frame_size):
+        osd_time, = frame_time_struct_ws.unpack_from(buf, pos)
+        frame_idx = int(osd_time // frames_per_ms)
+
+        if prev is not None and prev.idx == frame_idx:
+            if verbatim:
+                print(f'Duplicate frame: {frame_idx}')
+            continue
+
+        frame = Frame(frame_idx, 0, frame_size, array('H', buf[pos + time_size:pos + frame_size]))
+        if prev is not None:
+            prev.next_idx = frame_idx
+            yield prev
+
+        prev = frame
+        if pos - released > RELEASE_CHUNK:
+            released = release_pages(buf, released, pos)
+
+    if prev is not None:
+        yield prev
@@ -0,0 +1,125 @@
+import os
+import pathlib
+import tempfile
+import unittest
+from unittest import mock
+
+from osd.utils import codecs
+
+
+class TestCodecs(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        folder = pathlib.Path(self.tmp.name)
+        self.env = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': str(folder / 'cache')})
+        self.env.start()
+
+        self.ffmpeg = folder / 'ffmpeg'
+        self.ffmpeg.write_bytes(b'')
+        self.patches = [
+            mock.patch.object(codecs, '_probes', None),
+            mock.patch.object(codecs, '_ffmpeg_path', return_value=str(self.ffmpeg)),
+            mock.patch.object(codecs.platform, 'system', return_value='Linux'),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+        self.working = {'libx264', 'libx265', 'h264_vaapi'}
+        self.probed = []
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def probe(self, ffmpeg_path: str, codec: str) -> bool:
+        self.probed.append(codec)
+        return codec in self.working
+
+    def find_codec(self, use_h265: bool, refresh: bool = False, new_process: bool = True) -> str | None:
+        if new_process:
+            codecs._probes = None
+        with mock.patch.object(codecs, '_probe_codec', self.probe):
+            return codecs.find_codec(use_h265, refresh)
+
+    def test_preferred_codec(self):
+        self.assertEqual(self.find_codec(False), 'h264_vaapi')
+        self.assertEqual(self.find_codec(True), 'libx265')
+        self.assertEqual(sorted(self.probed), sorted(c.codec for c in codecs.CODECS_H265 + codecs.CODECS_H264 if 'linux' in c.os))
+
+    def test_cached_on_disk(self):
+        self.find_codec(False)
+        self.probed.clear()
+
+        self.assertEqual(self.find_codec(False), 'h264_vaapi')
+        self.assertEqual(self.probed, [])
+
+    def test_refresh(self):
+        self.find_codec(False)
+        self.working.remove('h264_vaapi')
+
+        self.assertEqual(self.find_codec(False), 'h264_vaapi')
+        self.assertEqual(self.find_codec(False, refresh=True, new_process=False), 'libx264')
+        self.assertEqual(self.find_codec(False), 'libx264')
+
+    def test_ffmpeg_changed(self):
+        self.find_codec(False)
+        self.probed.clear()
+
+        os.utime(self.ffmpeg, ns=(0, 10 ** 9))
+        self.find_codec(False)
+        self.assertNotEqual(self.probed, [])
+
+    def calibrate(self, speed: dict, quality: dict, use_h265: bool = False, refresh: bool = False, startup: dict | None = None):
+        self.encoded = []
+
+        def encode(ffmpeg_path, codec, preset, width, height, frames, out_path):
+            self.encoded.append((codec, preset, frames))
+            if (codec, preset) not in speed:
+                return None
+            return (startup or {}).get(codec, 0.5) + frames / speed[(codec, preset)]
+
+        def psnr(ffmpeg_path, width, height, out_path):
+            return quality.get(self.encoded[-1][:2], 40.0)
+
+        with mock.patch.object(codecs, '_probe_codec', self.probe), \
+                mock.patch.object(codecs, '_encode_clip', encode), \
+                mock.patch.object(codecs, '_clip_psnr', psnr):
+            return codecs.calibrate_codecs(use_h265, 320, 240, refresh)
+
+    def test_calibration(self):
+        speed = {('h264_vaapi', None): 100.0, ('libx264', None): 30.0, ('libx264', 'veryfast'): 150.0, ('libx264', 'ultrafast'): 300.0}
+        # ultrafast is fastest, but its quality is too low compared to other presets
+        quality = {('libx264', 'ultrafast'): 38.0, ('libx264', 'veryfast'): 39.5}
+
+        best = self.calibrate(speed, quality)
+        self.assertEqual((best.codec, best.preset), ('libx264', 'veryfast'))
+        self.assertAlmostEqual(best.fps, 150.0)
+        # warm-up and full clip for every codec and preset
+        self.assertEqual(len(self.encoded), 8)
+        self.assertEqual({frames for _, _, frames in self.encoded}, {codecs.CALIBRATION_WARMUP_FRAMES, codecs.CALIBRATION_FRAMES})
+
+        # results are cached for resolution
+        self.assertEqual(self.calibrate(speed, quality), best)
+        self.assertEqual(self.encoded, [])
+
+    def test_calibration_startup_time(self):
+        # hardware codec is faster, but its slow initialization is not counted
+        speed = {('h264_vaapi', None): 400.0, ('libx264', None): 30.0, ('libx264', 'veryfast'): 150.0, ('libx264', 'ultrafast'): 300.0}
+        best = self.calibrate(speed, {}, startup={'h264_vaapi': 5.0, 'libx264': 0.05})
+
+        self.assertEqual((best.codec, best.preset), ('h264_vaapi', None))
+        self.assertAlmostEqual(best.fps, 400.0)
+
+    def test_calibration_h265_fallback(self):
+        self.working = {'libx264'}
+        speed = {('libx264', None): 30.0, ('libx264', 'veryfast'): 150.0}
+
+        best = self.calibrate(speed, {}, use_h265=True)
+        self.assertEqual((best.codec, best.preset), ('libx264', 'veryfast'))
+
+    def test_clip_bitrate(self):
+        # fixed low bitrate, independent of output bitrate
+        self.assertEqual(codecs._clip_bitrate(1920, 1080), 2488)
+        self.assertEqual(codecs._clip_bitrate(2, 2), 1)
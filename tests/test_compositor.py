@@ -0,0 +1,116 @@
+import pathlib
+import tempfile
+import unittest
+from array import array
+from configparser import ConfigParser
+
+import numpy as np
+from PIL import Image
+
+from osd.compositor import IMAGE_ARRAY_CACHE_SIZE, NumpyCompositor
+from osd.config import Config
+from osd.const import COMPOSITOR_NUMPY, HD_TILE_WIDTH, HD_TILE_HEIGHT, OSD_TYPE_DJI, PIPE_FORMAT_RGBA, TILES_PER_PAGE
+from osd.font import SMALL_STRING_CACHE_SIZE, Font
+from osd.frame import Frame, SrtFrame
+from osd.render import get_renderer
+from osd.utils.timeline import build_timeline
+
+
+def create_font(folder: pathlib.Path) -> Font:
+    rng = np.random.default_rng(1)
+    for name in ('font.bin', 'font_2.bin'):
+        page = rng.integers(0, 255, (TILES_PER_PAGE * HD_TILE_HEIGHT, HD_TILE_WIDTH, 4), dtype=np.uint8)
+        (folder / name).write_bytes(page.tobytes())
+
+    return Font(folder / 'font', True, small_font_scale=0.5)
+
+
+class TestNumpyCompositor(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.font = create_font(pathlib.Path(self.tmp.name))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def pil_draw(self, img: Image.Image, codes: np.ndarray, last: np.ndarray) -> None:
+        for y in range(codes.shape[0]):
+            for x in range(codes.shape[1]):
+                if codes[y, x] != last[y, x]:
+                    img.paste(self.font[int(codes[y, x])], (x * HD_TILE_WIDTH, y * HD_TILE_HEIGHT))
+
+    def test_same_as_pil(self):
+        cols, rows = 7, 5
+        compositor = NumpyCompositor(self.font, cols, rows)
+        img = Image.new("RGBA", (cols * HD_TILE_WIDTH, rows * HD_TILE_HEIGHT))
+        last = np.zeros((rows, cols), dtype=np.uint16)
+
+        rng = np.random.default_rng(2)
+        for _ in range(3):
+            codes = rng.integers(0, 2 * TILES_PER_PAGE, (rows, cols), dtype=np.uint16)
+            codes[0, :3] = last[0, :3]
+            self.pil_draw(img, codes, last)
+            compositor.draw(codes)
+            last = codes
+            self.assertEqual(compositor.image().tobytes(), img.tobytes())
+
+        full = Image.new("RGBA", img.size)
+        self.pil_draw(full, last, last + 1)
+        compositor.compose(last)
+        self.assertEqual(compositor.image().tobytes(), full.tobytes())
+
+    def test_paste_clipped(self):
+        compositor = NumpyCompositor(self.font, 2, 2)
+        img = Image.new("RGBA", (2 * HD_TILE_WIDTH, 2 * HD_TILE_HEIGHT))
+        tile = self.font[65]
+        for xy in ((-5, -7), (HD_TILE_WIDTH + 10, HD_TILE_HEIGHT), (1000, 0)):
+            compositor.paste(tile, xy)
+            img.paste(tile, xy)
+
+        self.assertEqual(compositor.image().tobytes(), img.tobytes())
+
+    def test_small_string(self):
+        img = Image.new("RGBA", (10 * HD_TILE_WIDTH, HD_TILE_HEIGHT))
+        glyphs = img.copy()
+        step = int(HD_TILE_WIDTH * self.font.small_font_scale)
+        for n, c in enumerate("RSSI:-45"):
+            glyphs.paste(self.font.get_small_font(ord(c)), (3 + n * step, 2))
+        img.paste(self.font.get_small_string("RSSI:-45"), (3, 2))
+
+        self.assertEqual(img.tobytes(), glyphs.tobytes())
+        self.assertIs(self.font.get_small_string("RSSI:-45"), self.font.get_small_string("RSSI:-45"))
+
+    def test_image_cache_bounded(self):
+        compositor = NumpyCompositor(self.font, 2, 2)
+        tile = self.font[65]
+        compositor.paste(tile, (0, 0))
+        for n in range(IMAGE_ARRAY_CACHE_SIZE * 3):
+            # short lived images, ids of released images are reused
+            compositor.paste(Image.new("RGBA", (3, 2), (n % 256, n // 256, 0, 255)), (5, 5))
+            self.assertEqual(compositor.image().getpixel((5, 5)), (n % 256, n // 256, 0, 255))
+            # image pasted repeatedly stays cached
+            compositor.paste(tile, (0, 0))
+
+        self.assertEqual(len(compositor.image_arrays), IMAGE_ARRAY_CACHE_SIZE)
+        self.assertIn(id(tile), compositor.image_arrays)
+
+    def test_srt_strings(self):
+        # every srt record draws new strings, arrays of them are not kept for whole flight
+        cfg = Config(ConfigParser())
+        cfg.display_width, cfg.display_height = 5, 4
+        cfg.pipe_format = PIPE_FORMAT_RGBA
+        cfg.compositor = COMPOSITOR_NUMPY
+        cfg.calculate()
+        cfg.srt_data = ['signal', 'delay', 'bitrate']
+        cfg.srt_start_location = (0, 3)
+
+        # last osd frame only ends previous one
+        frames = [Frame(idx, idx + 3000, 60 * 22, array('H', bytes(2 * 60 * 22))) for idx in (0, 3000)]
+        srt_frames = [SrtFrame(i * 0.1, i, i % 5, 1, 0, i, 25.0) for i in range(3000)]
+        renderer = get_renderer(OSD_TYPE_DJI)(self.font, cfg, OSD_TYPE_DJI, frames, srt_frames)
+        for segment in build_timeline(frames, srt_frames):
+            renderer._draw_segment(segment)
+
+        self.assertLessEqual(len(self.font.small_string_cache), SMALL_STRING_CACHE_SIZE)
+        # 3000 strings of delay were drawn
+        self.assertLess(len(renderer.compositor.image_arrays), 2 * SMALL_STRING_CACHE_SIZE)
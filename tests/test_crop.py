@@ -0,0 +1,83 @@
+import pathlib
+import tempfile
+import unittest
+from array import array
+from configparser import ConfigParser
+
+import numpy as np
+from PIL import Image
+
+from osd.config import Config
+from osd.const import OSD_TYPE_DJI, PIPE_FORMAT_RGBA, InavParams
+from osd.frame import Frame, SrtFrame
+from osd.render import get_renderer
+from osd.utils.timeline import build_timeline
+
+from tests.test_compositor import create_font
+
+
+class TestCrop(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.font = create_font(pathlib.Path(self.tmp.name))
+        # empty cells are transparent
+        self.font.img.paste((0, 0, 0, 0), (0, 0, self.font.tile_width, self.font.tile_height))
+
+        self.cfg = Config(ConfigParser())
+        self.cfg.display_width, self.cfg.display_height = 12, 8
+        self.cfg.pipe_format = PIPE_FORMAT_RGBA
+        self.cfg.calculate()
+
+        rng = np.random.default_rng(4)
+        self.frames = []
+        for i in range(20):
+            grid = np.zeros((12, 22), dtype=np.uint16)
+            grid[5:8, 3:5] = rng.integers(1, 512, (3, 2))
+            if i > 10:
+                grid[6, 4] = InavParams.LAT_CHAR_CODE
+            self.frames.append(Frame(i * 3, i * 3 + 3, grid.size, array('H', grid.tobytes())))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def assert_outside_transparent(self, box: tuple[int, int, int, int], srt_frames: list[SrtFrame] | None = None) -> None:
+        renderer = get_renderer(OSD_TYPE_DJI)(self.font, self.cfg, OSD_TYPE_DJI, self.frames, srt_frames or [])
+        x0, y0, x1, y1 = box
+        self.assertTrue(x0 % 2 == y0 % 2 == x1 % 2 == y1 % 2 == 0)
+        self.assertLess((x1 - x0) * (y1 - y0), self.cfg.target_width * self.cfg.target_height // 2)
+
+        for segment in build_timeline(self.frames, srt_frames or []):
+            renderer._draw_segment(segment)
+            alpha = np.asarray(renderer.to_final_size(renderer.canvas_image()))[..., 3].copy()
+            self.assertGreater(alpha[y0:y1, x0:x1].sum(), 0)
+            alpha[y0:y1, x0:x1] = 0
+            self.assertEqual(alpha.sum(), 0)
+
+    def test_content_box(self):
+        self.cfg.hide_gps = True
+        self.cfg.overlay_img = Image.new('RGBA', (9, 7), (255, 0, 0, 255))
+        self.cfg.overlay_location = (100, 70)
+
+        box = get_renderer(OSD_TYPE_DJI)(self.font, self.cfg, OSD_TYPE_DJI, self.frames, []).content_box()
+        self.assert_outside_transparent(box)
+
+    def test_srt_box(self):
+        # srt text is narrower than wide display
+        self.cfg.display_width = 40
+        self.cfg.calculate()
+        # longest line is longer than cleared part of line
+        self.cfg.srt_data = ['signal', 'ch', 'flighttime', 'delay', 'bitrate']
+        self.cfg.srt_start_location = (2, 6)
+        srt_frames = [SrtFrame(i * 0.1, i * 7, i % 5, 1, 0, 20 + i * 40, 25.0 + i) for i in range(12)]
+
+        box = get_renderer(OSD_TYPE_DJI)(self.font, self.cfg, OSD_TYPE_DJI, self.frames, srt_frames).content_box()
+        self.assertLess(box[2], self.cfg.target_width * 3 // 4)
+        self.assert_outside_transparent(box, srt_frames)
+
+    def test_cropped_frames(self):
+        renderer = get_renderer(OSD_TYPE_DJI)(self.font, self.cfg, OSD_TYPE_DJI, self.frames, [])
+        self.cfg.crop_box = renderer.content_box()
+        x0, y0, x1, y1 = self.cfg.crop_box
+
+        self.assertEqual(self.cfg.pipe_size(), (x1 - x0, y1 - y0))
+        self.assertEqual(len(renderer.encode_image(renderer.final_image())), (x1 - x0) * (y1 - y0) * 4)
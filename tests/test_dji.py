@@ -0,0 +1,75 @@
+import pathlib
+import struct
+import tempfile
+import unittest
+from configparser import ConfigParser
+
+from osd.config import Config
+from osd.const import OSD_TYPE_DJI, FW_BETAFL
+from osd.dji import file_header_struct_dji, frame_header_struct_dji
+from osd.utils.osd_props import detect_system, open_osd
+
+
+def write_osd(path: pathlib.Path, frames: list[tuple[int, list[int]]], tail: bytes = b'') -> None:
+    data = bytearray(file_header_struct_dji.pack(b'MSPOSD\x00', 3, 60, 22, 24, 36, 0, 0, 1))
+    for idx, cells in frames:
+        data += frame_header_struct_dji.pack(idx, len(cells))
+        data += struct.pack(f'<{len(cells)}H', *cells)
+
+    path.write_bytes(bytes(data) + tail)
+
+
+def read_frames(path: pathlib.Path, verbatim: bool, cfg: Config):
+    with open_osd(path) as osd_file:
+        return osd_file.read_frames(verbatim, cfg)
+
+
+class TestDjiReader(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.tmp.name) / 'test.osd'
+        self.cfg = Config(ConfigParser())
+        self.cfg.no_osd_cache = True
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_duplicates_skipped(self):
+        write_osd(self.path, [(0, [1, 2]), (5, [3, 4]), (5, [5, 6]), (9, [7, 8])])
+        frames = read_frames(self.path, False, self.cfg)
+
+        self.assertEqual([(f.idx, f.next_idx) for f in frames], [(0, 5), (5, 9), (9, 0)])
+        self.assertEqual(list(frames[1].data), [3, 4])
+        self.assertEqual((self.cfg.display_width, self.cfg.display_height), (60, 22))
+
+    def test_truncated_frame(self):
+        write_osd(self.path, [(0, [1, 2]), (3, [3, 4])], frame_header_struct_dji.pack(6, 2) + b'\x01')
+        frames = read_frames(self.path, False, self.cfg)
+
+        self.assertEqual([f.idx for f in frames], [0, 3])
+        self.assertEqual(list(frames[-1].data), [3, 4])
+
+    def test_open_osd(self):
+        write_osd(self.path, [(0, [1, 2])])
+        with open_osd(self.path) as osd_file:
+            self.assertEqual((osd_file.osd_type, osd_file.firmware), (OSD_TYPE_DJI, FW_BETAFL))
+            self.assertEqual(osd_file.header.char_width, 60)
+
+    def test_invalid_header(self):
+        self.path.write_bytes(b'not an osd file' * 4)
+        errors = []
+        with open_osd(self.path) as osd_file:
+            self.assertEqual(detect_system(osd_file, errors.append), (None, None))
+
+        self.assertEqual(errors, [f'{self.path} has an invalid file header'])
+
+    def test_iter_frames(self):
+        write_osd(self.path, [(1, [1, 2]), (5, [3, 4]), (5, [5, 6]), (9, [7, 8])])
+        frames = read_frames(self.path, False, self.cfg)
+        with open_osd(self.path) as osd_file:
+            stream = list(osd_file.iter_frames(False, self.cfg))
+
+        self.assertEqual(
+            [(f.idx, f.next_idx, f.size, f.data and list(f.data)) for f in stream],
+            [(f.idx, f.next_idx, f.size, f.data and list(f.data)) for f in frames],
+        )
@@ -0,0 +1,97 @@
+import pathlib
+import tempfile
+import unittest
+from configparser import ConfigParser
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from osd.config import Config
+from osd.const import OSD_TYPE_DJI, PIPE_FORMAT_PAL8, PIPE_FORMAT_PNG, PIPE_FORMAT_RGBA
+from osd.render import PAL8_COLORS, get_renderer
+
+from tests.test_compositor import create_font
+
+
+def decode_pal8(data: bytes, size: tuple[int, int]) -> np.ndarray:
+    """
+    Returns (height, width, 4) rgba pixels of rawvideo pal8 frame
+    """
+    width, height = size
+    indexes = np.frombuffer(data, dtype=np.uint8, count=width * height).reshape(height, width)
+    # native endian uint32 ARGB entries
+    argb = np.frombuffer(data, dtype='=u4', offset=width * height)
+    palette = np.stack([(argb >> shift) & 0xFF for shift in (16, 8, 0, 24)], axis=-1).astype(np.uint8)
+
+    return palette[indexes]
+
+
+class TestEncode(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.font = create_font(pathlib.Path(self.tmp.name))
+
+        self.cfg = Config(ConfigParser())
+        self.cfg.display_width, self.cfg.display_height = 4, 3
+        self.cfg.calculate()
+        self.cfg.target_width, self.cfg.target_height = 40, 30
+
+        # few distinct colors with different alpha, pal8 keeps them exactly
+        pixels = np.zeros((30, 40, 4), dtype=np.uint8)
+        pixels[5:20, 3:30] = (10, 20, 30, 128)
+        pixels[10:25, 20:38] = (255, 0, 0, 255)
+        pixels[0, :5] = (200, 100, 50, 60)
+        self.pixels = pixels
+        self.img = Image.fromarray(pixels)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def encode(self, pipe_format: str) -> bytes:
+        self.cfg.pipe_format = pipe_format
+        renderer = get_renderer(OSD_TYPE_DJI)(self.font, self.cfg, OSD_TYPE_DJI, [], [])
+
+        return renderer.encode_image(self.img)
+
+    def test_rgba(self):
+        data = self.encode(PIPE_FORMAT_RGBA)
+        width, height = self.cfg.pipe_size()
+
+        self.assertEqual(len(data), width * height * 4)
+        self.assertTrue(data == self.pixels.tobytes())
+
+    def test_pal8(self):
+        data = self.encode(PIPE_FORMAT_PAL8)
+        width, height = self.cfg.pipe_size()
+
+        self.assertEqual(len(data), width * height + PAL8_COLORS * 4)
+        self.assertTrue((decode_pal8(data, (width, height)) == self.pixels).all())
+
+        # entry of half transparent color is 0x800A141E in native byte order
+        argb = np.frombuffer(data, dtype='=u4', offset=width * height)
+        self.assertIn(0x800A141E, argb.tolist())
+
+    def test_pal8_lossy(self):
+        # more than 256 colors are quantized
+        rng = np.random.default_rng(5)
+        self.img = Image.fromarray(rng.integers(0, 256, (30, 40, 4), dtype=np.uint8))
+        data = self.encode(PIPE_FORMAT_PAL8)
+
+        self.assertEqual(len(data), 40 * 30 + PAL8_COLORS * 4)
+        self.assertLessEqual(len(np.unique(decode_pal8(data, (40, 30)).reshape(-1, 4), axis=0)), PAL8_COLORS)
+
+    def test_png(self):
+        data = self.encode(PIPE_FORMAT_PNG)
+        with Image.open(BytesIO(data)) as img:
+            self.assertEqual(img.size, self.cfg.pipe_size())
+            self.assertTrue(np.asarray(img.convert('RGBA')).tobytes() == self.pixels.tobytes())
+
+    def test_cropped_size(self):
+        self.cfg.crop_box = (2, 4, 12, 10)
+        self.img = self.img.crop(self.cfg.crop_box)
+        width, height = self.cfg.pipe_size()
+
+        self.assertEqual((width, height), (10, 6))
+        self.assertEqual(len(self.encode(PIPE_FORMAT_RGBA)), width * height * 4)
+        self.assertEqual(len(self.encode(PIPE_FORMAT_PAL8)), width * height + PAL8_COLORS * 4)
@@ -0,0 +1,46 @@
+import pathlib
+import tempfile
+import unittest
+from configparser import ConfigParser
+
+from osd.config import Config
+from osd.const import OSD_TYPE_DJI
+from osd.render import get_renderer
+from osd.utils.frame_cache import FrameCache
+
+from tests.test_compositor import create_font
+
+
+class TestFrameCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = FrameCache(10)
+        cache.put(b'a', b'1234')
+        cache.put(b'b', b'1234')
+        self.assertEqual(cache.get(b'a'), b'1234')
+
+        cache.put(b'c', b'1234')
+        self.assertIsNone(cache.get(b'b'))
+        self.assertEqual(cache.get(b'a'), b'1234')
+        self.assertEqual(cache.get(b'c'), b'1234')
+
+        self.assertEqual((cache.hits, cache.misses, cache.evictions), (3, 1, 1))
+        self.assertEqual(cache.size, 8)
+
+    def test_too_big(self):
+        cache = FrameCache(2)
+        cache.put(b'a', b'123')
+        self.assertIsNone(cache.get(b'a'))
+        self.assertEqual(cache.size, 0)
+
+    def test_renderer_cache(self):
+        cfg = Config(ConfigParser())
+        cfg.display_width, cfg.display_height = 4, 3
+        cfg.calculate()
+        with tempfile.TemporaryDirectory() as tmp:
+            font = create_font(pathlib.Path(tmp))
+
+            # cache is off unless size is set
+            self.assertIsNone(get_renderer(OSD_TYPE_DJI)(font, cfg, OSD_TYPE_DJI, [], []).frame_cache)
+
+            cfg.frame_cache = 1
+            self.assertEqual(get_renderer(OSD_TYPE_DJI)(font, cfg, OSD_TYPE_DJI, [], []).frame_cache.max_bytes, 1024 * 1024)
@@ -0,0 +1,40 @@
+import pickle
+import unittest
+from array import array
+
+from osd.frame import Frame, FrameStore
+
+
+class TestFrameStore(unittest.TestCase):
+    def setUp(self):
+        self.frames = [
+            Frame(0, 5, 0, None),
+            Frame(5, 9, 3, array('H', [1, 2, 3])),
+            Frame(9, 20, 3, array('H', [4, 5, 6])),
+            Frame(20, 0, 2, array('H', [7, 8])),
+        ]
+        self.store = FrameStore.from_frames(self.frames)
+
+    def test_items(self):
+        self.assertEqual(len(self.store), 4)
+        self.assertIsNone(self.store[0].data)
+        self.assertEqual(list(self.store[2].data), [4, 5, 6])
+        # shorter frames are padded with zeros
+        self.assertEqual(list(self.store[-1].data), [7, 8, 0])
+        self.assertEqual([(f.idx, f.next_idx, f.size) for f in self.store], [(f.idx, f.next_idx, f.size) for f in self.frames])
+
+    def test_slice(self):
+        part = self.store[1:3]
+        self.assertIsInstance(part, FrameStore)
+        self.assertEqual([f.idx for f in part], [5, 9])
+
+    def test_find(self):
+        self.assertEqual(self.store.find(0), 0)
+        self.assertEqual(self.store.find(8), 1)
+        self.assertEqual(self.store.find(9), 2)
+        self.assertIsNone(self.store.find(25))
+        self.assertIsNone(self.store.find(-1))
+
+    def test_pickle(self):
+        store = pickle.loads(pickle.dumps(self.store))
+        self.assertEqual(list(store[1].data), [1, 2, 3])
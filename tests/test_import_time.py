@@ -0,0 +1,42 @@
+import subprocess
+import sys
+import unittest
+
+# modules not needed to render from command line
+CLI_FORBIDDEN = ('flet', 'cv2', 'pysrt', 'ffmpeg', 'cProfile')
+# cumulative import time of cli module, flet alone was about 450 ms
+CLI_IMPORT_BUDGET_MS = 500
+
+
+def import_times(module: str) -> dict[str, int]:
+    """
+    Imports module in new interpreter, returns cumulative import time in microseconds of every imported module
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, check=True,
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+
+    return times
+
+
+class TestImportTime(unittest.TestCase):
+    def test_cli_imports(self):
+        times = import_times('osd.__main__')
+
+        loaded = {name.split('.')[0] for name in times}
+        self.assertEqual(loaded.intersection(CLI_FORBIDDEN), set())
+        self.assertLess(times['osd.__main__'] / 1000, CLI_IMPORT_BUDGET_MS)
+
+
+if __name__ == '__main__':
+    # slowest imports of cli
+    for name, us in sorted(import_times('osd.__main__').items(), key=lambda item: -item[1])[:30]:
+        print(f'{us / 1000:8.1f} ms  {name}')
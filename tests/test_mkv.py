@@ -0,0 +1,97 @@
+import hashlib
+import pathlib
+import shutil
+import subprocess
+import tempfile
+import unittest
+from io import BytesIO
+
+from PIL import Image
+
+from osd.utils.mkv import CLUSTER_ID, CLUSTER_TIMESTAMP_ID, SIMPLE_BLOCK_ID, MkvWriter, _id, _size
+
+
+def read_vint(data: bytes, pos: int) -> tuple[int, int]:
+    """
+    Returns (value, length) of element size at pos
+    """
+    length = 9 - data[pos].bit_length()
+    value = int.from_bytes(data[pos:pos + length], 'big') & ((1 << (7 * length)) - 1)
+
+    return value, length
+
+
+def read_elements(data: bytes) -> list[tuple[int, bytes]]:
+    """
+    Returns (id, data) of top level elements, ids are 1 - 4 bytes long
+    """
+    elements = []
+    pos = 0
+    while pos < len(data):
+        id_length = 9 - data[pos].bit_length()
+        element_id = int.from_bytes(data[pos:pos + id_length], 'big')
+        size, size_length = read_vint(data, pos + id_length)
+        start = pos + id_length + size_length
+        elements.append((element_id, data[start:start + size]))
+        pos = start + size
+
+    return elements
+
+
+class TestMkv(unittest.TestCase):
+    def test_size_lengths(self):
+        for length in range(1, 9):
+            # all ones value means unknown size, so biggest size of every length goes to next length
+            for size in ((1 << (7 * (length - 1))) - 1 if length > 1 else 0, (1 << (7 * length)) - 2):
+                with self.subTest(size=size):
+                    encoded = _size(size)
+                    self.assertEqual(len(encoded), length)
+                    self.assertEqual(read_vint(encoded, 0), (size, length))
+
+    def test_clusters(self):
+        writer = MkvWriter(2, 1, 'rgba')
+        # timestamps over int16 range of block timecode
+        timestamps = (0, 40, 32767, 32768, 100_000, 10_000_000)
+        frames = [writer.frame(ts, bytes([n]) * 8) for n, ts in enumerate(timestamps)]
+
+        for n, (ts, frame) in enumerate(zip(timestamps, frames)):
+            [(element_id, cluster)] = read_elements(frame)
+            self.assertEqual(element_id, CLUSTER_ID)
+
+            (timestamp_id, timestamp), (block_id, block) = read_elements(cluster)
+            self.assertEqual((timestamp_id, int.from_bytes(timestamp, 'big')), (CLUSTER_TIMESTAMP_ID, ts))
+            # track 1, block timecode relative to cluster is 0, keyframe
+            self.assertEqual((block_id, block[:4], block[4:]), (SIMPLE_BLOCK_ID, b'\x81\x00\x00\x80', bytes([n]) * 8))
+
+        self.assertEqual(_id(CLUSTER_ID), b'\x1f\x43\xb6\x75')
+
+    @unittest.skipUnless(shutil.which('ffmpeg'), 'ffmpeg not found')
+    def test_ffmpeg_reads_stream(self):
+        timestamps = (0, 40, 100, 40_000, 100_000)
+        for codec in ('rgba', 'png'):
+            with self.subTest(codec=codec):
+                writer = MkvWriter(8, 6, codec)
+                frames = []
+                for n in range(len(timestamps)):
+                    img = Image.new('RGBA', (8, 6), (n * 50, 0, 255 - n * 50, n * 60))
+                    if codec == 'rgba':
+                        frames.append(img.tobytes())
+                    else:
+                        buf = BytesIO()
+                        img.save(buf, format='png')
+                        frames.append(buf.getvalue())
+
+                with tempfile.TemporaryDirectory() as tmp:
+                    path = pathlib.Path(tmp) / 'overlay.mkv'
+                    path.write_bytes(writer.header() + b''.join(writer.frame(ts, data) for ts, data in zip(timestamps, frames)))
+
+                    result = subprocess.run(
+                        ['ffmpeg', '-v', 'error', '-i', str(path), '-map', '0:v', '-c', 'copy', '-f', 'framemd5', '-'],
+                        capture_output=True, text=True, check=True,
+                    )
+
+                # packets: stream, dts, pts, duration, size, md5 in 1/1000 time base
+                lines = [line.split(',') for line in result.stdout.splitlines() if not line.startswith('#')]
+                self.assertIn('#tb 0: 1/1000', result.stdout)
+                self.assertEqual([int(line[2]) for line in lines], list(timestamps))
+                self.assertEqual([line[5].strip() for line in lines], [hashlib.md5(data).hexdigest() for data in frames])
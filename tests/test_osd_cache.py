@@ -0,0 +1,60 @@
+import os
+import pathlib
+import tempfile
+import unittest
+from configparser import ConfigParser
+from unittest import mock
+
+from osd.config import Config
+from osd.utils.osd_cache import cache_path, load_cached_frames, prune_cache
+
+from tests.test_dji import read_frames, write_osd
+
+
+class TestOsdCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        folder = pathlib.Path(self.tmp.name)
+        self.env = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': str(folder / 'cache')})
+        self.env.start()
+
+        self.path = folder / 'test.osd'
+        write_osd(self.path, [(0, [1, 2]), (5, [3, 4]), (9, [5, 6])])
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_cached_frames(self):
+        frames = read_frames(self.path, False, Config(ConfigParser()))
+        self.assertTrue(cache_path(self.path).exists())
+
+        cached = load_cached_frames(self.path)
+        self.assertEqual([(f.idx, f.next_idx, f.size, list(f.data)) for f in cached], [(f.idx, f.next_idx, f.size, list(f.data)) for f in frames])
+
+        cfg = Config(ConfigParser())
+        self.assertEqual(list(read_frames(self.path, False, cfg)[2].data), [5, 6])
+        self.assertEqual(cfg.display_width, 60)
+
+    def test_invalidated_on_change(self):
+        read_frames(self.path, False, Config(ConfigParser()))
+        write_osd(self.path, [(0, [1, 2]), (5, [3, 4])])
+
+        self.assertIsNone(load_cached_frames(self.path))
+        self.assertEqual(len(read_frames(self.path, False, Config(ConfigParser()))), 2)
+
+    def test_cache_folder_error(self):
+        with mock.patch('osd.utils.osd_cache.cache_dir', side_effect=PermissionError):
+            self.assertIsNone(load_cached_frames(self.path))
+            self.assertEqual(len(read_frames(self.path, False, Config(ConfigParser()))), 3)
+
+    def test_prune(self):
+        folder = cache_path(self.path).parent
+        for i in range(4):
+            path = folder / f'{i}.bin'
+            path.write_bytes(b'\0' * 100)
+            os.utime(path, ns=(i * 10**9, i * 10**9))
+
+        prune_cache(folder, 250)
+
+        self.assertEqual(sorted(path.name for path in folder.glob('*.bin')), ['2.bin', '3.bin'])
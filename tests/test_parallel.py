@@ -0,0 +1,193 @@
+import pathlib
+import tempfile
+import unittest
+from array import array
+from configparser import ConfigParser
+from unittest import mock
+
+import numpy as np
+
+from osd.config import Config
+from osd.const import OSD_TYPE_DJI, PIPE_FORMAT_PNG, PIPE_FORMAT_RGBA, InavParams
+from PIL import Image
+
+from osd.frame import Frame, SrtFrame
+from osd import parallel
+from osd.parallel import render_ranges_parallel, shards
+from osd import render
+from osd.render import get_renderer, INTERNAL_W_H_DJI
+from osd.utils.timeline import build_timeline, iter_segments
+
+from tests.test_compositor import create_font
+
+
+def create_frames(count: int) -> list[Frame]:
+    rng = np.random.default_rng(3)
+    cells = np.zeros(INTERNAL_W_H_DJI[0] * INTERNAL_W_H_DJI[1], dtype=np.uint16)
+    frames = []
+    for i in range(count):
+        # only part of screen changes between frames, like in real osd
+        cells[rng.integers(0, 22 * 5, 4)] = rng.integers(0, 512, 4)
+        frames.append(Frame(i * 3, i * 3 + 3, cells.size, array('H', cells.tobytes())))
+
+    return frames
+
+
+class TestParallelRender(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.font = create_font(pathlib.Path(self.tmp.name))
+
+        self.cfg = Config(ConfigParser())
+        self.cfg.display_width, self.cfg.display_height = 5, 4
+        self.cfg.pipe_format = PIPE_FORMAT_RGBA
+        self.cfg.calculate()
+
+        self.frames = create_frames(30)
+        self.items = build_timeline(self.frames, [])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def renderer(self, srt_frames: list[SrtFrame] | None = None):
+        cls = get_renderer(OSD_TYPE_DJI)
+        return cls(self.font, self.cfg, OSD_TYPE_DJI, self.frames, srt_frames or [])
+
+    def render_sharded(self) -> list:
+        sharded = []
+        for shard in shards(self.items, size=7):
+            sharded.extend(self.renderer()._render_ranges(shard))
+
+        return sharded
+
+    def test_shards_cover_items(self):
+        parts = list(shards(self.items, size=7))
+        self.assertEqual([item for shard in parts for item in shard], list(self.items))
+        self.assertEqual([len(shard) for shard in parts], [7, 7, 7, 7, 1])
+
+    def test_same_as_serial(self):
+        serial = list(self.renderer()._render_ranges(self.items))
+
+        self.assertEqual(self.render_sharded(), serial)
+
+    def test_same_as_serial_with_masks(self):
+        # longitude is seen only on first frames, its position is masked whenever latitude is on screen
+        for i, frame in enumerate(self.frames):
+            frame.data[1] = InavParams.LON_CHAR_CODE if i < 2 else 0x41
+            frame.data[24] = InavParams.LAT_CHAR_CODE if i > 20 else 0x41
+        self.cfg.hide_gps = True
+
+        serial = list(self.renderer()._render_ranges(self.items))
+
+        self.assertTrue(self.render_sharded() == serial)
+        self.assertTrue(list(render_ranges_parallel(self.renderer(), self.items, 2)) == serial)
+
+    def test_any_segment(self):
+        self.cfg.hide_gps = self.cfg.hide_alt = self.cfg.hide_dist = True
+        markers = (InavParams.LAT_CHAR_CODE, InavParams.LON_CHAR_CODE, InavParams.HOME_CHAR_CODE, InavParams.ALT_CHAR_CODE)
+        for frame in self.frames:
+            frame.data = array('H', [0 if c in markers else c for c in frame.data])
+        # items to hide (masks are removed while cells under them don't change) and stats screen
+        for frame in self.frames[5:20]:
+            frame.data[2 * 22 + 3] = InavParams.LAT_CHAR_CODE
+        for frame in self.frames[8:12]:
+            frame.data[4 * 22 + 1] = InavParams.HOME_CHAR_CODE
+        for x, c in enumerate('STATS'):
+            self.frames[15].data[(15 + x) * 22 + 2] = ord(c)
+
+        self.assert_any_segment([])
+
+    def test_layers(self):
+        # srt text over osd glyphs changes less often than osd
+        self.cfg.srt_data = ['signal', 'delay']
+        self.cfg.srt_start_location = (0, 3)
+        self.cfg.overlay_img = Image.new('RGBA', (30, 40), (255, 0, 0, 128))
+        srt_frames = [SrtFrame(i * 0.1, i * 7, i % 3, 1, 0, 20 + i // 4, 25.0) for i in range(12)]
+
+        # overlay apart from srt and over it
+        for location in ((20, 10), (20, 100)):
+            with self.subTest(location=location):
+                self.cfg.overlay_location = location
+                self.assert_any_segment(srt_frames)
+
+    def assert_any_segment(self, srt_frames: list[SrtFrame]) -> None:
+        items = build_timeline(self.frames, srt_frames)
+        serial = list(self.renderer(srt_frames)._render_ranges(items))
+        # frames read one by one keep state in renderer
+        stream = list(self.renderer(srt_frames)._render_ranges(iter_segments(self.frames, srt_frames)))
+        self.assertTrue(stream == serial)
+
+        # every segment drawn on its own is same as drawn after previous ones
+        for i, segment in enumerate(items.shown_srt()):
+            self.assertTrue(next(self.renderer(srt_frames)._render_ranges([segment])) == serial[i], f'segment {i}')
+
+    def test_process_pool(self):
+        serial = list(self.renderer()._render_ranges(self.items))
+        parallel = list(render_ranges_parallel(self.renderer(), self.items, 2))
+
+        self.assertEqual(parallel, serial)
+
+    def test_shard_bytes(self):
+        # 5x4 display, rgba frame of output size
+        frame_bytes = self.cfg.target_width * self.cfg.target_height * 4
+        serial = list(self.renderer()._render_ranges(self.items))
+
+        with mock.patch.object(parallel, 'SHARD_BYTES', frame_bytes * 3 + 1):
+            self.assertEqual(parallel.shard_size(self.cfg), 3)
+            self.assertTrue(list(render_ranges_parallel(self.renderer(), self.items, 2)) == serial)
+
+        with mock.patch.object(parallel, 'SHARD_BYTES', 1):
+            self.assertEqual(parallel.shard_size(self.cfg), 1)
+
+        self.assertEqual(parallel.pending_shards(self.cfg, 2), 3)
+        self.cfg.pipe_format = PIPE_FORMAT_PNG
+        self.assertEqual(parallel.pending_shards(self.cfg, 2), 4)
+
+    def test_worker_renderer(self):
+        # srt starts after first frames, shards are rendered out of order by one renderer
+        self.cfg.srt_data = ['signal', 'delay']
+        self.cfg.srt_start_location = (0, 3)
+        srt_frames = [SrtFrame(i * 0.1, 30 + i * 7, i % 3, 1, 0, 20 + i // 4, 25.0) for i in range(8)]
+        items = build_timeline(self.frames, srt_frames)
+        renderer = self.renderer(srt_frames)
+        serial = list(renderer._render_ranges(items))
+
+        renderer.precompute()
+        parallel._init_worker(
+            renderer.source_font, self.cfg, OSD_TYPE_DJI, self.frames, srt_frames,
+            renderer.shown_rows, renderer.masks, renderer.dynamic_cells,
+        )
+        worker = parallel._worker_renderer
+        parts = list(shards(items, size=5))
+        rendered = {i: parallel._render_shard(parts[i]) for i in reversed(range(len(parts)))}
+
+        self.assertIs(parallel._worker_renderer, worker)
+        self.assertTrue([item for i in range(len(parts)) for item in rendered[i]] == serial)
+
+    def test_encode_threads(self):
+        serial = list(self.renderer()._render_ranges(self.items))
+        threaded = list(self.renderer()._render_ranges_threaded(self.items, 3))
+
+        self.assertEqual(threaded, serial)
+
+    def test_auto_encode_threads(self):
+        renderer = self.renderer()
+        for affinity, threads in (({0}, 1), ({0, 1}, 2), (set(range(8)), 4)):
+            with self.subTest(affinity=affinity), \
+                    mock.patch.object(render.os, 'cpu_count', return_value=8), \
+                    mock.patch.object(render.os, 'sched_getaffinity', return_value=affinity, create=True):
+                self.assertEqual(renderer.encode_threads(), threads)
+
+        # platforms without affinity, cpu count may be unknown
+        for cpus, threads in ((None, 1), (1, 1), (3, 3)):
+            with self.subTest(cpus=cpus), mock.patch.object(render, 'os', mock.Mock(spec=['cpu_count'], cpu_count=lambda: cpus)):
+                self.assertEqual(renderer.encode_threads(), threads)
+
+        # single cpu renders without encode threads
+        with mock.patch.object(render, 'usable_cpus', return_value=1), \
+                mock.patch.object(renderer, '_render_ranges_threaded') as threaded:
+            self.assertEqual(list(renderer.render_ranges(self.items)), list(self.renderer()._render_ranges(self.items)))
+            threaded.assert_not_called()
+
+        self.cfg.encode_threads = 2
+        self.assertEqual(renderer.encode_threads(), 2)
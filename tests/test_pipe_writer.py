@@ -0,0 +1,31 @@
+import io
+import unittest
+
+from osd.utils.pipe_writer import PipeWriter
+
+
+class BrokenStream(io.BytesIO):
+    def write(self, data):
+        raise BrokenPipeError()
+
+
+class TestPipeWriter(unittest.TestCase):
+    def test_order_and_batches(self):
+        stream = io.BytesIO()
+        writer = PipeWriter(stream, queue_size=4, batch_bytes=10)
+        frames = [bytes([i]) * 3 for i in range(20)]
+        for frame in frames:
+            writer.write(frame)
+        writer.close()
+
+        self.assertEqual(stream.getvalue(), b''.join(frames))
+        self.assertEqual(writer.frames, 20)
+        self.assertLessEqual(writer.writes, 20)
+        self.assertLessEqual(writer.max_depth, 4)
+
+    def test_error_raised_in_producer(self):
+        writer = PipeWriter(BrokenStream(), queue_size=2)
+        with self.assertRaises(BrokenPipeError):
+            for _ in range(100):
+                writer.write(b'123')
+            writer.close()
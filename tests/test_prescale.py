@@ -0,0 +1,78 @@
+import pathlib
+import tempfile
+import unittest
+from array import array
+from configparser import ConfigParser
+
+import numpy as np
+
+from osd.config import Config
+from osd.const import COMPOSITOR_NUMPY, COMPOSITOR_PIL, OSD_TYPE_DJI, PIPE_FORMAT_RGBA, PRESCALE_BILINEAR, PRESCALE_OFF, InavParams
+from osd.frame import Frame
+from osd.render import get_renderer
+from osd.utils.timeline import NO_SRT
+
+from tests.test_compositor import create_font
+
+
+class TestPrescale(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.font = create_font(pathlib.Path(self.tmp.name))
+        # glyph 0 is transparent, glyph 1 is opaque
+        self.font.img.paste((0, 0, 0, 0), (0, 0, self.font.tile_width, self.font.tile_height))
+        self.font.img.paste((255, 255, 255, 255), (0, self.font.tile_height, self.font.tile_width, 2 * self.font.tile_height))
+
+        self.cfg = Config(ConfigParser())
+        self.cfg.display_width, self.cfg.display_height = 12, 8
+        self.cfg.pipe_format = PIPE_FORMAT_RGBA
+        self.cfg.calculate()
+        # output size is not multiple of display size, cells of prescaled font differ in size
+        self.cfg.target_width, self.cfg.target_height = 200, 150
+
+        grid = np.zeros((22, 60), dtype=np.uint16)
+        grid[:8, :12] = np.indices((8, 12)).sum(axis=0) % 2
+        self.grid = grid
+        self.frame = Frame(0, 3, grid.size, array('H', grid.T.tobytes()))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def render(self, prescale: str, compositor: str, frames: list[Frame]) -> np.ndarray:
+        self.cfg.prescale = prescale
+        self.cfg.compositor = compositor
+        renderer = get_renderer(OSD_TYPE_DJI)(self.font, self.cfg, OSD_TYPE_DJI, frames, [])
+        for frame in frames:
+            renderer.draw_screen(frame, renderer.find_frame_masks(renderer.frame_grid(frame)), NO_SRT)
+
+        return np.asarray(renderer.final_image())
+
+    def test_cells_span_output(self):
+        resized = self.render(PRESCALE_OFF, COMPOSITOR_PIL, [self.frame])
+        prescaled = self.render(PRESCALE_BILINEAR, COMPOSITOR_PIL, [self.frame])
+        self.assertEqual(prescaled.shape, resized.shape)
+
+        # inside of every cell (one pixel from its edges in resized frame) is same in both frames
+        width, height = 200, 150
+        for y in range(8):
+            for x in range(12):
+                x0, x1 = int(x * width / 12) + 1, int((x + 1) * width / 12) - 1
+                y0, y1 = int(y * height / 8) + 1, int((y + 1) * height / 8) - 1
+                alpha = 255 * int(self.grid[y, x])
+                self.assertTrue((resized[y0:y1, x0:x1, 3] == alpha).all(), f'resized cell {x}, {y}')
+                self.assertTrue((prescaled[y0:y1, x0:x1, 3] == alpha).all(), f'prescaled cell {x}, {y}')
+
+    def test_compositors(self):
+        # second frame is drawn incrementally, with gps mask of cells differing in size
+        grid = self.grid.copy()
+        grid[3, 2:6] = 1 - grid[3, 2:6]
+        grid[5, 4] = InavParams.LAT_CHAR_CODE
+        frames = [self.frame, Frame(3, 6, grid.size, array('H', grid.T.tobytes()))]
+        self.cfg.hide_gps = True
+
+        pil = self.render(PRESCALE_BILINEAR, COMPOSITOR_PIL, frames)
+        numpy = self.render(PRESCALE_BILINEAR, COMPOSITOR_NUMPY, frames)
+        full = self.render(PRESCALE_BILINEAR, COMPOSITOR_NUMPY, frames[1:])
+
+        self.assertTrue(pil.tobytes() == numpy.tobytes())
+        self.assertTrue(numpy.tobytes() == full.tobytes())
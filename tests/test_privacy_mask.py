@@ -0,0 +1,106 @@
+import unittest
+from configparser import ConfigParser
+
+import numpy as np
+
+from osd.config import Config
+from osd.const import ArduParams, InavParams
+from osd.utils.privacy_mask import NO_MASKS, FrameMasks, find_masks, read_float
+
+
+def scan_masks(grid: np.ndarray, exclusions, cfg: Config) -> FrameMasks:
+    """
+    Items to hide found by scanning cells row by row
+    """
+    gps_lat = gps_lon = dist = alt = None
+    hide_alt = False
+    for y in range(grid.shape[0]):
+        for x in range(grid.shape[1]):
+            char = int(grid[y, x])
+            if cfg.hide_gps and char == exclusions.LAT_CHAR_CODE:
+                gps_lat = (x, y)
+            if cfg.hide_gps and char == exclusions.LON_CHAR_CODE:
+                gps_lon = (x, y)
+            if cfg.hide_alt and char in (exclusions.ALT_CHAR_CODE, exclusions.ALT_CHAR_CODE2):
+                mult = 1000 if char == exclusions.ALT_CHAR_CODE2 else 1
+                hide_alt = read_float(grid, x - 1, y) * mult > cfg.max_alt
+                alt = (x, y)
+            if cfg.hide_dist and char == exclusions.HOME_CHAR_CODE:
+                dist = (x, y)
+
+    return FrameMasks(gps_lat, gps_lon, dist, alt, hide_alt)
+
+
+def write(grid: np.ndarray, x: int, y: int, codes: list[int]) -> None:
+    grid[y, x:x + len(codes)] = codes
+
+
+class TestPrivacyMask(unittest.TestCase):
+    def setUp(self):
+        self.cfg = Config(ConfigParser())
+        self.cfg.hide_gps = True
+        self.cfg.hide_alt = True
+        self.cfg.hide_dist = True
+        self.cfg.max_alt = 100
+
+    def test_altitude_glyphs(self):
+        # digit-dot and dot-digit glyphs start with 0
+        numbers = {
+            (0x31, 0x32, 0x33): 123.0,
+            (0x31, 0xA3, 0x35): 12.5,
+            (0x31, 0xA3, 0xB6): 12.5,
+            (0x2D, 0xA2, 0x35): -1.5,
+            (0x20, 0x20, 0xAA): 9.0,
+            # longer than decoded window
+            (0x31,) * 12: 111111111111.0,
+        }
+        grids = np.zeros((len(numbers), 3, 16), dtype=np.uint16)
+        for grid, codes in zip(grids, numbers):
+            write(grid, 15 - len(codes), 1, list(codes) + [InavParams.ALT_CHAR_CODE])
+
+        table = find_masks(grids, InavParams, self.cfg)
+        for row, value in enumerate(numbers.values()):
+            self.assertEqual(read_float(grids[row], 14, 1), value)
+            self.assertEqual(table[row], FrameMasks(None, None, None, (15, 1), value > self.cfg.max_alt))
+
+    def test_same_as_scan(self):
+        rng = np.random.default_rng(1)
+        digits = list(range(0x30, 0x3A)) + list(range(0xB1, 0xBB))
+        digit_dots = list(range(0xA1, 0xAB))
+        glyphs = np.array([0, 0x20, 0x2D, 0x2E] + digits + digit_dots)
+
+        for exclusions in (InavParams, ArduParams):
+            markers = [exclusions.LAT_CHAR_CODE, exclusions.LON_CHAR_CODE, exclusions.HOME_CHAR_CODE, exclusions.ALT_CHAR_CODE]
+            if exclusions.ALT_CHAR_CODE2 > 0:
+                markers.append(exclusions.ALT_CHAR_CODE2)
+
+            grids = rng.choice(glyphs, (300, 6, 14)).astype(np.uint16)
+            for grid in grids:
+                for marker in rng.choice(markers, rng.integers(0, 6)):
+                    y, x = rng.integers(0, 6), rng.integers(1, 14)
+                    # most altitudes are numbers ended by space
+                    if rng.random() < 0.8:
+                        x = max(x, 6)
+                        number = list(rng.choice(digits, 4))
+                        number[rng.integers(0, 4)] = rng.choice(digit_dots)
+                        write(grid, x - 5, y, [0x20] + number)
+                    grid[y, x] = marker
+
+            expected = []
+            for grid in grids:
+                try:
+                    expected.append(scan_masks(grid, exclusions, self.cfg))
+                except ValueError:
+                    expected.append(ValueError)
+
+            # altitude that is not number fails in both
+            parsed = [row for row, masks in enumerate(expected) if masks is not ValueError]
+            self.assertGreater(len(parsed), 50)
+            table = find_masks(grids[parsed], exclusions, self.cfg)
+            self.assertEqual([table[i] for i in range(len(table))], [expected[row] for row in parsed])
+
+    def test_disabled(self):
+        grid = np.zeros((1, 2, 4), dtype=np.uint16)
+        write(grid[0], 0, 0, [InavParams.LAT_CHAR_CODE, 0x35, InavParams.ALT_CHAR_CODE, InavParams.HOME_CHAR_CODE])
+
+        self.assertEqual(find_masks(grid, InavParams, Config(ConfigParser()))[0], NO_MASKS)
@@ -0,0 +1,61 @@
+import pathlib
+import tempfile
+import unittest
+
+from osd.frame import SrtFrame
+from osd.utils.srt import read_srt_frames
+
+SRT = """1
+00:00:00,000 --> 00:00:00,100
+Signal:4 CH:1 FlightTime:0 SBat:16.1V GBat:7.1V Delay:21ms Bitrate:25.1Mbps Distance:1m
+
+2
+00:00:01,050 --> 00:00:01,150
+Signal:3 CH:2 FlightTime:1 SBat:16.2V GBat:7.1V Delay:22ms Bitrate:25Mbps Distance:2m
+
+3
+01:02:03,400 --> 01:02:03,500
+Signal:2 CH:3 FlightTime:3723 UavBat:15.9V Delay:23ms Bitrate:8.5Mbps RcSignal:99
+"""
+
+
+class TestSrt(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.tmp.name) / 'test.srt'
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, data: bytes, fps: int = 60):
+        self.path.write_bytes(data)
+        return read_srt_frames(self.path, False, fps)
+
+    def test_frames(self):
+        frames = self.read(SRT.encode())
+
+        self.assertEqual(len(frames), 3)
+        self.assertEqual(frames.idx.tolist(), [0, 62, 223403])
+        self.assertEqual(frames[0], SrtFrame(0, 0, 4, 1, 0, 21, 25.1, distance=1, sbat=16.1, gbat=7.1))
+        self.assertEqual(frames[2], SrtFrame(3723400, 223403, 2, 3, 3723, 23, 8.5, uavbat=15.9, rcsignal=99))
+
+    def test_value_types(self):
+        # values are displayed as they were in file, integer values stay integers
+        frames = self.read(SRT.encode())
+
+        self.assertIsInstance(frames[0].bitrate, float)
+        self.assertIsInstance(frames[1].bitrate, int)
+        self.assertIsInstance(frames[1].signal, int)
+
+    def test_encoding(self):
+        frames = self.read(b'\xef\xbb\xbf' + SRT.replace('\n', '\r\n').encode())
+        self.assertEqual(list(frames), list(self.read(SRT.encode())))
+
+        frames = self.read(SRT.encode('utf-16'))
+        self.assertEqual(list(frames), list(self.read(SRT.encode())))
+
+    def test_slice(self):
+        frames = self.read(SRT.encode())
+
+        self.assertEqual(list(frames[1:]), list(frames)[1:])
+        self.assertEqual(len(self.read(b'')), 0)
@@ -0,0 +1,26 @@
+import unittest
+
+import numpy as np
+
+from osd.utils.static_cells import dynamic_cells, update_cell_range
+
+
+class TestStaticCells(unittest.TestCase):
+    def test_chunks(self):
+        rng = np.random.default_rng(1)
+        grids = np.tile(rng.integers(0, 512, (1, 4, 6)), (40, 1, 1)).astype(np.uint16)
+        grids[7, 1, 2] = 0x20
+        grids[31, 3, 5] += 1
+
+        cell_range = None
+        for start in range(0, len(grids), 16):
+            cell_range = update_cell_range(cell_range, grids[start:start + 16])
+
+        ys, xs = dynamic_cells(cell_range)
+        self.assertEqual(list(zip(ys.tolist(), xs.tolist())), [(1, 2), (3, 5)])
+
+    def test_no_frames(self):
+        cell_range = update_cell_range(None, np.zeros((0, 4, 6), dtype=np.uint16))
+
+        self.assertIsNone(cell_range)
+        self.assertEqual(len(dynamic_cells(cell_range)[0]), 0)
@@ -0,0 +1,119 @@
+import random
+import unittest
+
+from osd.frame import Frame, FrameStore, SrtFrame
+from osd.utils.find_slot import find_slots
+from osd.utils.timeline import NO_SRT, build_timeline, iter_segments
+
+
+def create_frames(idxs: list[int]) -> list[Frame]:
+    return [Frame(idx, next_idx, 1, None) for idx, next_idx in zip(idxs, idxs[1:] + [0])]
+
+
+def create_srt(idxs: list[int]) -> list[SrtFrame]:
+    return [SrtFrame(0, idx, 0, 0, 0, 0, 0) for idx in idxs]
+
+
+def slot_segments(frames: list[Frame], srt_frames: list[SrtFrame]) -> list[tuple[int, int, int, int]]:
+    """
+    Segments built from find_slots for every osd frame
+    """
+    srt_idxs = [srt.idx for srt in srt_frames]
+    segments = []
+    for row, frame in enumerate(frames[:-1]):
+        slots = find_slots(srt_idxs, frame.idx, frame.next_idx)
+        if not slots:
+            segments.append((frame.idx, frame.next_idx, row, NO_SRT))
+            continue
+
+        bounds = [frame.idx] + [srt_idxs[slot] for slot in slots[1:]] + [frame.next_idx]
+        for start, end, slot in zip(bounds, bounds[1:], slots):
+            segments.append((start, end, row, NO_SRT if slot is None else slot))
+
+    return segments
+
+
+class TestTimeline(unittest.TestCase):
+    def test_split_on_srt(self):
+        frames = create_frames([0, 5, 15, 20])
+        srt_frames = create_srt([2, 3, 8, 10, 16])
+
+        self.assertEqual(list(build_timeline(frames, srt_frames)), [
+            (0, 2, 0, NO_SRT),
+            (2, 3, 0, 0),
+            (3, 5, 0, 1),
+            (5, 8, 1, 1),
+            (8, 10, 1, 2),
+            (10, 15, 1, 3),
+            (15, 16, 2, 3),
+            (16, 20, 2, 4),
+        ])
+
+    def test_first_srt_frame(self):
+        # srt frame 0 is drawn also when osd frame is split
+        frames = create_frames([0, 10, 20])
+        srt_frames = create_srt([0, 5, 15])
+
+        self.assertEqual(list(build_timeline(frames, srt_frames)), [
+            (0, 5, 0, 0),
+            (5, 10, 0, 1),
+            (10, 15, 1, 1),
+            (15, 20, 1, 2),
+        ])
+
+    def test_no_srt(self):
+        frames = create_frames([0, 3, 7])
+
+        self.assertEqual(list(build_timeline(frames, [])), [(0, 3, 0, NO_SRT), (3, 7, 1, NO_SRT)])
+
+    def test_frame_store(self):
+        frames = create_frames([0, 4, 9, 12])
+        srt_frames = create_srt([1, 9, 10])
+        store = FrameStore.from_frames([Frame(f.idx, f.next_idx, 1, [0]) for f in frames])
+
+        self.assertEqual(list(build_timeline(store, srt_frames)), list(build_timeline(frames, srt_frames)))
+
+    def test_find(self):
+        timeline = build_timeline(create_frames([2, 5, 15, 20]), create_srt([8]))
+
+        self.assertIsNone(timeline.find(1))
+        self.assertEqual(timeline.find(2), 0)
+        self.assertEqual(timeline.find(9), 2)
+        self.assertEqual(timeline.find(19), 3)
+        self.assertIsNone(timeline.find(20))
+
+    def test_same_as_slots(self):
+        rnd = random.Random(1)
+        for _ in range(500):
+            frames = create_frames(sorted(rnd.sample(range(60), rnd.randint(1, 12))))
+            srt_frames = create_srt(sorted(rnd.choice(range(70)) for _ in range(rnd.randint(1, 10))))
+
+            expected = slot_segments(frames, srt_frames)
+            self.assertEqual(list(build_timeline(frames, srt_frames)), expected)
+
+            streamed = [(start, end, frames.index(frame), srt_row) for start, end, frame, srt_row in iter_segments(iter(frames), srt_frames)]
+            self.assertEqual(streamed, expected)
+
+    def test_not_monotonic(self):
+        frames = create_frames([37, 34, 8, 23, 58])
+        srt_frames = create_srt([1, 8, 24, 29, 33, 60, 60, 69])
+        self.assertEqual(list(build_timeline(frames, srt_frames)), [
+            (37, 34, 0, 4),
+            (34, 8, 1, 4),
+            (8, 23, 2, 1),
+            (23, 24, 3, 1),
+            (24, 29, 3, 2),
+            (29, 33, 3, 3),
+            (33, 58, 3, 4),
+        ])
+
+        rnd = random.Random(2)
+        for _ in range(500):
+            frames = create_frames(rnd.sample(range(60), rnd.randint(1, 12)))
+            srt_frames = create_srt(sorted(rnd.choice(range(70)) for _ in range(rnd.randint(0, 10))))
+
+            timeline = list(build_timeline(frames, srt_frames))
+            streamed = [(start, end, frames.index(frame), srt_row) for start, end, frame, srt_row in iter_segments(iter(frames), srt_frames)]
+            self.assertEqual(timeline, streamed)
+            # every osd frame is shown
+            self.assertEqual(sorted({row for _, _, row, _ in timeline}), list(range(len(frames) - 1)))
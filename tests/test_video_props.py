@@ -0,0 +1,83 @@
+import os
+import pathlib
+import struct
+import tempfile
+import unittest
+from unittest import mock
+
+from osd.utils.video_props import VideoProperties, get_video_properties
+
+
+def box(box_type: bytes, *payload: bytes) -> bytes:
+    data = b''.join(payload)
+    return struct.pack('>I4s', len(data) + 8, box_type) + data
+
+
+def full_box(box_type: bytes, *payload: bytes) -> bytes:
+    return box(box_type, b'\0\0\0\0', *payload)
+
+
+def video_trak(width: int, height: int, timescale: int, stts: list[tuple[int, int]], rotated: bool = False) -> bytes:
+    matrix = (0, 0x10000, 0, -0x10000, 0, 0, 0, 0, 0x40000000) if rotated else (0x10000, 0, 0, 0, 0x10000, 0, 0, 0, 0x40000000)
+    tkhd = full_box(b'tkhd', bytes(20), bytes(16), struct.pack('>9i', *matrix), struct.pack('>II', width << 16, height << 16))
+    mdhd = full_box(b'mdhd', bytes(8), struct.pack('>II', timescale, 0), bytes(4))
+    hdlr = full_box(b'hdlr', bytes(4), b'vide', bytes(12))
+    sample_entry = box(b'avc1', bytes(24), struct.pack('>HH', width, height), bytes(50))
+    stsd = full_box(b'stsd', struct.pack('>I', 1), sample_entry)
+    stts_box = full_box(b'stts', struct.pack('>I', len(stts)), *(struct.pack('>II', n, delta) for n, delta in stts))
+    stsz_box = full_box(b'stsz', struct.pack('>II', 0, sum(n for n, _ in stts)))
+    # mov has data handler in minf
+    minf = box(b'minf', full_box(b'hdlr', b'dhlr', b'url ', bytes(12)), box(b'stbl', stsd, stts_box, stsz_box))
+
+    return box(b'trak', tkhd, box(b'mdia', mdhd, hdlr, minf))
+
+
+def write_mp4(path: pathlib.Path, *traks: bytes) -> None:
+    # media data before moov, like in recorded files
+    path.write_bytes(box(b'ftyp', b'isom', bytes(4)) + box(b'mdat', bytes(1000)) + box(b'moov', full_box(b'mvhd', bytes(96)), *traks))
+
+
+class TestVideoProps(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        folder = pathlib.Path(self.tmp.name)
+        self.env = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': str(folder / 'cache')})
+        self.env.start()
+
+        self.path = folder / 'test.mp4'
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_mp4(self):
+        write_mp4(self.path, video_trak(1280, 720, 15360, [(7260, 256)]))
+        self.assertEqual(get_video_properties(self.path), VideoProperties(60, 1280, 720, 7260, 2, 1))
+
+    def test_average_fps(self):
+        # 59.94 fps and variable frame rate
+        write_mp4(self.path, video_trak(320, 240, 60000, [(600, 1001)]))
+        self.assertEqual(get_video_properties(self.path).fps, 59)
+
+        write_mp4(self.path, video_trak(320, 240, 90000, [(30, 3000), (60, 6000)]))
+        self.assertEqual(get_video_properties(self.path).fps, 18)
+
+    def test_rotated(self):
+        write_mp4(self.path, video_trak(1920, 1080, 60, [(60, 1)], rotated=True))
+        props = get_video_properties(self.path)
+        self.assertEqual((props.width, props.height), (1080, 1920))
+
+    def test_cached(self):
+        write_mp4(self.path, video_trak(1280, 720, 60, [(60, 1)]))
+        props = get_video_properties(self.path)
+
+        with mock.patch('osd.utils.video_props.read_video_track') as probe:
+            self.assertEqual(get_video_properties(self.path), props)
+            probe.assert_not_called()
+
+    def test_ffprobe_fallback(self):
+        self.path.write_bytes(b'\x1a\x45\xdf\xa3' + bytes(100))
+        stream = {'width': 640, 'height': 480, 'avg_frame_rate': '30000/1001', 'duration': '10.0'}
+
+        with mock.patch('ffmpeg.probe', return_value={'streams': [stream]}):
+            self.assertEqual(get_video_properties(self.path), VideoProperties(29, 640, 480, 290, 0, 10))
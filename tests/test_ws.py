@@ -0,0 +1,52 @@
+import pathlib
+import struct
+import tempfile
+import unittest
+from configparser import ConfigParser
+
+from osd.config import Config
+from osd.ws import file_header_struct_ws, frame_header_struct_ws
+from osd.utils.osd_props import open_osd
+
+
+def write_osd(path: pathlib.Path, times: list[int]) -> None:
+    data = bytearray(file_header_struct_ws.pack(b'INAV', *([0] * 32), 53, 20))
+    for n, osd_time in enumerate(times):
+        data += frame_header_struct_ws.pack(osd_time, *([n] * 1060))
+
+    path.write_bytes(bytes(data))
+
+
+def read_frames(path: pathlib.Path, verbatim: bool, cfg: Config):
+    with open_osd(path) as osd_file:
+        return osd_file.read_frames(verbatim, cfg)
+
+
+class TestWsReader(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.tmp.name) / 'test.osd'
+        self.cfg = Config(ConfigParser())
+        self.cfg.no_osd_cache = True
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_frames(self):
+        # 60 fps, 16.6 ms per frame
+        write_osd(self.path, [0, 20, 30, 100, 100])
+        frames = read_frames(self.path, False, self.cfg)
+
+        self.assertEqual([(f.idx, f.next_idx) for f in frames], [(0, 1), (1, 5), (5, 0)])
+        self.assertEqual(frames[1].data[0], 1)
+        self.assertEqual(frames[2].data[1059], 3)
+        self.assertEqual(len(frames[2].data), 1060)
+        self.assertEqual((self.cfg.display_width, self.cfg.display_height), (53, 20))
+
+    def test_iter_frames(self):
+        write_osd(self.path, [0, 20, 30, 100, 100])
+        frames = read_frames(self.path, False, self.cfg)
+        with open_osd(self.path) as osd_file:
+            stream = list(osd_file.iter_frames(False, self.cfg))
+
+        self.assertEqual([(f.idx, f.next_idx, list(f.data)) for f in stream], [(f.idx, f.next_idx, list(f.data)) for f in frames])